@@ -0,0 +1,52 @@
+"""
+Messages per second read from a JSON lines journal file and from the same messages in a
+binary journal file with each compression.
+
+Run from the project root:
+    PYTHONPATH=src python benchmarks/binary_reader.py
+"""
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from callable_journal.binary import json_to_binary, read_json_messages, read_messages
+
+MESSAGES = 100_000
+
+
+def write_json(fpath: Path):
+    with fpath.open("wt") as fp:
+        for i in range(MESSAGES):
+            msg = {
+                "tag": "JOURNAL_MSG_JSON",
+                "format": "0.2.0",
+                "objective": f"objective_{i % 10}",
+                "arguments": {"customer_id": i, "items": [i, i + 1, i + 2], "currency": "USD"},
+                "results": {"total": i * 1.25, "count": 3},
+                "service": {"name": "pricing", "version": "1.2.3"},
+            }
+            fp.write(json.dumps(msg) + "\n")
+
+
+def rate(read, fpath: Path) -> float:
+    start = time.perf_counter()
+    count = sum(1 for _ in read(fpath))
+    return count / (time.perf_counter() - start)
+
+
+def run():
+    with tempfile.TemporaryDirectory() as tmp:
+        json_fpath = Path(tmp) / "journal.log"
+        write_json(json_fpath)
+        size = json_fpath.stat().st_size
+        print(f"{'json':10s} {size:12d} bytes {rate(read_json_messages, json_fpath):10.0f} msgs/s")
+        for compression in ("none", "zlib", "lzma"):
+            fpath = Path(tmp) / f"journal-{compression}.cjb"
+            json_to_binary(json_fpath, fpath, compression=compression)
+            size = fpath.stat().st_size
+            print(f"{compression:10s} {size:12d} bytes {rate(read_messages, fpath):10.0f} msgs/s")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,55 @@
+"""
+Cost of capturing copy_args with deepcopy compared to encoding them at call time.
+
+Run from the project root:
+    PYTHONPATH=src python benchmarks/capture.py
+"""
+import datetime
+import timeit
+from typing import List
+
+from pydantic import BaseModel
+
+from callable_journal.param_arg_mapper import ParamArgMapper, COPY_ALL_ARGS
+
+NUMBER = 200
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+    price: float
+    created: datetime.datetime
+    tags: List[str]
+
+
+def process(records, items):
+    pass
+
+
+def payload():
+    """Dict of records and a list of pydantic models."""
+    created = datetime.datetime(2020, 1, 1, 12, 0)
+    records = {
+        f"row-{i}": {"id": i, "value": i * 0.5, "created": created, "flags": [True, False]}
+        for i in range(200)
+    }
+    items = [
+        Item(id=i, name=f"item-{i}", price=i * 1.25, created=created, tags=["a", "b"])
+        for i in range(200)
+    ]
+    return (records, items), {}
+
+
+def run():
+    args, kwargs = payload()
+    for capture in ("deepcopy", "encode"):
+        plan = ParamArgMapper.plan(process, copy_args=COPY_ALL_ARGS, capture=capture)
+        seconds = min(
+            timeit.repeat(lambda: plan.map_args(args, kwargs), number=NUMBER, repeat=5)
+        )
+        print(f"{capture:10s} {seconds / NUMBER * 1e6:10.0f} us/call")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,50 @@
+"""
+Overhead of a journaled call when the journal logger is disabled compared to an
+undecorated call and a bare functools.wraps passthrough.
+
+Run from the project root:
+    PYTHONPATH=src python benchmarks/disabled_overhead.py
+"""
+import functools
+import logging
+import timeit
+
+from callable_journal import journal
+
+NUMBER = 200_000
+
+
+def add(a, b, c=3, *, d=4):
+    return a + sum(b) + c + d
+
+
+@functools.wraps(add)
+def passthrough(*args, **kwargs):
+    return add(*args, **kwargs)
+
+
+journaled = journal(add, result_names="total", copy_args="b")
+
+
+def time_call(fn) -> float:
+    """Best of five runs in nanoseconds per call."""
+    b = [2]
+    seconds = min(timeit.repeat(lambda: fn(1, b, d=5), number=NUMBER, repeat=5))
+    return seconds / NUMBER * 1e9
+
+
+def run():
+    journal_logger = logging.getLogger("journal")
+    journal_logger.propagate = False
+    journal_logger.addHandler(logging.NullHandler())
+
+    print(f"{'bare call':30s} {time_call(add):10.0f} ns/call")
+    print(f"{'functools.wraps passthrough':30s} {time_call(passthrough):10.0f} ns/call")
+    journal_logger.setLevel(logging.WARNING)
+    print(f"{'journal disabled':30s} {time_call(journaled):10.0f} ns/call")
+    journal_logger.setLevel(logging.INFO)
+    print(f"{'journal enabled':30s} {time_call(journaled):10.0f} ns/call")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,56 @@
+"""
+Messages per second formatted by each installed JSON backend in JSON and STRINGY mode.
+
+Run from the project root:
+    PYTHONPATH=src python benchmarks/json_backend.py
+"""
+import datetime
+import timeit
+import uuid
+from logging import Logger
+
+from callable_journal.formatter import JournalFormatter
+from callable_journal.journal import JournalContent
+from callable_journal.json_backend import BACKENDS
+
+NUMBER = 2_000
+
+
+def realistic_content() -> JournalContent:
+    """API style request with a list of records and a summary result."""
+    rows = [
+        {
+            "id": uuid.UUID(int=i),
+            "name": f"item-{i}",
+            "price": i * 1.25,
+            "created": datetime.datetime(2020, 1, 1, 12, i % 60),
+            "tags": ["a", "b", "c"],
+        }
+        for i in range(50)
+    ]
+    return JournalContent(
+        objective="price_items",
+        context={"service": {"name": "pricing", "version": "1.2.3"}},
+        arguments={"customer_id": uuid.UUID(int=7), "rows": rows, "currency": "USD"},
+        results={"total": 1531.25, "count": 50},
+    )
+
+
+def run():
+    record = Logger("benchmark").makeRecord(
+        "journal", 20, "fn", 0, "", (), None, extra={"journal_content": realistic_content()}
+    )
+    for name, backend in BACKENDS.items():
+        if not backend.available():
+            print(f"{name:10s} not installed")
+            continue
+        for format_mode in ("json", "stringy"):
+            formatter = JournalFormatter(tag="BENCH", format_mode=format_mode, json_backend=name)
+            seconds = min(
+                timeit.repeat(lambda: formatter.format(record), number=NUMBER, repeat=5)
+            )
+            print(f"{name:10s} {format_mode:8s} {NUMBER / seconds:10.0f} msgs/s")
+
+
+if __name__ == "__main__":
+    run()
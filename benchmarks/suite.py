@@ -0,0 +1,382 @@
+"""
+Benchmark suite for the cost of the journal.
+
+Covers argument mapping across signature shapes, copy_args, the encoder, the formatter in
+JSON and STRINGY mode, the exception path and decorated calls compared to undecorated calls.
+The results are saved as JSON so runs can be compared between versions.
+
+Run from the project root:
+    PYTHONPATH=src python benchmarks/suite.py run --output results.json
+    PYTHONPATH=src python benchmarks/suite.py run --filter encoder/ --output results.json
+    PYTHONPATH=src python benchmarks/suite.py compare baseline.json results.json --threshold 0.2
+
+compare exits with 1 if any benchmark is slower than the baseline by more than the threshold.
+Benchmarks that are only in one of the runs are reported as new or missing and don't fail the
+comparison, so filtered runs can be compared to a full baseline.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+import timeit
+from typing import Callable, Dict, List, Optional, Tuple
+
+from callable_journal import COPY_ALL_ARGS, journal
+from callable_journal.encoders import ObjectDictEncoder
+from callable_journal.exception_msg import ExceptionRecord
+from callable_journal.formatter import JournalFormatter
+from callable_journal.journal import JournalRecord
+from callable_journal.json_backend import OrjsonBackend
+from callable_journal.param_arg_mapper import ParamArgMapper
+from callable_journal.record import JournalContext, LayeredContext
+
+REPEAT = 5
+# Minimum time of one timed run.
+MIN_SECONDS = 0.2
+
+# Benchmark name: setup returning the operation to time.
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = dict()
+
+
+def benchmark(name: str):
+    """Register a benchmark setup by name."""
+
+    def register(setup: Callable[[], Callable[[], object]]):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+# Signature shapes for the mapper and the decorated calls.
+
+
+def positional(a, b, c=3):
+    return a
+
+
+def keyword_only(a, *, b, c=3):
+    return a
+
+
+def var_args(a, *args, **kwargs):
+    return a
+
+
+class Service:
+    def method(self, a, b=2):
+        return a
+
+
+def created() -> datetime.datetime:
+    return datetime.datetime(2020, 1, 1, 12, 0)
+
+
+def flat_payload() -> Dict:
+    return {"id": 1, "name": "item", "price": 1.25, "active": True, "created": created()}
+
+
+def nested_payload() -> Dict:
+    return {
+        "customer": {"id": 7, "tags": ["a", "b"], "address": {"city": "Denver", "zip": "80202"}},
+        "items": [{"id": i, "price": i * 1.25, "created": created()} for i in range(10)],
+    }
+
+
+def large_payload() -> Dict:
+    return {f"row-{i}": {"id": i, "value": i * 0.5, "flags": [True, False]} for i in range(1000)}
+
+
+def mapper(callable: Callable, args: tuple, kwargs: dict, **options):
+    plan = ParamArgMapper.plan(callable, **options)
+    return lambda: plan.map_args(args, kwargs)
+
+
+@benchmark("mapper/positional")
+def mapper_positional():
+    return mapper(positional, (1, 2), {})
+
+
+@benchmark("mapper/keyword_only")
+def mapper_keyword_only():
+    return mapper(keyword_only, (1,), {"b": 2})
+
+
+@benchmark("mapper/var_args")
+def mapper_var_args():
+    return mapper(var_args, (1, 2, 3), {"x": 4, "y": 5})
+
+
+@benchmark("mapper/bound_method")
+def mapper_bound_method():
+    return mapper(Service().method, (1,), {"b": 2})
+
+
+@benchmark("mapper/unbound_method")
+def mapper_unbound_method():
+    return mapper(Service.method, (Service(), 1), {"b": 2})
+
+
+@benchmark("mapper/drop_args")
+def mapper_drop_args():
+    return mapper(positional, (1, 2), {}, drop_args="b")
+
+
+@benchmark("copy/none")
+def copy_none():
+    return mapper(positional, (nested_payload(), 2), {})
+
+
+@benchmark("copy/deepcopy")
+def copy_deepcopy():
+    return mapper(positional, (nested_payload(), 2), {}, copy_args=COPY_ALL_ARGS)
+
+
+@benchmark("copy/encode")
+def copy_encode():
+    return mapper(
+        positional, (nested_payload(), 2), {}, copy_args=COPY_ALL_ARGS, capture="encode"
+    )
+
+
+@benchmark("encoder/flat")
+def encoder_flat():
+    payload = flat_payload()
+    return lambda: ObjectDictEncoder.encode(payload)
+
+
+@benchmark("encoder/nested")
+def encoder_nested():
+    payload = nested_payload()
+    return lambda: ObjectDictEncoder.encode(payload)
+
+
+@benchmark("encoder/large")
+def encoder_large():
+    payload = large_payload()
+    return lambda: ObjectDictEncoder.encode(payload)
+
+
+def log_record(exception: bool = False, layered: bool = False) -> logging.LogRecord:
+    context = JournalContext({"service": {"name": "pricing", "version": "1.2.3"}})
+    if layered:
+        context = LayeredContext(context, {"request_id": "3f2a9c", "tenant": "acme"})
+    record = JournalRecord(objective="benchmark", context=context, arguments=nested_payload())
+    if exception:
+        try:
+            1 / 0
+        except ZeroDivisionError as exc:
+            record.exception = ExceptionRecord.from_exception(exc)
+    else:
+        record.results = {"total": 12.5, "count": 10}
+    return logging.Logger("benchmark").makeRecord(
+        "journal", logging.INFO, "fn", 0, "", (), None, extra={"journal_content": record}
+    )
+
+
+def formatter(format_mode: str, json_backend: str = "json", layered: bool = False):
+    fmt = JournalFormatter(tag="BENCH", format_mode=format_mode, json_backend=json_backend)
+    record = log_record(layered=layered)
+    return lambda: fmt.formatter(record)
+
+
+@benchmark("formatter/json")
+def formatter_json():
+    return formatter("json")
+
+
+@benchmark("formatter/stringy")
+def formatter_stringy():
+    return formatter("stringy")
+
+
+@benchmark("formatter/json_layered")
+def formatter_json_layered():
+    return formatter("json", layered=True)
+
+
+if OrjsonBackend.available():
+
+    @benchmark("formatter/json_orjson")
+    def formatter_json_orjson():
+        return formatter("json", "orjson")
+
+    @benchmark("formatter/stringy_orjson")
+    def formatter_stringy_orjson():
+        return formatter("stringy", "orjson")
+
+
+@benchmark("formatter/exception")
+def formatter_exception():
+    fmt = JournalFormatter(tag="BENCH", format_mode="json")
+    record = log_record(exception=True)
+    return lambda: fmt.formatter(record)
+
+
+def journal_logger(level: int) -> logging.Logger:
+    """Send the journal to the null device through the formatter so the whole path is timed."""
+    logger = logging.getLogger("journal")
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = logging.StreamHandler(open(os.devnull, "w"))
+    handler.setFormatter(JournalFormatter(tag="BENCH", format_mode="json"))
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger.setLevel(level)
+    return logger
+
+
+def add(a, b, c=3, *, d=4):
+    return a + sum(b) + c + d
+
+
+journaled_add = journal(add, result_names="total")
+
+
+def fail(a):
+    raise ValueError(a)
+
+
+journaled_fail = journal(fail)
+
+
+@benchmark("call/undecorated")
+def call_undecorated():
+    b = [2]
+    return lambda: add(1, b, d=5)
+
+
+@benchmark("call/journal_disabled")
+def call_journal_disabled():
+    journal_logger(logging.WARNING + 10)
+    b = [2]
+    return lambda: journaled_add(1, b, d=5)
+
+
+@benchmark("call/journal_enabled")
+def call_journal_enabled():
+    journal_logger(logging.INFO)
+    b = [2]
+    return lambda: journaled_add(1, b, d=5)
+
+
+@benchmark("call/exception_undecorated")
+def call_exception_undecorated():
+    def call():
+        try:
+            fail(1)
+        except ValueError:
+            pass
+
+    return call
+
+
+@benchmark("call/exception_journaled")
+def call_exception_journaled():
+    journal_logger(logging.INFO)
+
+    def call():
+        try:
+            journaled_fail(1)
+        except ValueError:
+            pass
+
+    return call
+
+
+def measure(operation: Callable[[], object]) -> Dict[str, float]:
+    """Time the operation in nanoseconds per call."""
+    timer = timeit.Timer(operation)
+    number, seconds = timer.autorange()
+    number = max(int(number * MIN_SECONDS / max(seconds, 1e-9)), 1)
+    runs = [seconds / number * 1e9 for seconds in timer.repeat(repeat=REPEAT, number=number)]
+    return {"ns_per_op": min(runs), "median_ns": statistics.median(runs), "number": number}
+
+
+def run(pattern: Optional[str] = None) -> Dict:
+    results = dict()
+    for name, setup in BENCHMARKS.items():
+        if pattern and not re.search(pattern, name):
+            continue
+        results[name] = measure(setup())
+        print(f"{name:32s} {results[name]['ns_per_op']:12.0f} ns/op", file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "time": time.time(),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> Tuple[List[str], List[str]]:
+    """
+    Compare the results of two runs.
+
+    :param threshold: Allowed slowdown as a fraction of the baseline.
+    :return: Lines of the report and the names of the regressed benchmarks.
+    """
+    lines, regressions = list(), list()
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            lines.append(f"{name:32s} {result['ns_per_op']:12.0f} ns/op      new")
+            continue
+        change = result["ns_per_op"] / base["ns_per_op"] - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        flag = "REGRESSED" if regressed else ""
+        lines.append(
+            f"{name:32s} {base['ns_per_op']:12.0f} -> {result['ns_per_op']:12.0f} ns/op "
+            f"{change:+8.1%} {flag}"
+        )
+    for name, base in baseline["results"].items():
+        if name not in current["results"]:
+            lines.append(f"{name:32s} {base['ns_per_op']:12.0f} ns/op      missing")
+    return lines, regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    runs = commands.add_parser("run", help="Run the benchmarks.")
+    runs.add_argument("--filter", help="Regular expression for the benchmark names to run.")
+    runs.add_argument("--output", help="Save the results as JSON.")
+    compares = commands.add_parser("compare", help="Compare results to a baseline.")
+    compares.add_argument("baseline")
+    compares.add_argument("current")
+    compares.add_argument(
+        "--threshold", type=float, default=0.2, help="Allowed slowdown.  0.2 is 20%%."
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run(args.filter)
+        if args.output:
+            with open(args.output, "wt") as fp:
+                json.dump(results, fp, indent=2)
+        return 0
+
+    with open(args.baseline) as fp:
+        baseline = json.load(fp)
+    with open(args.current) as fp:
+        current = json.load(fp)
+    lines, regressions = compare(baseline, current, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"{len(regressions)} regressed over {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,2 +1,4 @@
-from .journal import journal, journal_init
+from .context import journal_context, copy_context
+from .journal import journal, journal_class, journal_init, journal_flush
 from .param_arg_mapper import COPY_ALL_ARGS, DROP_RESULT
+from .profiling import stats, enable_stats, disable_stats, reset_stats
@@ -0,0 +1,5 @@
+import sys
+
+from callable_journal.cli import main
+
+sys.exit(main())
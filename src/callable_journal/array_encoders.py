@@ -0,0 +1,152 @@
+"""
+Encoders for NumPy arrays and pandas objects.
+
+The encoders are registered lazily by type name so NumPy and pandas are never imported
+by the journal.  They are only used once an array has been passed to the encoder.
+
+Modes:
+    summary: Shape, dtype, min, max, mean and null counts.
+    tolist: Vectorized conversion of all the values with tolist().
+    base64: Shape, dtype and the base64 encoded raw buffer.
+
+The default mode is tolist.  Configure in the journal section of the logging config file.
+journal:
+  arrays:
+    mode: summary
+"""
+import base64
+from enum import Enum
+from typing import Any, Dict, Mapping, Optional, Union
+
+
+class ArrayMode(Enum):
+    """How arrays are encoded."""
+
+    SUMMARY = "summary"
+    TOLIST = "tolist"
+    BASE64 = "base64"
+
+
+def _stats(values: Any) -> Dict[str, Any]:
+    """Null count and min, max and mean of the numeric or datetime values of an array."""
+    import numpy as np
+
+    kind = values.dtype.kind
+    if kind in "fc":
+        nulls = int(np.isnan(values).sum())
+    elif kind in "mM":
+        nulls = int(np.isnat(values).sum())
+    elif kind == "O":
+        nulls = int(sum(value is None for value in values.flat))
+    else:
+        nulls = 0
+    stats = {"nulls": nulls}
+    if values.size == nulls or kind not in "biufmM":
+        return stats
+    if kind in "mM":
+        valid = values[~np.isnat(values)]
+        stats.update(min=str(valid.min()), max=str(valid.max()))
+        return stats
+    stats.update(
+        min=np.nanmin(values).item(),
+        max=np.nanmax(values).item(),
+        mean=np.nanmean(values).item(),
+    )
+    return stats
+
+
+def ndarray_summary(arr: Any) -> Dict[str, Any]:
+    """Summarize an array without converting the values."""
+    return {"shape": list(arr.shape), "dtype": str(arr.dtype), **_stats(arr)}
+
+
+def ndarray_tolist(arr: Any) -> Any:
+    """Convert all the values with the vectorized tolist()."""
+    return arr.tolist()
+
+
+def ndarray_base64(arr: Any) -> Dict[str, Any]:
+    """Encode the raw buffer of an array.  Object arrays are converted with tolist()."""
+    import numpy as np
+
+    if arr.dtype.kind == "O":
+        return {"shape": list(arr.shape), "dtype": str(arr.dtype), "values": arr.tolist()}
+    data = np.ascontiguousarray(arr).tobytes()
+    return {
+        "shape": list(arr.shape),
+        "dtype": arr.dtype.str,
+        "base64": base64.b64encode(data).decode("ascii"),
+    }
+
+
+def series_summary(series: Any) -> Dict[str, Any]:
+    summary = ndarray_summary(series.to_numpy())
+    summary["nulls"] = int(series.isna().sum())
+    return {"name": series.name, **summary}
+
+
+def series_tolist(series: Any) -> Any:
+    return series.tolist()
+
+
+def series_base64(series: Any) -> Dict[str, Any]:
+    return {"name": series.name, **ndarray_base64(series.to_numpy())}
+
+
+def dataframe_summary(df: Any) -> Dict[str, Any]:
+    return {
+        "shape": list(df.shape),
+        "columns": {str(name): series_summary(df[name]) for name in df.columns},
+    }
+
+
+def dataframe_tolist(df: Any) -> Dict[str, Any]:
+    return {str(name): df[name].tolist() for name in df.columns}
+
+
+def dataframe_base64(df: Any) -> Dict[str, Any]:
+    return {
+        "shape": list(df.shape),
+        "columns": {str(name): series_base64(df[name]) for name in df.columns},
+    }
+
+
+ENCODERS = {
+    ArrayMode.SUMMARY: {
+        "numpy.ndarray": ndarray_summary,
+        "pandas.Series": series_summary,
+        "pandas.DataFrame": dataframe_summary,
+    },
+    ArrayMode.TOLIST: {
+        "numpy.ndarray": ndarray_tolist,
+        "pandas.Series": series_tolist,
+        "pandas.DataFrame": dataframe_tolist,
+    },
+    ArrayMode.BASE64: {
+        "numpy.ndarray": ndarray_base64,
+        "pandas.Series": series_base64,
+        "pandas.DataFrame": dataframe_base64,
+    },
+}
+
+
+def numpy_scalar(value: Any) -> Any:
+    """Convert a NumPy scalar to the Python scalar."""
+    return value.item()
+
+
+def install_array_encoders(encoder: type, mode: Union[str, ArrayMode] = ArrayMode.TOLIST):
+    """
+    Register the array encoders lazily by type name.
+
+    :param encoder: ObjectDictEncoder or a subclass to register the encoders with.
+    :param mode: summary, tolist or base64.
+    """
+    for type_name, fn in ENCODERS[ArrayMode(mode)].items():
+        encoder.register_lazy(type_name, fn)
+    encoder.register_lazy("numpy.generic", numpy_scalar)
+
+
+def install_array_encoders_from_cfg(encoder: type, cfg: Optional[Mapping]):
+    """Register the array encoders from the arrays section of the journal config."""
+    install_array_encoders(encoder, (cfg or dict()).get("mode", ArrayMode.TOLIST))
@@ -0,0 +1,316 @@
+"""
+Compact binary journal files.
+
+The file starts with a header followed by length prefixed blocks of messages.  Each block
+is a list of messages serialized with marshal, optionally compressed with zlib or lzma.
+Equal strings in a block are replaced by one shared string before the block is marshaled,
+and marshal writes a back reference for every repeat.  That is the string table for the
+objectives, context keys, argument names and any other repeated strings.
+
+    header: b"CJRNL" + format version + marshal version
+    block:  codec (1 byte), messages (4 bytes), raw size (4 bytes), stored size (4 bytes),
+            stored bytes
+
+marshal is the fastest serializer in the standard library to load, but its format is only
+guaranteed to be readable by the same Python version that wrote it.  The marshal version is
+recorded in the header and the files are meant to be converted to JSON for long term storage.
+
+Configure in the logging config file.
+handlers:
+  journal-binary:
+    class: callable_journal.binary.JournalBinaryHandler
+    level: INFO
+    formatter: journal-json
+    filename: journal.cjb
+    compression: zlib
+    buffer_records: 1000
+"""
+import json
+import lzma
+import marshal
+import struct
+import zlib
+from enum import Enum
+from logging import LogRecord
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Tuple, Union
+
+from callable_journal.formatter import JournalFormatter
+from callable_journal.handlers import JournalFileHandler
+
+MAGIC = b"CJRNL"
+FORMAT_VERSION = 1
+MARSHAL_VERSION = 4
+HEADER = MAGIC + struct.pack("<BB", FORMAT_VERSION, MARSHAL_VERSION)
+BLOCK_HEADER = struct.Struct("<BIII")
+
+
+class Compression(Enum):
+    """Compression of the blocks."""
+
+    NONE = "none"
+    ZLIB = "zlib"
+    LZMA = "lzma"
+
+
+CODECS = {Compression.NONE: 0, Compression.ZLIB: 1, Compression.LZMA: 2}
+COMPRESSIONS = {codec: compression for compression, codec in CODECS.items()}
+
+
+# Types marshal writes that are also JSON primitives.
+MARSHAL_SAFE = (str, int, float, bool, type(None))
+
+
+def marshal_safe(obj: Any) -> Any:
+    """
+    Replace the values that aren't JSON primitives, which the encoder leaves as they are,
+    with their str so the message can be marshaled.  JSON messages fail on the same values.
+
+    :param obj: Encoded message.
+    :return: The message, or a copy of it if any value was replaced.
+    """
+    cls = type(obj)
+    if cls in MARSHAL_SAFE:
+        return obj
+    if cls is dict:
+        safe = dict()
+        changed = False
+        for k, v in obj.items():
+            safe_k = k if type(k) in MARSHAL_SAFE else str(k)
+            safe_v = marshal_safe(v)
+            changed = changed or safe_k is not k or safe_v is not v
+            safe[safe_k] = safe_v
+        return safe if changed else obj
+    if cls is list or cls is tuple:
+        safe = [marshal_safe(v) for v in obj]
+        return safe if any(a is not b for a, b in zip(obj, safe)) else obj
+    return str(obj)
+
+
+def journal_message(formatter: JournalFormatter, record: LogRecord) -> Dict[str, Any]:
+    """
+    Message of the record written to binary journal files.
+
+    :param formatter: Formatter of the binary handler.
+    :param record: Logging record.
+    :return: Message of JSON primitives that marshal can write.
+    """
+    msg = formatter.to_json(record)
+    if formatter.json.native:
+        # Native backends leave the objects they serialize themselves in the message.
+        msg = formatter.encoder.encode(msg)
+    return marshal_safe(msg)
+
+
+def share_strings(obj: Any, table: Dict[str, str]) -> Any:
+    """
+    Replace equal strings with the same string object so marshal writes each one once.
+
+    :param obj: Message of JSON primitives.
+    :param table: Strings seen in the block.
+    :return: Message with the strings shared.
+    """
+    cls = type(obj)
+    if cls is str:
+        return table.setdefault(obj, obj)
+    if cls is dict:
+        return {
+            table.setdefault(k, k) if type(k) is str else k: share_strings(v, table)
+            for k, v in obj.items()
+        }
+    if cls is list or cls is tuple:
+        return [share_strings(v, table) for v in obj]
+    return obj
+
+
+def encode_block(
+    messages: List[Dict[str, Any]],
+    compression: Union[str, Compression] = Compression.ZLIB,
+    level: int = 6,
+) -> bytes:
+    """
+    Serialize a block of messages with its header.
+
+    :param messages: Messages of JSON primitives.
+    :param compression: none, zlib or lzma.
+    :param level: zlib level or lzma preset.
+    """
+    compression = Compression(compression)
+    table = dict()
+    raw = marshal.dumps([share_strings(msg, table) for msg in messages], MARSHAL_VERSION)
+    if compression == Compression.ZLIB:
+        stored = zlib.compress(raw, level)
+    elif compression == Compression.LZMA:
+        stored = lzma.compress(raw, preset=level)
+    else:
+        stored = raw
+    header = BLOCK_HEADER.pack(CODECS[compression], len(messages), len(raw), len(stored))
+    return header + stored
+
+
+def decode_block(codec: int, stored: bytes) -> List[Dict[str, Any]]:
+    """Decompress and load the messages of a block."""
+    compression = COMPRESSIONS[codec]
+    if compression == Compression.ZLIB:
+        stored = zlib.decompress(stored)
+    elif compression == Compression.LZMA:
+        stored = lzma.decompress(stored)
+    return marshal.loads(stored)
+
+
+def iter_blocks(fp: BinaryIO) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Read the blocks of a binary journal file one at a time.
+
+    :param fp: File opened for binary reading at the start of the file.
+    :raises ValueError: If the file isn't a binary journal or was written by a different
+        marshal version.
+    """
+    header = fp.read(len(HEADER))
+    if header[: len(MAGIC)] != MAGIC:
+        raise ValueError("Not a binary journal file.")
+    if header != HEADER:
+        raise ValueError(
+            f"Unsupported binary journal version: {header[len(MAGIC):]!r}, "
+            f"expected: {HEADER[len(MAGIC):]!r}."
+        )
+    read = fp.read
+    header_size = BLOCK_HEADER.size
+    while True:
+        block_header = read(header_size)
+        if len(block_header) < header_size:
+            # A partial header is left by a write that didn't complete.
+            return
+        codec, _, _, stored_size = BLOCK_HEADER.unpack(block_header)
+        stored = read(stored_size)
+        if len(stored) < stored_size:
+            return
+        yield decode_block(codec, stored)
+
+
+def read_messages(fpath: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the messages in a binary journal file.
+
+    :param fpath: Path of the file.
+    :return: Iterator of the messages as dictionaries.
+    """
+    with open(fpath, "rb") as fp:
+        for messages in iter_blocks(fp):
+            yield from messages
+
+
+def read_json_messages(fpath: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """Stream the messages in a JSON lines journal file.  Other lines are skipped."""
+    with open(fpath, "rt", encoding="utf-8") as fp:
+        for line in fp:
+            if line.startswith("{"):
+                yield json.loads(line)
+
+
+def read_journal(fpath: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """Stream the messages in a binary or JSON lines journal file."""
+    with open(fpath, "rb") as fp:
+        binary = fp.read(len(MAGIC)) == MAGIC
+    return read_messages(fpath) if binary else read_json_messages(fpath)
+
+
+def write_messages(
+    fp: BinaryIO,
+    messages: Iterable[Dict[str, Any]],
+    compression: Union[str, Compression] = Compression.ZLIB,
+    block_size: int = 1000,
+) -> int:
+    """
+    Write the header and the messages in blocks to a new binary journal file.
+
+    :return: Number of messages written.
+    """
+    fp.write(HEADER)
+    count = 0
+    block = list()
+    for msg in messages:
+        block.append(msg)
+        if len(block) >= block_size:
+            fp.write(encode_block(block, compression))
+            count += len(block)
+            block = list()
+    if block:
+        fp.write(encode_block(block, compression))
+        count += len(block)
+    return count
+
+
+def json_to_binary(
+    src: Union[str, Path],
+    dst: Union[str, Path],
+    compression: Union[str, Compression] = Compression.ZLIB,
+    block_size: int = 1000,
+) -> int:
+    """
+    Convert a JSON lines journal file to a binary journal file.
+
+    :return: Number of messages converted.
+    """
+    with open(dst, "wb") as fp:
+        return write_messages(fp, read_json_messages(src), compression, block_size)
+
+
+def binary_to_json(src: Union[str, Path], dst: Union[str, Path]) -> int:
+    """
+    Convert a binary journal file to a JSON lines journal file.  The lines are the same as
+    the lines written with the json backend.
+
+    :return: Number of messages converted.
+    """
+    count = 0
+    with open(dst, "wt", encoding="utf-8") as fp:
+        for msg in read_messages(src):
+            fp.write(json.dumps(msg) + "\n")
+            count += 1
+    return count
+
+
+class JournalBinaryHandler(JournalFileHandler):
+    """
+    Write the messages to a binary journal file.  Each flush of the buffer writes one block.
+
+    The handler's formatter must be a JournalFormatter.  The messages are the messages the
+    formatter produces in JSON mode, with the values marshal can't write replaced by their
+    str.  buffer_bytes doesn't apply because the messages aren't serialized until the block is
+    written.  A block that fails to encode is dropped and reported by handleError.
+    """
+
+    def __init__(
+        self,
+        filename: Union[str, Path],
+        compression: str = Compression.ZLIB.value,
+        compression_level: int = 6,
+        **kwargs,
+    ):
+        """
+        :param filename: Path of the binary journal file.
+        :param compression: none, zlib or lzma.
+        :param compression_level: zlib level or lzma preset.  The handler's level is the
+            logging level.
+        :param kwargs: Buffering, rotation and fsync options of JournalFileHandler.
+        """
+        self.compression = Compression(compression)
+        self.compression_level = compression_level
+        super().__init__(filename, **kwargs)
+
+    def header(self) -> bytes:
+        return HEADER
+
+    def serialize(self, record: LogRecord) -> Tuple[Any, int]:
+        # Records from the journal transport carry the message made in the sending process.
+        msg = getattr(record, "journal_message", None)
+        if msg is not None:
+            return msg, 0
+        formatter = self.formatter
+        if not isinstance(formatter, JournalFormatter):
+            raise TypeError("JournalBinaryHandler requires a JournalFormatter.")
+        return journal_message(formatter, record), 0
+
+    def encode_buffer(self, buffer: List[Any]) -> bytes:
+        return encode_block(buffer, self.compression, self.compression_level)
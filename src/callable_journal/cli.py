@@ -0,0 +1,123 @@
+"""
+callable-journal command line tool.
+
+    callable-journal query journal.log --objective price_items --errors --since 2020-10-17T12:00
+    callable-journal index journal.log
+    callable-journal replay journal.log --module pricing.api --workers 4
+"""
+import argparse
+import datetime
+import json
+import sys
+from typing import List, Optional
+
+from callable_journal.binary import read_journal
+from callable_journal.query import JournalIndex
+from callable_journal.replay import ReplayRegistry, replay
+
+
+def parse_time(value: str) -> int:
+    """Nanoseconds since the epoch or an ISO 8601 time.  Times without a zone are UTC."""
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        when = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Not nanoseconds or an ISO 8601 time: {value}")
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return int(when.timestamp()) * 1_000_000_000 + when.microsecond * 1_000
+
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="callable-journal", description="Query journal files with a sidecar index."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index = commands.add_parser("index", help="Build or extend the index of journal files.")
+    index.add_argument("files", nargs="+")
+
+    query = commands.add_parser("query", help="Print the messages that match the filters.")
+    query.add_argument("files", nargs="+")
+    query.add_argument("--objective", help="Objective of the messages.")
+    query.add_argument(
+        "--since", type=parse_time, help="Messages started at or after this time."
+    )
+    query.add_argument("--until", type=parse_time, help="Messages started before this time.")
+    errors = query.add_mutually_exclusive_group()
+    errors.add_argument(
+        "--errors",
+        dest="has_exception",
+        action="store_const",
+        const=True,
+        help="Messages with an exception.",
+    )
+    errors.add_argument(
+        "--no-errors",
+        dest="has_exception",
+        action="store_const",
+        const=False,
+        help="Messages without an exception.",
+    )
+    query.add_argument("--limit", type=int, help="Maximum number of messages per file.")
+    query.add_argument(
+        "--count", action="store_true", help="Print the number of matching messages."
+    )
+
+    replays = commands.add_parser(
+        "replay", help="Replay the journaled calls and report mismatches and latencies."
+    )
+    replays.add_argument("files", nargs="+")
+    replays.add_argument(
+        "--module",
+        action="append",
+        required=True,
+        help="Module with the decorated callables to replay.  Can be repeated.",
+    )
+    replays.add_argument("--workers", type=int, default=0, help="Number of worker processes.")
+    return parser
+
+
+def replay_files(args: argparse.Namespace) -> int:
+    """Replay the files and print the report.  Returns 1 if there were mismatches or errors."""
+    registry = ReplayRegistry()
+    for module in args.module:
+        registry.register_module(module)
+    messages = (msg for fpath in args.files for msg in read_journal(fpath))
+    report = replay(messages, registry, workers=args.workers)
+    json.dump(report.to_dict(), sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0 if report.ok else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parser().parse_args(argv)
+    if args.command == "replay":
+        return replay_files(args)
+    out = sys.stdout
+    for fpath in args.files:
+        index = JournalIndex(fpath)
+        if args.command == "index":
+            added = index.update()
+            out.write(f"{fpath}: {len(index.entries)} messages, {added} added\n")
+            continue
+        filters = dict(
+            objective=args.objective,
+            start_ns=args.since,
+            end_ns=args.until,
+            has_exception=args.has_exception,
+        )
+        if args.count:
+            index.update()
+            out.write(f"{fpath}: {sum(1 for _ in index.select(**filters))}\n")
+            continue
+        for msg in index.query(limit=args.limit, **filters):
+            out.write(json.dumps(msg) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Per-request journal context.
+
+journal_context adds fields to the context of the messages journaled inside it.  The layers
+are kept in a context variable, so each thread and asyncio task has its own and the layers
+are layered on top of the context passed to journal_init.
+
+    with journal_context(request_id=request.id, tenant=request.tenant):
+        handle(request)
+
+asyncio tasks start with the layers of the code that created them.  Threads start without
+any, so wrap the callable with copy_context to run it with the layers of the caller.
+
+    executor.submit(copy_context(handle), request)
+"""
+import contextvars
+import functools
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Mapping, Optional
+
+from callable_journal.record import JournalContext, LayeredContext
+
+
+class ContextLayer:
+    """
+    Fields of one journal_context and the layers it is inside.
+
+    The layer is combined with the context passed to journal_init once and the combined
+    context is reused by every message journaled in the layer, so the formatters encode and
+    serialize the layer fields once.
+    """
+
+    __slots__ = ("fields", "bound")
+
+    def __init__(self, fields: Mapping[str, Any], parent: Optional["ContextLayer"] = None):
+        self.fields = {**parent.fields, **fields} if parent is not None else dict(fields)
+        self.bound: Optional[LayeredContext] = None
+
+    def bind(self, static: Optional[JournalContext]) -> LayeredContext:
+        """Context of the messages journaled in the layer."""
+        bound = self.bound
+        if bound is None or bound.static is not static:
+            # journal_init replaced the context since the layer was last bound.
+            bound = self.bound = LayeredContext(static, self.fields)
+        return bound
+
+
+# Innermost journal_context layer of the running thread or task.
+current_layer: "contextvars.ContextVar[Optional[ContextLayer]]" = contextvars.ContextVar(
+    "journal_context", default=None
+)
+
+
+@contextmanager
+def journal_context(**fields: Any) -> Iterator[ContextLayer]:
+    """
+    Add fields to the context of the messages journaled inside the with block.
+
+    The fields replace the fields with the same names of the enclosing layers and of the
+    context passed to journal_init.  The values are encoded when the first message of the
+    layer is formatted, so they shouldn't be mutated inside the block.
+
+    :param fields: Context fields.
+    :return: The layer.
+    """
+    layer = ContextLayer(fields, current_layer.get())
+    token = current_layer.set(layer)
+    try:
+        yield layer
+    finally:
+        current_layer.reset(token)
+
+
+def copy_context(callable: Callable) -> Callable:
+    """
+    Wrap a callable to run with the journal context layers of the caller.  Use it for the
+    callables run by threads and thread pool executors.  Each call runs in its own copy of
+    the context so the wrapper can be called by many threads at the same time.
+
+    :param callable: Callable to run in another thread.
+    :return: Wrapped callable.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(callable)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(callable, *args, **kwargs)
+
+    return wrapper
@@ -1,11 +1,47 @@
 """Dictionary encoders to convert objects to primitive dictionaries."""
+import copy
+import dataclasses
 import datetime
+import functools
+import importlib
+import uuid
 from abc import abstractmethod, ABC
-from pathlib import Path
-from typing import Mapping, Iterable, Any, Union
+from pathlib import PurePath
+import sys
+from typing import (
+    Mapping,
+    Iterable,
+    Any,
+    Union,
+    Callable,
+    Dict,
+    Optional,
+    Sequence,
+    AbstractSet,
+    Tuple,
+)
+
+from .array_encoders import install_array_encoders
+from .exceptions import EncoderError
 
 PRIMITIVE = Union[bool, float, int, str, Iterable, Mapping]
 
+# Types that are encoded as is.  Subclasses are resolved through the dispatch cache.
+PRIMITIVE_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+def resolve_name(name: str) -> Any:
+    """
+    Import an object from its dotted name.  module.attribute or module:attribute.
+    """
+    module_name, sep, attr_path = name.partition(":")
+    if not sep:
+        module_name, _, attr_path = name.rpartition(".")
+    obj = importlib.import_module(module_name)
+    for attr in attr_path.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
 
 class DictEncoder(ABC):
     """Base dictionary encoder with logic to traverse str, Iterable and Mapping."""
@@ -38,20 +74,390 @@ class DictEncoder(ABC):
         return obj
 
 
+# Kinds of encoding classified for each type.
+CONVERT = "convert"
+STRING = "string"
+MAPPING = "mapping"
+ITERABLE = "iterable"
+OTHER = "other"
+
+# Key marking a value that was replaced by a summary because it was over budget.
+TRUNCATED = "__truncated__"
+
+
+def _type_name(type_: type) -> str:
+    """Top level package and qualified name of a type used to register it lazily."""
+    return f"{type_.__module__.partition('.')[0]}.{type_.__qualname__}"
+
+
+def _dataclass_fields(obj: Any) -> Dict[str, Any]:
+    """Shallow mapping of the fields of a dataclass."""
+    return {f.name: getattr(obj, f.name) for f in dataclasses.fields(obj)}
+
+
+def _no_encoder(obj: Any):
+    """Default of the registry.  Marks types that don't have a registered encoder."""
+
+
 class ObjectDictEncoder(DictEncoder):
     """
     Encoder for additional common object types and protocols that have a dict() method.
+
+    The encode function for each concrete type is resolved once and cached.  Functions
+    registered for a type, or any of its base classes, are used first.  Then objects
+    with a dict() method, dataclasses, str, Mapping and Iterable.  Anything else is left
+    as is.
+
+    Register an encode function that converts the object to something simpler.  The
+    returned value is encoded again.
+
+        ObjectDictEncoder.register(decimal.Decimal, str)
+
+    Or in the journal section of the logging config file.
+    journal:
+      encoders:
+        decimal.Decimal: builtins.str
     """
 
+    # Registered encode functions resolved through the MRO.  Each subclass has its own copy.
+    _registry = functools.singledispatch(_no_encoder)
+    # Encode functions registered by type name for types that may never be imported.
+    _lazy: Dict[str, Callable[[Any], Any]] = dict()
+    # Encode function resolved for each concrete type.
+    _dispatch: Dict[type, Callable[[type, Any], Any]] = dict()
+    # Kind of encoding classified for each concrete type.
+    _kinds: Dict[type, Tuple[str, Optional[Callable[[Any], Any]]]] = dict()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        registry = functools.singledispatch(_no_encoder)
+        for type_, fn in cls._registry.registry.items():
+            if type_ is not object:
+                registry.register(type_, fn)
+        cls._registry = registry
+        cls._lazy = dict(cls._lazy)
+        cls._dispatch = dict()
+        cls._kinds = dict()
+
     @classmethod
-    def encode(cls, obj):
+    def register(cls, type_: type, fn: Optional[Callable[[Any], Any]] = None):
+        """
+        Register a function to encode a type and its subclasses.   Can be used as a decorator.
+
+        :param type_: Type to encode.
+        :param fn: Function to convert the object to something simpler.
+        """
+        if fn is None:
+            return lambda f: cls.register(type_, f)
+        cls._registry.register(type_, fn)
+        # Subclasses inherit the registration through their own registry.
+        for subclass in cls.__subclasses__():
+            subclass.register(type_, fn)
+        cls._dispatch.clear()
+        cls._kinds.clear()
+        return fn
+
+    @classmethod
+    def register_lazy(cls, type_name: str, fn: Callable[[Any], Any]):
+        """
+        Register a function to encode a type by name without importing it.  The function
+        is registered for the type the first time an instance of it, or of a subclass,
+        is encoded.
+
+        :param type_name: Top level package and qualified name of the type.  numpy.ndarray
+        :param fn: Function to convert the object to something simpler.
+        """
+        cls._lazy[type_name] = fn
+        # Replace the function of a type that was already registered from the name.
+        for type_ in list(cls._registry.registry):
+            if _type_name(type_) == type_name:
+                cls._registry.register(type_, fn)
+        for subclass in cls.__subclasses__():
+            subclass.register_lazy(type_name, fn)
+        cls._dispatch.clear()
+        cls._kinds.clear()
+
+    @classmethod
+    def _register_lazy_type(cls, obj_type: type):
+        """Register the lazy encode function for the first type in the MRO that has one."""
+        for base in obj_type.__mro__:
+            fn = cls._lazy.get(_type_name(base))
+            if fn is not None:
+                cls._registry.register(base, fn)
+                return
+
+    @classmethod
+    def register_from_cfg(cls, cfg: Optional[Mapping[str, str]]):
+        """
+        Register the encode functions from the encoders section of the journal config.
+
+        :param cfg: Mapping of the dotted name of the type to the dotted name of the function.
+        """
+        for type_name, fn_name in (cfg or dict()).items():
+            cls.register(resolve_name(type_name), resolve_name(fn_name))
+
+    @classmethod
+    def _classify(cls, obj_type: type) -> Tuple[str, Optional[Callable[[Any], Any]]]:
+        """
+        Classify how a type is encoded.
+
+        :return: Kind of encoding and for CONVERT the function that converts an object
+            to something simpler that is encoded again.
+        """
         try:
-            # Try converting with dict() method first.
-            return cls.encode(obj.dict())
-        except AttributeError as exc:
+            return cls._kinds[obj_type]
+        except KeyError:
             pass
-        if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
-            return obj.isoformat()
-        if isinstance(obj, Path):
-            return str(obj)
-        return super().encode(obj)
+        if cls._lazy:
+            cls._register_lazy_type(obj_type)
+        fn = cls._registry.dispatch(obj_type)
+        if fn is not _no_encoder:
+            kind = (CONVERT, fn)
+        elif callable(getattr(obj_type, "dict", None)):
+            kind = (CONVERT, lambda obj: obj.dict())
+        elif dataclasses.is_dataclass(obj_type):
+            kind = (CONVERT, _dataclass_fields)
+        elif issubclass(obj_type, str):
+            kind = (STRING, None)
+        elif issubclass(obj_type, Mapping):
+            kind = (MAPPING, None)
+        elif issubclass(obj_type, Iterable):
+            kind = (ITERABLE, None)
+        else:
+            kind = (OTHER, None)
+        cls._kinds[obj_type] = kind
+        return kind
+
+    @classmethod
+    def _resolve(cls, obj_type: type) -> Callable[[type, Any], Any]:
+        """Resolve the encode function for a type."""
+        kind, convert = cls._classify(obj_type)
+        if kind == CONVERT:
+            return lambda cls_, obj: cls_.encode(convert(obj))
+        if kind == STRING:
+            return lambda cls_, obj: obj
+        if kind == MAPPING:
+            return lambda cls_, obj: cls_._mapping_encode(obj)
+        if kind == ITERABLE:
+            return cls._resolve_iterable(obj_type)
+        return cls._resolve_other(obj_type)
+
+    @classmethod
+    def _resolve_iterable(cls, obj_type: type) -> Callable[[type, Any], Any]:
+        """Resolve the encode function for an Iterable that isn't a str or Mapping."""
+        return lambda cls_, obj: [cls_.encode(v) for v in obj]
+
+    @classmethod
+    def _resolve_other(cls, obj_type: type) -> Callable[[type, Any], Any]:
+        """Resolve the encode function for a type the encoder doesn't know."""
+        return lambda cls_, obj: obj
+
+    @classmethod
+    def encode(cls, obj):
+        obj_type = type(obj)
+        if obj_type in PRIMITIVE_TYPES:
+            return obj
+        try:
+            fn = cls._dispatch[obj_type]
+        except KeyError:
+            fn = cls._dispatch[obj_type] = cls._resolve(obj_type)
+        return fn(cls, obj)
+
+    @classmethod
+    def bounded(cls, budget: "EncodingBudget") -> "BoundedEncoding":
+        """
+        Create an encoding that stops walking objects once the budget is spent.  Everything
+        encoded with it shares the budget.
+
+        :param budget: Size limits for the encoded values.
+        """
+        return BoundedEncoding(cls, budget)
+
+
+ObjectDictEncoder.register(datetime.date, datetime.date.isoformat)
+ObjectDictEncoder.register(datetime.datetime, datetime.datetime.isoformat)
+ObjectDictEncoder.register(datetime.time, datetime.time.isoformat)
+ObjectDictEncoder.register(PurePath, str)
+ObjectDictEncoder.register(uuid.UUID, str)
+install_array_encoders(ObjectDictEncoder)
+
+
+class EncodingBudget:
+    """
+    Limits on the size of the encoded arguments and results.  Values over budget are
+    replaced by a summary like {"__truncated__": true, "len": N, "head": [...]}.
+
+    Configure in the logging config file.
+    formatters:
+
+      journal-json:
+        (): callable_journal.formatter.JournalFormatter
+        tag: JOURNAL_MSG_JSON
+        format_mode: json
+        encoding_budget:
+          max_items: 100
+          max_keys: 100
+          max_str: 1000
+          max_depth: 10
+          max_total: 100000
+    """
+
+    __slots__ = ("max_items", "max_keys", "max_str", "max_depth", "max_total")
+
+    def __init__(
+        self,
+        max_items: Optional[int] = None,
+        max_keys: Optional[int] = None,
+        max_str: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        max_total: Optional[int] = None,
+    ):
+        """
+        :param max_items: Maximum items encoded from each sequence or iterable.
+        :param max_keys: Maximum keys encoded from each mapping.
+        :param max_str: Maximum length of each str or bytes.
+        :param max_depth: Maximum nesting of containers.
+        :param max_total: Approximate maximum number of characters of the encoded values.
+        """
+        self.max_items = max_items if max_items is not None else sys.maxsize
+        self.max_keys = max_keys if max_keys is not None else sys.maxsize
+        self.max_str = max_str if max_str is not None else sys.maxsize
+        self.max_depth = max_depth if max_depth is not None else sys.maxsize
+        self.max_total = max_total if max_total is not None else sys.maxsize
+
+    @classmethod
+    def from_cfg(
+        cls, cfg: Optional[Union["EncodingBudget", Mapping]]
+    ) -> Optional["EncodingBudget"]:
+        """Create the budget from a config mapping."""
+        if cfg is None or isinstance(cfg, EncodingBudget):
+            return cfg
+        return cls(**cfg)
+
+
+class BoundedEncoding:
+    """
+    Walk objects with the encoder type dispatch while tracking the budget.  Walking stops
+    as soon as a limit is reached so objects over budget are never fully traversed.
+    """
+
+    __slots__ = ("encoder", "budget", "remaining")
+
+    def __init__(self, encoder: type, budget: EncodingBudget):
+        self.encoder = encoder
+        self.budget = budget
+        self.remaining = budget.max_total
+
+    @staticmethod
+    def _length(obj: Any) -> Optional[int]:
+        try:
+            return len(obj)
+        except TypeError:
+            return None
+
+    def encode(self, obj: Any, depth: int = 0) -> Any:
+        """
+        Encode the object within the remaining budget.
+
+        :param obj: Object to encode.
+        :param depth: Nesting depth of the object.
+        :return: Primitive encoding of the object.
+        """
+        if self.remaining <= 0:
+            return {TRUNCATED: True, "len": self._length(obj)}
+        obj_type = type(obj)
+        if obj_type is str:
+            return self._encode_str(obj)
+        if obj_type in PRIMITIVE_TYPES:
+            self.remaining -= 8
+            return obj
+        if obj_type in (bytes, bytearray):
+            return self._encode_bytes(obj)
+        kind, convert = self.encoder._classify(obj_type)
+        if kind == CONVERT:
+            return self.encode(convert(obj), depth)
+        if kind == STRING:
+            return self._encode_str(obj)
+        if kind == OTHER:
+            self.remaining -= 8
+            return obj
+        if depth >= self.budget.max_depth:
+            self.remaining -= 50
+            return {TRUNCATED: True, "type": obj_type.__name__, "len": self._length(obj)}
+        if kind == MAPPING:
+            return self._encode_mapping(obj, depth)
+        return self._encode_iterable(obj, depth)
+
+    def _encode_str(self, obj: str) -> Any:
+        max_str = min(self.budget.max_str, self.remaining)
+        if len(obj) > max_str:
+            self.remaining -= max_str + 40
+            return {TRUNCATED: True, "len": len(obj), "head": obj[:max_str]}
+        self.remaining -= len(obj) + 2
+        return obj
+
+    def _encode_bytes(self, obj: bytes) -> Any:
+        max_str = min(self.budget.max_str, self.remaining // 4)
+        if len(obj) > max_str:
+            self.remaining -= 4 * max_str + 40
+            return {TRUNCATED: True, "len": len(obj), "head": list(obj[:max_str])}
+        self.remaining -= 4 * len(obj) + 2
+        return list(obj)
+
+    def _encode_mapping(self, obj: Mapping, depth: int) -> Any:
+        max_keys = self.budget.max_keys
+        output = dict()
+        self.remaining -= 2
+        for i, (key, value) in enumerate(obj.items()):
+            if i >= max_keys or self.remaining <= 0:
+                return {TRUNCATED: True, "len": len(obj), "head": output}
+            self.remaining -= len(str(key)) + 4
+            output[key] = self.encode(value, depth + 1)
+        return output
+
+    def _encode_iterable(self, obj: Iterable, depth: int) -> Any:
+        max_items = self.budget.max_items
+        output = list()
+        self.remaining -= 2
+        for i, value in enumerate(obj):
+            if i >= max_items or self.remaining <= 0:
+                return {TRUNCATED: True, "len": self._length(obj), "head": output}
+            self.remaining -= 2
+            output.append(self.encode(value, depth + 1))
+        return output
+
+
+class SnapshotEncoder(ObjectDictEncoder):
+    """
+    Encoder used to snapshot arguments when the callable is called.  The snapshot must not
+    share any mutable objects with the arguments, so types that would be left as is raise
+    an EncoderError.  Iterables other than sequences and sets raise because encoding them
+    could consume them.
+    """
+
+    @classmethod
+    def _resolve_iterable(cls, obj_type: type) -> Callable[[type, Any], Any]:
+        if issubclass(obj_type, (Sequence, AbstractSet)):
+            return super()._resolve_iterable(obj_type)
+        return cls._resolve_other(obj_type)
+
+    @classmethod
+    def _resolve_other(cls, obj_type: type) -> Callable[[type, Any], Any]:
+        def fail(cls_, obj):
+            raise EncoderError(f"Unable to snapshot {obj_type.__qualname__}.")
+
+        return fail
+
+
+def encode_snapshot(obj: Any) -> Any:
+    """
+    Snapshot an object by encoding it to primitives.  Objects that can't be encoded are
+    deep copied.
+
+    :param obj: Object to snapshot.
+    :return: Primitive encoding or deep copy of the object.
+    """
+    try:
+        return SnapshotEncoder.encode(obj)
+    except EncoderError:
+        return copy.deepcopy(obj)
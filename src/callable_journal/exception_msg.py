@@ -1,8 +1,45 @@
 import traceback
+from typing import Dict
 
 from pydantic.main import BaseModel
 
 
+def _extract(exc: Exception):
+    """Extract the exception type, message, file and line."""
+    exc_frame = traceback.extract_tb(exc.__traceback__)[-1]
+    return exc.__class__.__name__, str(exc), exc_frame.filename, str(exc_frame.lineno)
+
+
+class ExceptionRecord:
+    """
+    Lightweight version of ExceptionMsg built for each journaled exception.
+    """
+
+    __slots__ = ("type", "msg", "file", "line")
+
+    def __init__(self, type: str, msg: str, file: str, line: str):
+        self.type = type
+        self.msg = msg
+        self.file = file
+        self.line = line
+
+    @classmethod
+    def from_exception(cls, exc: Exception) -> "ExceptionRecord":
+        """
+        Extract the subset of the exception information that will be saved in the message.
+
+        :param exc:  Exception to extract
+        """
+        return cls(*_extract(exc))
+
+    def dict(self) -> Dict[str, str]:
+        return {"type": self.type, "msg": self.msg, "file": self.file, "line": self.line}
+
+    def to_msg(self) -> "ExceptionMsg":
+        """Pydantic view of the exception."""
+        return ExceptionMsg(**self.dict())
+
+
 class ExceptionMsg(BaseModel):
     type: str
     msg: str
@@ -16,9 +53,5 @@ class ExceptionMsg(BaseModel):
 
         :param exc:  Exception to extract
         """
-        exc_type = exc.__class__.__name__
-        exc_msg = str(exc)
-        exc_frame = traceback.extract_tb(exc.__traceback__)[-1]
-        exc_file = exc_frame.filename
-        exc_line = exc_frame.lineno
+        exc_type, exc_msg, exc_file, exc_line = _extract(exc)
         return ExceptionMsg(type=exc_type, msg=exc_msg, file=exc_file, line=exc_line)
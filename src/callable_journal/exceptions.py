@@ -6,9 +6,13 @@ class ResultNameMappingError(JournalError):
     """Error mapping results."""
 
 
+class ArgumentNameError(JournalError):
+    """Argument name to copy or drop isn't a parameter of the callable."""
+
+
+class EncoderError(JournalError):
+    """Error dictionary encoding object."""
+
+
 # class FormatterError(JournalError):
 #     """Unable to format log message."""
-#
-#
-# class EncoderError(JournalError):
-#     """Error dictionary encoding object."""
@@ -1,16 +1,40 @@
 """Logging formatters to convert context, arguments and results data to log message format."""
-import json
 import logging
 from enum import Enum
 from logging import Formatter, LogRecord
-from typing import Dict, Type, Optional
+from time import perf_counter_ns
+from typing import Any, Dict, Type, Optional, Tuple, Union, Mapping
 
-from .encoders import ObjectDictEncoder, DictEncoder
+from . import profiling
+from .encoders import ObjectDictEncoder, DictEncoder, EncodingBudget
+from .json_backend import get_backend
+from .record import JournalContext, JournalRecord, LayeredContext
 
 logger = logging.getLogger(__name__)
 
 FORMAT_VERSION = "0.2.0"
 
+# Fields that are serialized to JSON strings in the STRINGY format.
+STRINGY_FIELDS = ("arguments", "results", "exception")
+
+# Fields of the message that context fields replace instead of being spliced after.
+RESERVED_FIELDS = frozenset(
+    (
+        "tag",
+        "format",
+        "objective",
+        "arguments",
+        "results",
+        "exception",
+        "sample_rate",
+        "start_time_ns",
+        "duration_ns",
+        "overhead_ns",
+        "thread_id",
+        "task_id",
+    )
+)
+
 
 class FormatMode(Enum):
     """
@@ -23,6 +47,7 @@ class FormatMode(Enum):
         (): callable_journal.formatter.JournalFormatter
         tag: JOURNAL_MSG_JSON
         format_mode: json
+        json_backend: auto
     """
 
     JSON = "json"
@@ -71,6 +96,8 @@ class JournalFormatter(Formatter):
         format_mode: str,
         *args,
         encoder: Optional[Type[DictEncoder]] = None,
+        json_backend: str = "json",
+        encoding_budget: Optional[Union[EncodingBudget, Mapping]] = None,
         **kwargs
     ):
         """
@@ -81,6 +108,11 @@ class JournalFormatter(Formatter):
         :param args: Positional arguments to pass to the logging formatter base class.
         :param encoder: Optional JSON Encoder to convert the arguments and results to
             JSON serializable primitives.
+        :param json_backend: json, orjson, msgspec or auto for the fastest one installed.
+            orjson and msgspec serialize datetimes, UUIDs, dataclasses and pydantic models
+            directly so the encoder is only used for the types they can't serialize.
+        :param encoding_budget: Limits on the size of the encoded arguments and results.
+            Values over budget are replaced by summaries.  Requires an ObjectDictEncoder.
         :param kwargs: Optional key word arguments to base to the logging formatter
             base class.
         """
@@ -88,66 +120,256 @@ class JournalFormatter(Formatter):
         format_mode = FormatMode(format_mode)
         if format_mode == FormatMode.JSON:
             self.formatter = self.format_json
+            self.serializer = self.serialize_json
         else:
             self.formatter = self.format_stringy
+            self.serializer = self.serialize_stringy
         self.encoder = encoder if encoder else ObjectDictEncoder
+        self.json = get_backend(json_backend, self.encoder)
+        self.budget = EncodingBudget.from_cfg(encoding_budget)
+        if self.budget and not issubclass(self.encoder, ObjectDictEncoder):
+            raise ValueError("encoding_budget requires an ObjectDictEncoder encoder.")
+        # Opening of the message up to the first field after the tag and format.
+        envelope = self.json.dumps({"tag": self.tag, "format": FORMAT_VERSION})
+        self.envelope_prefix = envelope[:-1]
+        # The cached context is shared by the formatters with the same encoder and backend.
+        self.context_key = (self.encoder, type(self.json))
         super().__init__(*args, **kwargs)
 
-    def to_json(self, record: LogRecord) -> Dict:
+    def message_fields(self, record: LogRecord) -> Dict:
         """
-        Format the message as a pure JSON message.
+        Encode the fields of the message that follow the tag and format except the context.
 
         :param record: Logging record.
-        :return: String representation of the context, arguments and results.
+        :return: Objective, arguments, results or exception, sample rate and timing.
         """
+        journal_content = record.journal_content
+        if isinstance(journal_content, JournalRecord):
+            content = journal_content.fields()
+        else:
+            content = dict(journal_content)
+        del content["context"]
 
-        content = self.encoder.encode(record.journal_content)
+        if self.budget:
+            # Only the arguments and results are bounded.  They share the budget.
+            bounded = self.encoder.bounded(self.budget)
+            content["arguments"] = bounded.encode(content["arguments"])
+            content["results"] = bounded.encode(content["results"])
 
-        # Unwrap the context into top level elements.  If context should
-        # be contained in a single conext element then wrap the context
-        # in {"context": {...}} when it is passed to journal_init.
-        context = content["context"] or dict()
-        del content["context"]
-        for k, v in context.items():
-            content[k] = v
+        if not self.json.native:
+            # Native backends serialize the objects and call the encoder for the rest.
+            content = self.encoder.encode(content)
+
+        # Only sampled messages have a sample rate.
+        if content.get("sample_rate") is None:
+            content.pop("sample_rate", None)
+
+        # Timing is added as top level fields when the call was timed.
+        timing = content.pop("timing", None)
+        if timing:
+            content.update(timing)
 
         # Remove the exception if there is no exception.
         if not content["exception"]:
             del content["exception"]
-        else:
-            # If there is an exception there are no results.
+        elif content["results"] is None:
+            # If there is an exception there are no results.  Generators that raise an
+            # exception have the summary of the items yielded before it.
             del content["results"]
+        return content
+
+    def context_fields(self, record: LogRecord) -> Tuple[Dict, Optional[str]]:
+        """
+        Encoded context and the context serialized as the fields of a JSON object.
+
+        The context passed to journal_init is encoded and serialized once for each encoder and
+        JSON backend and cached on the context until journal_init is called again.  The
+        fields of each journal_context layer are encoded and serialized once for the layer.
+
+        :param record: Logging record.  The journal content is a JournalRecord, a
+            JournalContent or a mapping of the message fields.
+        :return: Encoded context and the serialized fields.  The fields are None if they
+            can't be spliced into the message.
+        """
+        journal_content = record.journal_content
+        if isinstance(journal_content, Mapping):
+            context = journal_content.get("context")
+        else:
+            context = journal_content.context
+        if not isinstance(context, JournalContext):
+            # Contexts that aren't cached are merged into the message instead of spliced.
+            return self.encoder.encode(context) if context else dict(), None
+        return self.cached_context(context)
+
+    def cached_context(self, context: JournalContext) -> Tuple[Dict, Optional[str]]:
+        """Encoded and serialized context cached on the context."""
+        cached = context.cache.get(self.context_key)
+        if cached is None:
+            if isinstance(context, LayeredContext):
+                cached = self.encode_layered_context(context)
+            else:
+                cached = self.encode_context(context.value)
+            context.cache[self.context_key] = cached
+        return cached
+
+    def encode_context(self, context: Any) -> Tuple[Dict, Optional[str]]:
+        """Encode and serialize the context."""
+        # Unwrap the context into top level elements.  If context should
+        # be contained in a single conext element then wrap the context
+        # in {"context": {...}} when it is passed to journal_init.
+        encoded = self.encoder.encode(context) if context else dict()
+        return encoded, self.serialize_fields(encoded)
+
+    def encode_layered_context(self, context: LayeredContext) -> Tuple[Dict, Optional[str]]:
+        """
+        Encode the layer fields and splice them after the cached context passed to
+        journal_init.  Layer fields that replace fields of that context are serialized
+        with it.
+        """
+        if context.static is not None:
+            static_encoded, static_fragment = self.cached_context(context.static)
+        else:
+            static_encoded, static_fragment = dict(), ""
+        layer_encoded = self.encoder.encode(context.fields) if context.fields else dict()
+        encoded = {**static_encoded, **layer_encoded}
+        if static_fragment is None or any(key in static_encoded for key in layer_encoded):
+            return encoded, self.serialize_fields(encoded)
+        layer_fragment = self.serialize_fields(layer_encoded)
+        if layer_fragment is None:
+            return encoded, None
+        if not static_fragment or not layer_fragment:
+            return encoded, static_fragment or layer_fragment
+        return encoded, static_fragment + self.json.item_separator + layer_fragment
+
+    def serialize_fields(self, encoded: Dict) -> Optional[str]:
+        """
+        Serialize the encoded context as the fields of a JSON object.
+
+        :return: The fields or None if they can't be spliced into the message.
+        """
+        if any(type(key) is not str or key in RESERVED_FIELDS for key in encoded):
+            # Let the backend convert the keys and the context replace the reserved fields.
+            return None
+        dumps, key_sep = self.json.dumps, self.json.key_separator
+        return self.json.item_separator.join(
+            self.json.dumps_str(key) + key_sep + dumps(value) for key, value in encoded.items()
+        )
+
+    def content(self, record: LogRecord) -> Dict:
+        """
+        Encode the fields of the message that follow the tag and format.
+
+        :param record: Logging record.
+        :return: Objective, arguments, results or exception and the context.
+        """
+        encoded, _ = self.context_fields(record)
+        return {**self.message_fields(record), **encoded}
 
+    def to_json(self, record: LogRecord) -> Dict:
+        """
+        Format the message as a pure JSON message.
+
+        :param record: Logging record.
+        :return: String representation of the context, arguments and results.
+        """
         # record.journal_content is loaded onto the logging record from extras.
         msg = {
             "tag": self.tag,
             "format": FORMAT_VERSION,
-            **content,
+            **self.content(record),
         }
         return msg
 
     def format_json(self, record) -> str:
-        msg = self.to_json(record)
-        return json.dumps(msg)
+        """
+        Format the message as a JSON message.  The serialized context is spliced in after
+        the rest of the message is serialized.
+        """
+        encoded, fragment = self.context_fields(record)
+        return self.serialize_json(self.message_fields(record), encoded, fragment)
+
+    def serialize_json(self, content: Dict, encoded: Dict, fragment: Optional[str]) -> str:
+        """Serialize the encoded message fields and context as a JSON message."""
+        msg = {"tag": self.tag, "format": FORMAT_VERSION, **content}
+        if fragment is None:
+            msg.update(encoded)
+            return self.json.dumps(msg)
+        body = self.json.dumps(msg)
+        if not fragment:
+            return body
+        return body[:-1] + self.json.item_separator + fragment + "}"
 
     def format_stringy(self, record) -> str:
         """
         Format the message as a STRINGY JSON message.
 
+        The arguments, results and exception are serialized once and the escaped strings
+        are spliced into the envelope after the pre-rendered tag and format, followed by the
+        serialized context.  The output is the same as serializing the whole message with
+        the stringy fields as strings.
+
         :param record: Logging record.
         :return: String representation of the context, arguments and results.
         """
-        msg = self.to_json(record)
-        # Stringy the arguments, results and exceptions.
-        for field in ("arguments", "results", "exception"):
+        encoded, fragment = self.context_fields(record)
+        return self.serialize_stringy(self.message_fields(record), encoded, fragment)
+
+    def serialize_stringy(self, content: Dict, encoded: Dict, fragment: Optional[str]) -> str:
+        """Serialize the encoded message fields and context as a STRINGY JSON message."""
+        if fragment is None:
+            return self.format_stringy_envelope({**content, **encoded})
+        dumps, dumps_str = self.json.dumps, self.json.dumps_str
+        key_sep = self.json.key_separator
+        parts = [self.envelope_prefix]
+        for key, value in content.items():
+            if type(key) is not str:
+                # Let the backend convert the keys that aren't strings.
+                return self.format_stringy_envelope({**content, **encoded})
+            if key in STRINGY_FIELDS:
+                value = dumps_str(dumps(value))
+            else:
+                value = dumps(value)
+            parts.append(dumps_str(key) + key_sep + value)
+        if fragment:
+            parts.append(fragment)
+        return self.json.item_separator.join(parts) + "}"
+
+    def format_stringy_envelope(self, content: Dict) -> str:
+        """Format the message as a STRINGY JSON message by serializing the whole envelope."""
+        msg = {"tag": self.tag, "format": FORMAT_VERSION, **content}
+        for field in STRINGY_FIELDS:
             try:
-                msg[field] = json.dumps(msg[field])
+                msg[field] = self.json.dumps(msg[field])
             except KeyError:
                 pass
-        return json.dumps(msg)
+        return self.json.dumps(msg)
 
     def format(self, record) -> str:
         """Format the context, arguments and results in the JSON or STRINGY format."""
+        if profiling.enabled:
+            return self.profile_format(record)
         msg = self.formatter(record)
         record.msg = msg
         return super().format(record)
+
+    def profile_format(self, record: LogRecord) -> str:
+        """Format the message and profile the encoding and serializing separately."""
+        start = perf_counter_ns()
+        encoded, fragment = self.context_fields(record)
+        encoded_context = perf_counter_ns()
+        content = self.message_fields(record)
+        encoded_content = perf_counter_ns()
+        record.msg = self.serializer(content, encoded, fragment)
+        serialized = perf_counter_ns()
+        msg = super().format(record)
+        end = perf_counter_ns()
+        journal_content = record.journal_content
+        if isinstance(journal_content, Mapping):
+            objective = journal_content.get("objective")
+        else:
+            objective = journal_content.objective
+        profiling.record(objective, "context", encoded_context - start)
+        profiling.record(objective, "encode", encoded_content - encoded_context)
+        profiling.record(objective, "serialize", serialized - encoded_content)
+        profiling.record(objective, "format", end - start)
+        return msg
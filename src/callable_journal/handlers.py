@@ -0,0 +1,302 @@
+"""
+Buffered file handler for journal messages.
+
+The formatted messages are collected in a buffer and written to the file in one write when
+the buffer is over a byte or message threshold, when the flush interval has passed or when a
+message at ERROR or above is handled.  The file is rotated by size or age.  Errors encoding,
+writing or rotating are handled by handleError like errors formatting, and the messages of the
+failed write are dropped.
+
+Configure in the logging config file.
+handlers:
+  journal-file:
+    class: callable_journal.handlers.JournalFileHandler
+    level: INFO
+    formatter: journal-json
+    filename: journal.log
+    buffer_bytes: 1048576
+    buffer_records: 1000
+    flush_interval: 1.0
+    max_bytes: 104857600
+    rotate_interval: 86400
+    backup_count: 5
+    fsync: error
+"""
+import logging
+import os
+import threading
+import time
+import weakref
+from enum import Enum
+from logging import LogRecord
+from pathlib import Path
+from time import perf_counter_ns
+from typing import Any, List, Optional, Tuple, Union
+
+from callable_journal import profiling
+
+
+class Fsync(Enum):
+    """
+    When the file is synced to disk.
+
+    NEVER: Leave it to the operating system.
+    ERROR: After writing a buffer that was flushed by an ERROR message, and on close.
+    FLUSH: After every write, and on close.
+    """
+
+    NEVER = "never"
+    ERROR = "error"
+    FLUSH = "flush"
+
+
+class JournalFileHandler(logging.Handler):
+    """
+    Write the formatted messages to a file in batches.
+
+    The buffer is also flushed by a background thread every flush interval so messages
+    aren't held indefinitely when the journal is idle.  logging.shutdown flushes and closes
+    the handler at exit.
+    """
+
+    terminator = "\n"
+
+    def __init__(
+        self,
+        filename: Union[str, Path],
+        encoding: str = "utf-8",
+        buffer_bytes: int = 1 << 20,
+        buffer_records: int = 1000,
+        flush_interval: float = 1.0,
+        flush_level: Union[int, str] = logging.ERROR,
+        max_bytes: int = 0,
+        rotate_interval: float = 0,
+        backup_count: int = 5,
+        fsync: str = Fsync.NEVER.value,
+    ):
+        """
+        :param filename: Path of the journal file.  Messages are appended.
+        :param encoding: Encoding of the file.
+        :param buffer_bytes: Flush when the buffered messages are over this many bytes.
+        :param buffer_records: Flush when this many messages are buffered.
+        :param flush_interval: Seconds between flushes.  0 only flushes on the thresholds.
+        :param flush_level: Flush immediately after messages at this level or above.
+        :param max_bytes: Rotate the file before it grows over this many bytes.  0 doesn't
+            rotate by size.
+        :param rotate_interval: Rotate the file after this many seconds.  0 doesn't rotate
+            by time.
+        :param backup_count: Number of rotated files to keep as filename.1 to filename.N.
+            0 doesn't rotate, like logging.handlers.RotatingFileHandler.
+        :param fsync: never, error or flush.
+        """
+        super().__init__()
+        self.path = Path(filename).resolve()
+        self.encoding = encoding
+        self.buffer_bytes = buffer_bytes
+        self.buffer_records = buffer_records
+        self.flush_interval = flush_interval
+        if isinstance(flush_level, str):
+            flush_level = logging.getLevelName(flush_level)
+        self.flush_level = flush_level
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.fsync = Fsync(fsync)
+
+        self.buffer: List[Any] = list()
+        self.buffered_bytes = 0
+        self.stream = None
+        self.size = 0
+        self.opened_at = 0.0
+        self.last_flush = time.monotonic()
+        self.writes = 0
+
+        self._thread: Optional[threading.Thread] = None
+        self.start_flush_thread()
+        _handlers.add(self)
+
+    def start_flush_thread(self):
+        self._stop_flush = threading.Event()
+        if self.flush_interval > 0:
+            self._thread = threading.Thread(
+                target=self.run, name="journal-file-flush", daemon=True
+            )
+            self._thread.start()
+
+    def open(self):
+        """Open the file for appending.  Writes aren't buffered by the file object."""
+        self.stream = open(self.path, "ab", buffering=0)
+        self.size = self.stream.seek(0, os.SEEK_END)
+        self.opened_at = time.monotonic()
+        if self.size == 0:
+            header = self.header()
+            if header:
+                self.stream.write(header)
+                self.size = len(header)
+
+    def header(self) -> bytes:
+        """Bytes written at the start of a new file."""
+        return b""
+
+    def serialize(self, record: LogRecord) -> Tuple[Any, int]:
+        """
+        Convert the record to the buffered message.
+
+        :return: Formatted message and its size.  The size in characters is close enough
+            for the threshold.
+        """
+        msg = self.format(record) + self.terminator
+        return msg, len(msg)
+
+    def encode_buffer(self, buffer: List[Any]) -> bytes:
+        """Encode the buffered messages for one write."""
+        return "".join(buffer).encode(self.encoding)
+
+    def emit(self, record: LogRecord):
+        """Buffer the formatted message.  Called with the handler lock held."""
+        try:
+            msg, size = self.serialize(record)
+        except Exception:
+            self.handleError(record)
+            return
+        self.buffer.append(msg)
+        self.buffered_bytes += size
+        if record.levelno >= self.flush_level:
+            self.write(sync=self.fsync != Fsync.NEVER, record=record)
+        elif (
+            self.buffered_bytes >= self.buffer_bytes
+            or len(self.buffer) >= self.buffer_records
+            or (
+                self.flush_interval > 0
+                and time.monotonic() - self.last_flush >= self.flush_interval
+            )
+        ):
+            self.write(record=record)
+
+    def flush(self):
+        """Write the buffered messages."""
+        with self.lock:
+            self.write()
+
+    def write(self, sync: bool = False, record: Optional[LogRecord] = None):
+        """
+        Write the buffer in one write.  Called with the handler lock held.  The buffer is
+        swapped out first so messages that fail to encode or write are dropped instead of
+        failing every later write.
+
+        :param sync: Sync the file to disk after the write.
+        :param record: Record that triggered the write, for handleError.
+        """
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        buffer, self.buffer = self.buffer, list()
+        self.buffered_bytes = 0
+        try:
+            data = self.encode_buffer(buffer)
+            if profiling.enabled:
+                start = perf_counter_ns()
+                self.write_data(data, sync)
+                profiling.record(None, "write", perf_counter_ns() - start)
+            else:
+                self.write_data(data, sync)
+        except Exception:
+            if record is None:
+                record = self.error_record(
+                    "Failed to write %d journal messages to %s.", len(buffer), self.path
+                )
+            self.handleError(record)
+
+    @staticmethod
+    def error_record(msg: str, *args) -> LogRecord:
+        """Record for handleError when no message triggered the failure."""
+        return logging.makeLogRecord({"msg": msg, "args": args})
+
+    def write_data(self, data: bytes, sync: bool):
+        """Write the encoded buffer, rotating the file first if it is due."""
+        if self.stream is None:
+            self.open()
+        if self.should_rotate(len(data)):
+            self.rotate()
+        view = memoryview(data)
+        while view:
+            written = self.stream.write(view)
+            view = view[written:]
+        self.size += len(data)
+        self.writes += 1
+        if sync or self.fsync == Fsync.FLUSH:
+            os.fsync(self.stream.fileno())
+
+    def should_rotate(self, size: int) -> bool:
+        """Check if the file has to be rotated before the next size bytes are written."""
+        if self.backup_count <= 0 or self.size <= len(self.header()):
+            return False
+        if self.max_bytes and self.size + size > self.max_bytes:
+            return True
+        return bool(
+            self.rotate_interval and time.monotonic() - self.opened_at >= self.rotate_interval
+        )
+
+    def rotate(self):
+        """Close the file, shift the backups and open a new file."""
+        if self.fsync != Fsync.NEVER:
+            os.fsync(self.stream.fileno())
+        self.stream.close()
+        self.stream = None
+        for i in range(self.backup_count - 1, 0, -1):
+            source = self.backup(i)
+            if source.exists():
+                os.replace(source, self.backup(i + 1))
+        os.replace(self.path, self.backup(1))
+        self.open()
+
+    def backup(self, i: int) -> Path:
+        return self.path.with_name(f"{self.path.name}.{i}")
+
+    def run(self):
+        while not self._stop_flush.wait(self.flush_interval):
+            with self.lock:
+                if time.monotonic() - self.last_flush >= self.flush_interval:
+                    self.write()
+
+    def after_fork(self):
+        """
+        Drop the messages buffered before the fork, which the parent writes, and restart the
+        flush thread, which isn't copied to the child.
+        """
+        self.buffer.clear()
+        self.buffered_bytes = 0
+        self._thread = None
+        if not self._stop_flush.is_set():
+            self.start_flush_thread()
+
+    def close(self):
+        """Write the buffered messages, sync the file if configured and close it."""
+        self._stop_flush.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        with self.lock:
+            try:
+                self.write()
+                if self.stream is not None and self.fsync != Fsync.NEVER:
+                    os.fsync(self.stream.fileno())
+            except Exception:
+                self.handleError(self.error_record("Failed to sync %s.", self.path))
+            finally:
+                if self.stream is not None:
+                    self.stream.close()
+                    self.stream = None
+        super().close()
+
+
+# Open handlers to reset in the child of a fork.
+_handlers: "weakref.WeakSet[JournalFileHandler]" = weakref.WeakSet()
+
+
+def _after_fork():
+    for handler in list(_handlers):
+        handler.after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -1,54 +1,494 @@
 """
 Public interface to the journal decorator.
 """
+import asyncio
+import fnmatch
 import functools
+import inspect
 import logging.config
 from pathlib import Path
-from typing import Any, List, Optional, Mapping, Union, Callable
+from time import perf_counter_ns
+from typing import Any, Dict, List, Optional, Mapping, Union, Callable, Iterable, Generator
 
 import yaml
-from pydantic.main import BaseModel
 from toolz import curry
 
-from callable_journal.exception_msg import ExceptionMsg
-from callable_journal.param_arg_mapper import ParamArgMapper
+from callable_journal import profiling
+from callable_journal.array_encoders import install_array_encoders_from_cfg
+from callable_journal.context import current_layer
+from callable_journal.encoders import ObjectDictEncoder
+from callable_journal.exception_msg import ExceptionRecord
+from callable_journal.metrics import configure_metrics, flush_metrics, record_call, stop_metrics
+from callable_journal.param_arg_mapper import ParamArgMapper, BindingPlan, Capture
+from callable_journal.pipeline import start_pipeline, stop_pipeline, flush_pipeline
+from callable_journal.profiling import configure_stats
+# JournalContent is imported from here by existing consumers.
+from callable_journal.record import JournalContent, JournalRecord, ANY_JSON_SERIALIZABLE  # noqa: F401
+from callable_journal.record import CallTiming, JournalContext
+from callable_journal.sampling import SamplingPolicy, configure_sampling, policy_for
+from callable_journal.streams import StreamSummary
+from callable_journal.transport import (
+    TransportConnection,
+    flush_transport,
+    start_transport,
+    stop_transport,
+)
 
 logger = logging.getLogger("journal")
 
 
-ANY_JSON_SERIALIZABLE = Any
-
-
-class JournalContent(BaseModel):
-    """
-    Collection of context, arguments and results to be formatted into the message.
-    """
-
-    objective: str
-    context: Optional[ANY_JSON_SERIALIZABLE] = None
-    arguments: Optional[Mapping[str, Any]] = None
-    results: Optional[Mapping[str, Any]] = None
-    exception: Optional[ExceptionMsg] = None
-
-
 # Context of prepended to all messages.   Normally some version information.
 ctx = None
 
+# Time the calls of the callables that don't set timing in the decorator.
+timing_default = False
 
-def journal_init(logging_cfg_fpath: Path, context: Optional[ANY_JSON_SERIALIZABLE] = None):
+
+def journal_init(
+    logging_cfg_fpath: Path,
+    context: Optional[ANY_JSON_SERIALIZABLE] = None,
+    transport: Optional[TransportConnection] = None,
+):
     """
     Initialize the journalling subsystem.
 
+    The logging configuration file can have a journal section with the journal specific
+    options.  It is removed before the rest of the file is passed to logging.config.
+    journal:
+      pipeline:
+        queue_size: 10000
+      transport:
+        queue_size: 10000
+      sampling:
+        objective_name:
+          probability: 0.1
+      encoders:
+        decimal.Decimal: builtins.str
+      arrays:
+        mode: summary
+      timing: true
+      metrics:
+        interval: 60
+      stats:
+        interval: 60
+
     :param context: Context to prepend to all messages.
     :param logging_cfg_fpath: Path to logging configuration file.
+    :param transport: Connection to the transport of another process.  The journal lines are
+        sent to its writer instead of the handlers in the configuration file.
     """
-    global ctx
-    ctx = context
+    global ctx, timing_default
+    # A new context object so the formatters encode the context again.
+    ctx = JournalContext(context) if context is not None else None
 
     with logging_cfg_fpath.open("rt") as fp:
         logging_cfg = yaml.safe_load(fp)
+    journal_cfg = logging_cfg.pop("journal", None) or dict()
 
+    # Handle the messages queued with the old handlers before they are replaced.
+    stop_metrics()
+    stop_pipeline()
+    stop_transport(transport)
     logging.config.dictConfig(logging_cfg)
+    # The pipeline is started last so the transport's lines are formatted in the background.
+    start_transport(logger, journal_cfg.get("transport"), transport)
+    start_pipeline(logger, journal_cfg.get("pipeline"))
+    configure_metrics(journal_cfg.get("metrics"), ctx)
+    configure_stats(journal_cfg.get("stats"), ctx)
+    configure_sampling(journal_cfg.get("sampling"))
+    ObjectDictEncoder.register_from_cfg(journal_cfg.get("encoders"))
+    install_array_encoders_from_cfg(ObjectDictEncoder, journal_cfg.get("arrays"))
+    timing_default = bool(journal_cfg.get("timing", False))
+
+
+def journal_flush():
+    """
+    Journal the metrics since the last summary and wait for the messages queued by the
+    background pipeline and the transport to be handled.
+    """
+    flush_metrics()
+    flush_pipeline()
+    flush_transport()
+
+
+class CallJournal:
+    """
+    Map the arguments and results of the calls to one callable and emit the journal messages.
+    Shared by the synchronous and asynchronous wrappers.
+    """
+
+    # Summarize the items yielded by generators for the message.
+    records = True
+
+    def __init__(
+        self,
+        callable: Callable,
+        objective: str,
+        plan: BindingPlan,
+        result_names: Optional[Union[str, List[str]]] = None,
+        sample: Optional[SamplingPolicy] = None,
+        timing: Optional[bool] = None,
+        stream: Optional[Mapping] = None,
+    ):
+        self.callable = callable
+        self.objective = objective
+        self.plan = plan
+        self.result_names = result_names
+        self.sample = sample
+        self.timing = timing
+        self.stream = StreamSummary.options(stream)
+        self.is_async = inspect.iscoroutinefunction(callable) or inspect.isasyncgenfunction(
+            callable
+        )
+
+    def policy(self) -> Optional[SamplingPolicy]:
+        """Sampling policy configured for the objective or passed to the decorator."""
+        return policy_for(self.objective, self.sample)
+
+    def timed(self) -> bool:
+        """Time the call if the decorator or the journal config turned timing on."""
+        return self.timing if self.timing is not None else timing_default
+
+    def begin(self, args: Iterable, kwargs: Mapping) -> Optional[JournalRecord]:
+        """
+        Start the message with the arguments before the callable is called.
+
+        isEnabledFor is cached by the logging module and the cache is cleared whenever
+        logging levels are changed by journal_init or logging.config.  The enabled check
+        and sampling decision are made before any arguments are mapped or copied.
+
+        :return: The message or None if the call isn't journaled.
+        """
+        if not logger.isEnabledFor(logging.INFO):
+            return None
+        policy = self.policy()
+        if policy is None:
+            sample_rate = None
+        elif policy.sample():
+            sample_rate = policy.rate
+        else:
+            return None
+        if not self.timed():
+            return self.start(args, kwargs, sample_rate=sample_rate)
+        timing = CallTiming(self.task_id() if self.is_async else None)
+        msg = self.start(args, kwargs, sample_rate=sample_rate)
+        msg.timing = timing
+        timing.called()
+        return msg
+
+    @staticmethod
+    def task_id() -> Optional[int]:
+        """Id of the asyncio task running the call."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            return None
+        return id(task) if task is not None else None
+
+    def start(
+        self, args: Iterable, kwargs: Mapping, sample_rate: Optional[float] = None
+    ) -> JournalRecord:
+        """Create the message with the mapped arguments and the journal_context layers."""
+        if profiling.enabled:
+            arguments = self.profile_args(args, kwargs)
+        else:
+            arguments = self.plan.map_args(args, kwargs)
+        layer = current_layer.get()
+        return JournalRecord(
+            context=ctx if layer is None else layer.bind(ctx),
+            objective=self.objective,
+            arguments=arguments,
+            sample_rate=sample_rate,
+        )
+
+    def profile_args(self, args: Iterable, kwargs: Mapping) -> Mapping:
+        """Map the arguments and profile the binding and the copying separately."""
+        start = perf_counter_ns()
+        arguments = self.plan.bind_args(args, kwargs)
+        bound = perf_counter_ns()
+        arguments = self.plan.capture_args(arguments)
+        end = perf_counter_ns()
+        profiling.record(self.objective, "map_args", bound - start)
+        profiling.record(self.objective, "copy_args", end - bound)
+        return arguments
+
+    def emit(self, log: Callable, msg: JournalRecord):
+        """Log the message with logger.info or logger.exception."""
+        if not profiling.enabled:
+            log(msg="", extra={"journal_content": msg})
+            return
+        start = perf_counter_ns()
+        log(msg="", extra={"journal_content": msg})
+        profiling.record(self.objective, "emit", perf_counter_ns() - start)
+
+    def success(self, msg: Optional[JournalRecord], results: Any):
+        """Add the results to the message and log it."""
+        if msg is None:
+            return
+        timing = msg.timing
+        if timing is not None:
+            timing.returned()
+        if profiling.enabled:
+            start = perf_counter_ns()
+            msg.results = ParamArgMapper.map_results(results, result_names=self.result_names)
+            profiling.record(self.objective, "results", perf_counter_ns() - start)
+        else:
+            msg.results = ParamArgMapper.map_results(results, result_names=self.result_names)
+        if timing is not None:
+            timing.finished()
+        self.emit(logger.info, msg)
+
+    def summary(self) -> StreamSummary:
+        """Start the summary of the items yielded by a generator."""
+        return StreamSummary(**self.stream)
+
+    def stream_success(
+        self, msg: Optional[JournalRecord], summary: Optional[StreamSummary], exhausted: bool
+    ):
+        """Add the summary of the items to the message and log it."""
+        if msg is None:
+            return
+        timing = msg.timing
+        if timing is not None:
+            timing.returned()
+        msg.results = summary.results(exhausted)
+        if timing is not None:
+            timing.finished()
+        self.emit(logger.info, msg)
+
+    def stream_failure(
+        self,
+        msg: Optional[JournalRecord],
+        summary: Optional[StreamSummary],
+        exc: Exception,
+        args: Iterable,
+        kwargs: Mapping,
+    ):
+        """Add the summary of the items yielded before the exception and log it."""
+        if msg is not None:
+            msg.results = summary.results(exhausted=False)
+        self.failure(msg, exc, args, kwargs)
+
+    def failure(
+        self,
+        msg: Optional[JournalRecord],
+        exc: Exception,
+        args: Iterable,
+        kwargs: Mapping,
+    ):
+        """
+        Add the exception to the message and log it.
+
+        Calls that weren't journaled because the journal isn't enabled at INFO, or because
+        they weren't sampled with a policy that always journals errors, are still journaled
+        at ERROR.  The arguments are mapped after the call so copy_args can't protect them
+        from mutation, and the call isn't timed.
+        """
+        if msg is not None and msg.timing is not None:
+            msg.timing.returned()
+        if msg is None:
+            if not logger.isEnabledFor(logging.ERROR):
+                return
+            policy = self.policy()
+            if policy is None:
+                msg = self.start(args, kwargs)
+            elif policy.always_on_error:
+                # All the errors are journaled so they aren't re-weighted.
+                msg = self.start(args, kwargs, sample_rate=1.0)
+            else:
+                return
+        elif msg.sample_rate is not None and self.policy().always_on_error:
+            msg.sample_rate = 1.0
+        if profiling.enabled:
+            start = perf_counter_ns()
+            msg.exception = ExceptionRecord.from_exception(exc)
+            profiling.record(self.objective, "exception", perf_counter_ns() - start)
+        else:
+            msg.exception = ExceptionRecord.from_exception(exc)
+        if msg.timing is not None:
+            msg.timing.finished()
+        self.emit(logger.exception, msg)
+
+
+class MetricsJournal(CallJournal):
+    """
+    Count the calls and their durations in the per-objective metrics instead of journaling
+    each call.  The message started by begin is the perf_counter_ns start of the call.
+    """
+
+    records = False
+
+    def begin(self, args: Iterable, kwargs: Mapping) -> Optional[int]:
+        if not logger.isEnabledFor(logging.INFO):
+            return None
+        return perf_counter_ns()
+
+    def success(self, msg: Optional[int], results: Any):
+        if msg is not None:
+            record_call(self.objective, perf_counter_ns() - msg)
+
+    def failure(self, msg: Optional[int], exc: Exception, args: Iterable, kwargs: Mapping):
+        if msg is not None:
+            record_call(self.objective, perf_counter_ns() - msg, error=True)
+
+    def stream_success(self, msg: Optional[int], summary: None, exhausted: bool):
+        self.success(msg, None)
+
+    def stream_failure(
+        self, msg: Optional[int], summary: None, exc: Exception, args: Iterable, kwargs: Mapping
+    ):
+        self.failure(msg, exc, args, kwargs)
+
+
+def sync_wrapper(call_journal: CallJournal) -> Callable:
+    """Wrap a regular callable."""
+    callable = call_journal.callable
+
+    @functools.wraps(callable)
+    def wrapper(*args, **kwargs):
+        msg = call_journal.begin(args, kwargs)
+        try:
+            results = callable(*args, **kwargs)
+            call_journal.success(msg, results)
+            return results
+        except Exception as exc:
+            call_journal.failure(msg, exc, args, kwargs)
+            raise
+
+    return wrapper
+
+
+def coroutine_wrapper(call_journal: CallJournal) -> Callable:
+    """Wrap a coroutine function and journal the awaited results."""
+    callable = call_journal.callable
+
+    @functools.wraps(callable)
+    async def wrapper(*args, **kwargs):
+        msg = call_journal.begin(args, kwargs)
+        try:
+            results = await callable(*args, **kwargs)
+            call_journal.success(msg, results)
+            return results
+        except Exception as exc:
+            call_journal.failure(msg, exc, args, kwargs)
+            raise
+
+    return wrapper
+
+
+class SummarizedGenerator:
+    """
+    Add the items of a generator to a summary.  yield from delegates send, throw and close
+    to the generator through it.
+    """
+
+    __slots__ = ("gen", "summary")
+
+    def __init__(self, gen: Generator, summary: StreamSummary):
+        self.gen = gen
+        self.summary = summary
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = next(self.gen)
+        self.summary.add(item)
+        return item
+
+    def send(self, value: Any):
+        item = self.gen.send(value)
+        self.summary.add(item)
+        return item
+
+    def throw(self, *exc_info):
+        item = self.gen.throw(*exc_info)
+        self.summary.add(item)
+        return item
+
+    def close(self):
+        self.gen.close()
+
+
+def generator_wrapper(call_journal: CallJournal) -> Callable:
+    """
+    Wrap a generator function.  A summary of the items yielded is journaled when the
+    generator is exhausted, closed or raises an exception.  Values sent and exceptions thrown
+    into the wrapper are sent and thrown into the generator.
+    """
+    callable = call_journal.callable
+
+    @functools.wraps(callable)
+    def wrapper(*args, **kwargs):
+        msg = call_journal.begin(args, kwargs)
+        gen = callable(*args, **kwargs)
+        summary = call_journal.summary() if msg is not None and call_journal.records else None
+        try:
+            if summary is None:
+                value = yield from gen
+            else:
+                value = yield from SummarizedGenerator(gen, summary)
+        except GeneratorExit:
+            call_journal.stream_success(msg, summary, exhausted=False)
+            raise
+        except Exception as exc:
+            call_journal.stream_failure(msg, summary, exc, args, kwargs)
+            raise
+        else:
+            call_journal.stream_success(msg, summary, exhausted=True)
+            return value
+        finally:
+            gen.close()
+
+    return wrapper
+
+
+def async_generator_wrapper(call_journal: CallJournal) -> Callable:
+    """
+    Wrap an async generator function.  A summary of the items yielded is journaled when the
+    generator is exhausted, closed or raises an exception.  Values sent and exceptions thrown
+    into the wrapper are sent and thrown into the generator, as yield from would.
+    """
+    callable = call_journal.callable
+
+    @functools.wraps(callable)
+    async def wrapper(*args, **kwargs):
+        msg = call_journal.begin(args, kwargs)
+        agen = callable(*args, **kwargs)
+        summary = call_journal.summary() if msg is not None and call_journal.records else None
+        try:
+            sent, thrown = None, None
+            while True:
+                try:
+                    if thrown is None:
+                        item = await agen.asend(sent)
+                    else:
+                        item = await agen.athrow(thrown)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    # Don't keep a reference to the exception and its traceback.
+                    thrown = None
+                if summary is not None:
+                    summary.add(item)
+                try:
+                    sent = yield item
+                except GeneratorExit:
+                    raise
+                except BaseException as exc:
+                    thrown = exc
+        except GeneratorExit:
+            call_journal.stream_success(msg, summary, exhausted=False)
+            raise
+        except Exception as exc:
+            call_journal.stream_failure(msg, summary, exc, args, kwargs)
+            raise
+        else:
+            call_journal.stream_success(msg, summary, exhausted=True)
+        finally:
+            await agen.aclose()
+
+    return wrapper
 
 
 @curry
@@ -58,13 +498,24 @@ def journal(
     objective: Optional[str] = None,
     result_names: Optional[Union[str, List[str]]] = None,
     copy_args: Optional[Union[str, List[str]]] = None,
-    drop_args: Optional[Union[str, List[str]]] = None
+    drop_args: Optional[Union[str, List[str]]] = None,
+    capture: str = Capture.DEEPCOPY.value,
+    sample: Optional[Union[SamplingPolicy, Mapping, float]] = None,
+    timing: Optional[bool] = None,
+    metrics: bool = False,
+    stream: Optional[Mapping] = None
 ):
     """
     Callable journal decorator.   Decorating a callable will generate a log message containing
     the journalling context, callable arguments and callable results.  Results can be named by
     passing a list of positional names for each of the results.
 
+    Coroutine functions are journaled when the coroutine completes.  Generator and async
+    generator functions are journaled with a summary of the yielded items when the generator
+    is exhausted, closed or raises an exception.
+    Only the arguments and results are mapped on the event loop.  Encoding and emitting is
+    done by the logging handlers, so configure a non-blocking handler to keep it off the loop.
+
     :param callable: Callable being decorated.
     :param objective: Object of the callable used to identify what callable a message applies to.
         Defaults to the callable name if not provided.
@@ -74,32 +525,106 @@ def journal(
         mutation by the callable.
     :param drop_args: Name or list of names of arguments that should be dropped from the message.  Useful for
         large objects or arguments that contain sensitive data.
+    :param capture: deepcopy the copy_args or encode them to primitives when the callable
+        is called.  Encoding is cheaper for large arguments and falls back to deepcopy for
+        the arguments that can't be encoded.
+    :param sample: Sampling policy, policy config or probability of journaling a call.  A policy
+        configured for the objective in the journal config replaces it.
+    :param timing: Add the duration of the call, the journal overhead, the start time and the
+        thread and task ids to the message.  Defaults to the timing option of the journal config.
+    :param metrics: Count the calls, errors and durations in the per-objective metrics that are
+        journaled periodically in a summary message instead of journaling each call.  The
+        arguments and results aren't journaled and sample and timing are ignored.
+    :param stream: Number of the first and last items yielded by a generator to journal and
+        the size of a uniform sample of the items.  {"head": 5, "tail": 5, "sample": 0}
 
-    :return: Callable wrapping the callable.
+    :return: Callable wrapping the callable.  The call journal is its __journal__ attribute.
+    :raises ArgumentNameError: If a copy or drop argument isn't a parameter of the callable.
     """
+    plan = ParamArgMapper.plan(
+        callable, copy_args=copy_args, drop_args=drop_args, capture=capture
+    )
+    call_journal = (MetricsJournal if metrics else CallJournal)(
+        callable,
+        objective or callable.__name__,
+        plan,
+        result_names=result_names,
+        sample=SamplingPolicy.from_cfg(sample) if sample is not None else None,
+        timing=timing,
+        stream=stream,
+    )
+    if inspect.isasyncgenfunction(callable):
+        wrapper = async_generator_wrapper(call_journal)
+    elif inspect.isgeneratorfunction(callable):
+        wrapper = generator_wrapper(call_journal)
+    elif inspect.iscoroutinefunction(callable):
+        wrapper = coroutine_wrapper(call_journal)
+    else:
+        wrapper = sync_wrapper(call_journal)
+    # The objective, result names and plan are used to replay the journaled calls.
+    wrapper.__journal__ = call_journal
+    return wrapper
 
-    @functools.wraps(callable)
-    def wrapper(*args, **kwargs):
-        objective_name = objective or callable.__name__
-        args_data = ParamArgMapper.map_args(
-            callable, args, kwargs, copy_args=copy_args, drop_args=drop_args
-        )
-        msg = JournalContent(
-            context=ctx,
-            objective=objective_name,
-            arguments=args_data,
-        )
-        try:
-            results = callable(*args, **kwargs)
-            results_data = ParamArgMapper.map_results(
-                results, result_names=result_names
-            )
-            msg.results = results_data
-            logger.info(msg="", extra={"journal_content": msg})
-            return results
-        except Exception as exc:
-            msg.exception = ExceptionMsg.from_exception(exc)
-            logger.exception(msg="", extra={"journal_content": msg})
-            raise
 
-    return wrapper
+def _matches(name: str, patterns: List[str]) -> bool:
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+
+@curry
+def journal_class(
+    cls: type,
+    *,
+    include: Optional[Union[str, List[str]]] = None,
+    exclude: Optional[Union[str, List[str]]] = None,
+    overrides: Optional[Mapping[str, Mapping[str, Any]]] = None,
+    **options: Any
+):
+    """
+    Class journal decorator.  Decorate the methods defined by the class with journal.
+
+    The binding plan of each method is compiled once when the class is decorated.  self and
+    cls are left out of the plans instead of being mapped and removed on each call.  Static
+    and class methods are journaled with the function they wrap.  Properties, nested
+    classes, other attributes and methods already decorated with journal are left alone.
+
+    :param cls: Class being decorated.
+    :param include: fnmatch pattern or patterns of the names of the methods to journal.
+        Defaults to the public methods, the names that don't start with _.
+    :param exclude: fnmatch pattern or patterns of the names of the methods not to journal.
+    :param overrides: Journal options of individual methods by method name.  They replace
+        the options passed to journal_class.
+    :param options: Journal options of all the methods, like copy_args or timing.  The
+        objective defaults to the class name and the method name, Class.method.
+    :return: The class with the methods replaced.
+    :raises ValueError: If an override names a method that isn't journaled.
+    :raises ArgumentNameError: If a copy or drop argument isn't a parameter of a method.
+    """
+    include = ParamArgMapper.to_iterable(include) or ["[!_]*"]
+    exclude = ParamArgMapper.to_iterable(exclude)
+    overrides = overrides or dict()
+    journaled: Dict[str, Any] = dict()
+    for name, attr in vars(cls).items():
+        if not _matches(name, include) or _matches(name, exclude):
+            continue
+        if isinstance(attr, (staticmethod, classmethod)):
+            wrapper_type, func = type(attr), attr.__func__
+        elif inspect.isfunction(attr):
+            wrapper_type, func = None, attr
+        else:
+            continue
+        if hasattr(func, "__journal__"):
+            continue
+        method_options = {"objective": f"{cls.__name__}.{name}", **options}
+        method_options.update(overrides.get(name, ()))
+        wrapper = journal.func(func, **method_options)
+        journaled[name] = wrapper if wrapper_type is None else wrapper_type(wrapper)
+
+    unknown = sorted(set(overrides) - set(journaled))
+    if unknown:
+        raise ValueError(
+            f"overrides {unknown} are not journaled methods of {cls.__qualname__}: "
+            f"{sorted(journaled)}."
+        )
+    for name, method in journaled.items():
+        setattr(cls, name, method)
+    return cls
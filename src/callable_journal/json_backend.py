@@ -0,0 +1,155 @@
+"""
+JSON serialization backends for the formatter.  orjson and msgspec are used when they
+are installed.  Otherwise the standard library json module is used.
+
+Configure in the logging config file.
+formatters:
+
+  journal-json:
+    (): callable_journal.formatter.JournalFormatter
+    tag: JOURNAL_MSG_JSON
+    format_mode: json
+    json_backend: auto
+"""
+import json
+from json.encoder import encode_basestring_ascii
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Type, Optional
+
+from .encoders import ObjectDictEncoder, DictEncoder
+
+
+class JsonBackend(ABC):
+    """
+    Serialize encoded messages to JSON strings.
+
+    Native backends serialize datetimes, UUIDs, dataclasses and pydantic models directly
+    so the messages don't need to be encoded to primitives first.  Anything they can't
+    serialize is passed to the encoder.
+    """
+
+    name = ""
+    native = False
+    # Separators used between items and between keys and values.
+    item_separator = ", "
+    key_separator = ": "
+
+    def __init__(self, encoder: Type[DictEncoder] = ObjectDictEncoder):
+        self.encoder = encoder
+
+    @classmethod
+    def available(cls) -> bool:
+        """Check if the backend library is installed."""
+        return True
+
+    def default(self, obj: Any) -> Any:
+        """Encode objects the backend can't serialize."""
+        encoded = self.encoder.encode(obj)
+        if encoded is obj:
+            raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+        return encoded
+
+    @abstractmethod
+    def dumps(self, obj: Any) -> str:
+        """Serialize the object to a JSON string."""
+
+    def dumps_str(self, value: str) -> str:
+        """Serialize a string to a quoted and escaped JSON string."""
+        return self.dumps(value)
+
+
+class StdlibJsonBackend(JsonBackend):
+    """Standard library json module."""
+
+    name = "json"
+
+    def dumps(self, obj: Any) -> str:
+        return json.dumps(obj)
+
+    def dumps_str(self, value: str) -> str:
+        # Same escaping json.dumps uses for a str with the default ensure_ascii.
+        return encode_basestring_ascii(value)
+
+
+class OrjsonBackend(JsonBackend):
+    """orjson backend.  Output is compact JSON."""
+
+    name = "orjson"
+    native = True
+    item_separator = ","
+    key_separator = ":"
+
+    def __init__(self, encoder: Type[DictEncoder] = ObjectDictEncoder):
+        super().__init__(encoder)
+        import orjson
+
+        self._dumps = orjson.dumps
+        self._option = orjson.OPT_NON_STR_KEYS
+
+    @classmethod
+    def available(cls) -> bool:
+        try:
+            import orjson  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def dumps(self, obj: Any) -> str:
+        return self._dumps(obj, default=self.default, option=self._option).decode()
+
+
+class MsgspecBackend(JsonBackend):
+    """msgspec backend.  Output is compact JSON."""
+
+    name = "msgspec"
+    native = True
+    item_separator = ","
+    key_separator = ":"
+
+    def __init__(self, encoder: Type[DictEncoder] = ObjectDictEncoder):
+        super().__init__(encoder)
+        import msgspec
+
+        self._encode = msgspec.json.Encoder(enc_hook=self.default).encode
+
+    @classmethod
+    def available(cls) -> bool:
+        try:
+            import msgspec  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def dumps(self, obj: Any) -> str:
+        return self._encode(obj).decode()
+
+
+BACKENDS: Dict[str, Type[JsonBackend]] = {
+    backend.name: backend for backend in (StdlibJsonBackend, OrjsonBackend, MsgspecBackend)
+}
+
+# Order the backends are tried in for auto.
+AUTO_ORDER = (OrjsonBackend, MsgspecBackend, StdlibJsonBackend)
+
+
+def get_backend(
+    name: str = "json", encoder: Optional[Type[DictEncoder]] = None
+) -> JsonBackend:
+    """
+    Create the JSON backend.
+
+    :param name: json, orjson, msgspec or auto for the fastest installed backend.
+    :param encoder: Encoder for the objects the backend can't serialize.
+    :return: JSON backend.
+    """
+    encoder = encoder if encoder else ObjectDictEncoder
+    if name == "auto":
+        backend = next(backend for backend in AUTO_ORDER if backend.available())
+        return backend(encoder)
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown JSON backend: {name}.  Options: {sorted(BACKENDS)} or auto.")
+    if not backend.available():
+        raise ValueError(f"JSON backend {name} is not installed.")
+    return backend(encoder)
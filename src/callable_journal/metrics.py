@@ -0,0 +1,261 @@
+"""
+Per objective metrics for callables journaled in metrics mode.
+
+Metrics mode journals the number of calls, the errors and a latency histogram for each
+objective instead of a message per call.  Each thread updates its own shard of the
+counters so the calls don't take a lock.  A background thread periodically sums the
+shards and journals one summary message with the objective __metrics__.
+
+Configure in the journal section of the logging config file.
+journal:
+  metrics:
+    interval: 60
+    bounds_ns: [1000, 10000, 100000, 1000000]
+"""
+import atexit
+import bisect
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from callable_journal.record import JournalRecord
+
+logger = logging.getLogger("journal")
+
+METRICS_OBJECTIVE = "__metrics__"
+
+# Upper bounds of the latency buckets.  1, 2 and 5 steps from 1 microsecond to 50 seconds.
+DEFAULT_BOUNDS_NS = tuple(m * 10 ** e for e in range(3, 11) for m in (1, 2, 5))
+
+QUANTILES = (("p50_ns", 0.5), ("p90_ns", 0.9), ("p99_ns", 0.99))
+
+
+class MetricsShard:
+    """Counters and latency histogram of one objective updated by one thread."""
+
+    __slots__ = ("calls", "errors", "total_ns", "buckets")
+
+    def __init__(self, size: int):
+        self.calls = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.buckets = [0] * size
+
+    def record(self, duration_ns: int, bounds: Tuple[int, ...], error: bool):
+        self.calls += 1
+        if error:
+            self.errors += 1
+        self.total_ns += duration_ns
+        self.buckets[bisect.bisect_left(bounds, duration_ns)] += 1
+
+    def totals(self) -> List[int]:
+        """Calls, errors, total duration and the bucket counts."""
+        return [self.calls, self.errors, self.total_ns, *self.buckets]
+
+
+class MetricsAggregator:
+    """
+    Aggregate the calls to the metrics mode callables and journal the summaries.
+
+    The shards are never reset.  Each flush journals the difference from the totals of the
+    previous flush, so the flush thread only reads the counters the calling threads write.
+    The shards of the threads that have exited are folded into the retired totals and
+    dropped when the totals are summed, so short lived threads don't accumulate shards.
+    """
+
+    def __init__(
+        self,
+        interval: float = 60.0,
+        bounds_ns: Iterable[int] = DEFAULT_BOUNDS_NS,
+        context: Any = None,
+    ):
+        """
+        :param interval: Seconds between the summary messages.
+        :param bounds_ns: Upper bounds of the latency histogram buckets in nanoseconds.
+            Durations over the last bound are counted in an overflow bucket.
+        :param context: Context of the summary messages.
+        """
+        self.interval = interval
+        self.bounds = tuple(sorted(bounds_ns))
+        self.context = context
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, str, MetricsShard]] = list()
+        self._retired: Dict[str, List[int]] = dict()
+        self._previous: Dict[str, List[int]] = dict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_cfg(cls, cfg: Optional[Mapping], context: Any = None) -> "MetricsAggregator":
+        """Create the aggregator from the metrics section of the journal config."""
+        return cls(context=context, **(cfg or dict()))
+
+    def shard(self, objective: str) -> MetricsShard:
+        """Shard of the objective for the calling thread."""
+        try:
+            shards = self._local.shards
+        except AttributeError:
+            shards = self._local.shards = dict()
+        shard = shards.get(objective)
+        if shard is None:
+            shard = shards[objective] = MetricsShard(len(self.bounds) + 1)
+            with self._lock:
+                self._shards.append((threading.current_thread(), objective, shard))
+                if self._thread is None:
+                    self.start()
+        return shard
+
+    def record(self, objective: str, duration_ns: int, error: bool = False):
+        """Count a call to the objective."""
+        self.shard(objective).record(duration_ns, self.bounds, error)
+
+    def totals(self) -> Dict[str, List[int]]:
+        """Sum the shards of each objective and retire the shards of the exited threads."""
+        with self._lock:
+            shards = list()
+            for thread, objective, shard in self._shards:
+                if thread.is_alive():
+                    shards.append((thread, objective, shard))
+                else:
+                    # The thread won't count more calls, keep its counts without the shard.
+                    add_totals(self._retired, objective, shard.totals())
+            self._shards = shards
+            totals = dict(self._retired)
+        for _, objective, shard in shards:
+            add_totals(totals, objective, shard.totals())
+        return totals
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """Summaries of the objectives called since the last collection."""
+        summaries = dict()
+        for objective, row in self.totals().items():
+            previous = self._previous.get(objective)
+            delta = row if previous is None else [a - b for a, b in zip(row, previous)]
+            self._previous[objective] = row
+            if delta[0]:
+                summaries[objective] = self.summarize(delta)
+        return summaries
+
+    def summarize(self, delta: List[int]) -> Dict[str, Any]:
+        """Summarize the counters and histogram of one objective."""
+        calls, errors, total_ns, buckets = delta[0], delta[1], delta[2], delta[3:]
+        summary = {
+            "calls": calls,
+            "errors": errors,
+            "error_rate": errors / calls,
+            "mean_ns": total_ns // calls,
+        }
+        for name, quantile in QUANTILES:
+            summary[name] = self.percentile(buckets, calls, quantile)
+        # Upper bound and count of the buckets with calls.  The overflow bucket has no bound.
+        summary["histogram"] = [
+            [self.bounds[i] if i < len(self.bounds) else None, count]
+            for i, count in enumerate(buckets)
+            if count
+        ]
+        return summary
+
+    def percentile(self, buckets: List[int], calls: int, quantile: float) -> int:
+        """Estimate a percentile by interpolating within the bucket it falls in."""
+        rank = quantile * calls
+        cumulative = 0
+        for i, count in enumerate(buckets):
+            if count and cumulative + count >= rank:
+                if i == len(self.bounds):
+                    # Nothing is known about the overflow bucket except its lower bound.
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i else 0
+                upper = self.bounds[i]
+                return int(lower + (upper - lower) * (rank - cumulative) / count)
+            cumulative += count
+        return 0
+
+    def flush(self):
+        """Journal the summary of the calls since the last flush."""
+        with self._flush_lock:
+            now = time.monotonic()
+            interval, self._last_flush = now - self._last_flush, now
+            summaries = self.collect()
+        if not summaries:
+            return
+        msg = JournalRecord(
+            objective=METRICS_OBJECTIVE,
+            context=self.context,
+            arguments={"interval_s": round(interval, 3)},
+            results=summaries,
+        )
+        logger.info(msg="", extra={"journal_content": msg})
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def start(self):
+        """Start the flush thread.  Started by the first call that is counted."""
+        global _atexit_registered
+        if not _atexit_registered:
+            atexit.register(stop_metrics)
+            _atexit_registered = True
+        self._thread = threading.Thread(target=self.run, name="journal-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread and journal the calls since the last flush."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+
+def add_totals(totals: Dict[str, List[int]], objective: str, row: List[int]):
+    """Add a row of shard totals to the totals of the objective."""
+    current = totals.get(objective)
+    totals[objective] = row if current is None else [a + b for a, b in zip(current, row)]
+
+
+# Aggregator of the metrics mode callables.  Replaced by journal_init.
+_aggregator = MetricsAggregator()
+_atexit_registered = False
+
+
+def configure_metrics(cfg: Optional[Mapping], context: Any = None) -> MetricsAggregator:
+    """Replace the aggregator with one from the metrics section of the journal config."""
+    global _aggregator
+    _aggregator.stop()
+    _aggregator = MetricsAggregator.from_cfg(cfg, context)
+    return _aggregator
+
+
+def stop_metrics():
+    """Journal the calls since the last flush and stop the flush thread."""
+    _aggregator.stop()
+
+
+def flush_metrics():
+    """Journal the calls since the last flush."""
+    _aggregator.flush()
+
+
+def record_call(objective: str, duration_ns: int, error: bool = False):
+    """Count a call to a metrics mode callable."""
+    _aggregator.record(objective, duration_ns, error)
+
+
+def _after_fork():
+    """
+    Start the child of a fork with empty metrics.  The parent journals the calls counted
+    before the fork and the flush thread isn't copied to the child.
+    """
+    global _aggregator
+    _aggregator = MetricsAggregator(
+        interval=_aggregator.interval, bounds_ns=_aggregator.bounds, context=_aggregator.context
+    )
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
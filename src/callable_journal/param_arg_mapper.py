@@ -1,8 +1,11 @@
 import copy
-from inspect import getcallargs
-from typing import Iterable, Mapping, Callable, Optional, List, Union, Tuple, Any
+import inspect
+from enum import Enum
+from inspect import getcallargs, Parameter
+from typing import Iterable, Mapping, Callable, Optional, List, Union, Tuple, Any, Dict
 
-from callable_journal.exceptions import ResultNameMappingError
+from callable_journal.encoders import encode_snapshot
+from callable_journal.exceptions import ResultNameMappingError, ArgumentNameError
 
 
 class CopyAllArgs:
@@ -21,6 +24,262 @@ class DropResult:
 DROP_RESULT = DropResult()
 
 
+class Capture(Enum):
+    """
+    How the copy_args are captured when the callable is called.
+
+    DEEPCOPY: Deep copy the arguments.
+    ENCODE: Encode the arguments to primitives.  This is a copy that shares nothing with the
+        arguments and doesn't copy attributes the encoder would throw away.  Arguments that
+        can't be encoded are deep copied.
+    """
+
+    DEEPCOPY = "deepcopy"
+    ENCODE = "encode"
+
+
+CAPTURES = {Capture.DEEPCOPY: copy.deepcopy, Capture.ENCODE: encode_snapshot}
+
+# Parameter names that are removed from the mapped arguments.
+BOUND_PARAM_NAMES = ("self", "cls")
+
+
+class _Required:
+    """Sentry class to indicate that a parameter has no default value."""
+    pass
+
+
+_REQUIRED = _Required()
+
+
+class _SlowPath(Exception):
+    """Raised internally when a call can't be bound by the fast path."""
+
+
+def _to_iterable(value: Optional[Union[str, List[str]]] = None) -> List[str]:
+    """Convert argument to a iterable if it isn't already iterable list of names."""
+    if not value:
+        return list()
+    value = value if isinstance(value, (list, tuple)) else [value]
+    return value
+
+
+class BindingPlan:
+    """
+    Precompiled plan to map the arguments of a call onto the parameters of a callable.
+
+    The plan is built once when the callable is decorated.  It captures the parameter
+    order, defaults, the varargs and kwargs slots, the arguments to copy or drop and
+    the self or cls parameter to remove.   Each call is then mapped without inspecting
+    the signature again.  Signatures the fast path doesn't handle, and calls that
+    don't bind, fall back to inspect.getcallargs.
+
+    A self or cls first parameter, the receiver, is left out of the plan.  Its argument is
+    skipped instead of being mapped and deleted, and the receiver of a bound method isn't
+    prepended to the arguments at all.
+    """
+
+    __slots__ = (
+        "callable",
+        "fast",
+        "bound",
+        "positional",
+        "named",
+        "fill",
+        "varargs",
+        "varkw",
+        "strip",
+        "receiver",
+        "skip",
+        "unmapped",
+        "copy_all",
+        "copy_names",
+        "drop_names",
+        "copy",
+    )
+
+    def __init__(
+        self,
+        callable: Callable,
+        copy_args: Optional[Union[str, List[str], "CopyAllArgs"]] = None,
+        drop_args: Optional[Union[str, List[str]]] = None,
+        capture: Union[str, Capture] = Capture.DEEPCOPY,
+    ):
+        """
+        Compile the binding plan for a callable.
+
+        :param callable: Callable to map the arguments to the parameter signature.
+        :param copy_args: Name or list of names of arguments that should be copied to prevent
+            mutation by the callable.
+        :param drop_args: Name or list of names of arguments that should be dropped from the
+            message.
+        :param capture: deepcopy or encode the copy_args.
+        :raises ArgumentNameError: If a copy or drop argument isn't a parameter of the callable.
+        """
+        self.callable = callable
+        self.fast = False
+        self.bound = ()
+        self.positional = ()
+        self.named = frozenset()
+        self.fill = ()
+        self.varargs = None
+        self.varkw = None
+        self.strip = ()
+        self.receiver = None
+        self.skip = 0
+        self.unmapped = ()
+
+        copy_args = _to_iterable(copy_args)
+        self.copy_all = any(arg is COPY_ALL_ARGS for arg in copy_args)
+        self.copy_names = () if self.copy_all else tuple(copy_args)
+        self.drop_names = tuple(_to_iterable(drop_args))
+        self.copy = CAPTURES[Capture(capture)]
+
+        params = self._parameters(callable)
+        if params is None:
+            # Nothing is known about the parameters so everything is left to getcallargs.
+            return
+
+        positional, kwonly, fill = list(), list(), list()
+        for param in params:
+            default = _REQUIRED if param.default is Parameter.empty else param.default
+            if param.kind is Parameter.POSITIONAL_OR_KEYWORD:
+                positional.append(param.name)
+                fill.append((param.name, default))
+            elif param.kind is Parameter.KEYWORD_ONLY:
+                kwonly.append((param.name, default))
+            elif param.kind is Parameter.VAR_POSITIONAL:
+                self.varargs = param.name
+            elif param.kind is Parameter.VAR_KEYWORD:
+                self.varkw = param.name
+            else:
+                # Positional only parameters are left to getcallargs.
+                return
+
+        names = [param.name for param in params]
+        self.strip = tuple(name for name in names if name in BOUND_PARAM_NAMES)
+        self._validate_names(names)
+        if positional and positional[0] in BOUND_PARAM_NAMES:
+            self.receiver = positional.pop(0)
+            fill.pop(0)
+            if self.bound:
+                self.bound = ()
+            else:
+                self.skip = 1
+        self.unmapped = tuple(name for name in self.strip if name != self.receiver)
+
+        self.positional = tuple(positional)
+        self.named = frozenset(positional + [name for name, _ in kwonly])
+        self.fill = tuple(fill + kwonly)
+        self.fast = True
+
+    def _parameters(self, callable: Callable) -> Optional[List[Parameter]]:
+        """
+        Get the parameters as seen by getcallargs.  Bound methods include the bound
+        self or cls which is prepended to the positional arguments of each call.
+        """
+        func = callable
+        if inspect.ismethod(callable):
+            func = callable.__func__
+            self.bound = (callable.__self__,)
+        if not inspect.isfunction(func):
+            return None
+        try:
+            return list(inspect.signature(func, follow_wrapped=False).parameters.values())
+        except (TypeError, ValueError):
+            return None
+
+    def _validate_names(self, names: List[str]):
+        """Check that the copy and drop arguments are parameters of the callable."""
+        mappable = set(names) - set(self.strip)
+        for kind, arg_names in (("copy_args", self.copy_names), ("drop_args", self.drop_names)):
+            unknown = [name for name in arg_names if name not in mappable]
+            if unknown:
+                raise ArgumentNameError(
+                    f"{kind} {unknown} are not parameters of {self.callable.__qualname__}: "
+                    f"{sorted(mappable)}."
+                )
+
+    def _bind(self, args: Iterable, kwargs: Mapping) -> Dict[str, Any]:
+        """
+        Bind the arguments to the parameters in the same order as getcallargs.
+
+        :raises _SlowPath: If the call doesn't bind and getcallargs should report the error.
+        """
+        if self.bound:
+            args = self.bound + tuple(args)
+        elif self.skip:
+            if not args:
+                raise _SlowPath
+            args = args[1:]
+        num_args = len(args)
+        num_pos = len(self.positional)
+        arg_map = dict(zip(self.positional, args))
+        if self.varargs:
+            arg_map[self.varargs] = tuple(args[num_pos:])
+        elif num_args > num_pos:
+            raise _SlowPath
+        if self.varkw:
+            extra = arg_map[self.varkw] = dict()
+        for key, value in kwargs.items():
+            if key not in self.named:
+                if not self.varkw or key == self.receiver:
+                    raise _SlowPath
+                extra[key] = value
+                continue
+            if key in arg_map:
+                raise _SlowPath
+            arg_map[key] = value
+        for name, default in self.fill[min(num_args, num_pos):]:
+            if name not in arg_map:
+                if default is _REQUIRED:
+                    raise _SlowPath
+                arg_map[name] = default
+        return arg_map
+
+    def map_args(self, args: Iterable, kwargs: Mapping) -> Dict[str, Any]:
+        """
+        Map the argument values of a call onto the parameters.
+
+        :param args: List of positional arguments.
+        :param kwargs: Dictionary of keyword arguments.
+        :return: Dictionary of the mapped arguments.
+        """
+        return self.capture_args(self.bind_args(args, kwargs))
+
+    def bind_args(self, args: Iterable, kwargs: Mapping) -> Dict[str, Any]:
+        """Map the arguments onto the parameters and drop the drop_args."""
+        if self.fast:
+            try:
+                arg_map = self._bind(args, kwargs)
+                for k in self.unmapped:
+                    del arg_map[k]
+            except _SlowPath:
+                arg_map = getcallargs(self.callable, *args, **kwargs)
+                for k in self.strip:
+                    del arg_map[k]
+        else:
+            arg_map = getcallargs(self.callable, *args, **kwargs)
+            for k in BOUND_PARAM_NAMES:
+                arg_map.pop(k, None)
+
+        for k in self.drop_names:
+            del arg_map[k]
+        return arg_map
+
+    def capture_args(self, arg_map: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy the copy_args in the mapped arguments."""
+        if self.copy_all:
+            for k, v in arg_map.items():
+                arg_map[k] = self.copy(v)
+        else:
+            for k in self.copy_names:
+                if k in arg_map:
+                    arg_map[k] = self.copy(arg_map[k])
+
+        return arg_map
+
+
 class ParamArgMapper:
     """
     Map the argument values and parameters.
@@ -29,10 +288,27 @@ class ParamArgMapper:
     @staticmethod
     def to_iterable(value: Optional[Union[str, List[str]]] = None) -> List[str]:
         """Convert argument to a iterable if it isn't already iterable list of names."""
-        if not value:
-            return list()
-        value = value if isinstance(value, (list, tuple)) else [value]
-        return value
+        return _to_iterable(value)
+
+    @classmethod
+    def plan(
+        cls,
+        callable: Callable,
+        copy_args: Optional[Union[str, List[str], CopyAllArgs]] = None,
+        drop_args: Optional[Union[str, List[str]]] = None,
+        capture: Union[str, Capture] = Capture.DEEPCOPY,
+    ) -> BindingPlan:
+        """
+        Compile the binding plan used to map the arguments of each call to the callable.
+
+        :param callable: Callable to map the arguments to the parameter signature.
+        :param copy_args: Name or list of names of arguments that should be copied to prevent
+            mutation by the callable.
+        :param drop_args: Name or list of names of arguments that should be dropped from the message.
+        :param capture: deepcopy or encode the copy_args.
+        :return: Binding plan for the callable.
+        """
+        return BindingPlan(callable, copy_args=copy_args, drop_args=drop_args, capture=capture)
 
     @classmethod
     def map_args(
@@ -48,6 +324,8 @@ class ParamArgMapper:
         exist in the parameters.  Make copies of any arguments that are mutable
         and my be changed by the wrapped callable.
 
+        This compiles a new plan on each call.  Use plan() to map many calls to the same callable.
+
         :param callable: Callable to map the arguments to the parameter signature.
         :param args: List of positional arguments.
         :param kwargs: Dictionary of keyword arguments.
@@ -57,25 +335,9 @@ class ParamArgMapper:
             large objects or arguments that contain sensitive data.
         :return: Dictionary of the mapped arguments.
         """
-        copy_args = cls.to_iterable(copy_args)
-        drop_args = cls.to_iterable(drop_args)
-        arg_map = getcallargs(callable, *args, **kwargs)
-        for k in ["self", "cls"]:
-            try:
-                del arg_map[k]
-            except KeyError:
-                pass
-
-        if copy_args:
-            if copy_args == [COPY_ALL_ARGS]:
-                copy_args = arg_map.keys()
-            for k in copy_args:
-                arg_map[k] = copy.deepcopy(arg_map[k])
-
-        for drop_arg in drop_args:
-            del arg_map[drop_arg]
-
-        return arg_map
+        return cls.plan(callable, copy_args=copy_args, drop_args=drop_args).map_args(
+            args, kwargs
+        )
 
     @classmethod
     def map_results(
@@ -0,0 +1,239 @@
+"""
+Background journaling pipeline.  The caller thread only snapshots the message and puts
+it on a bounded queue.  Encoding, formatting and writing to the sinks is done by the
+handlers of the journal logger on a background listener thread.
+
+Only the handlers attached to the journal logger are moved to the background thread.  The
+handlers of the loggers it propagates to are shared with the rest of the application and
+stay on the caller thread.  If the journal logger has no handlers of its own there is
+nothing to move, so a warning is logged and the pipeline isn't started.
+
+Configure in the journal section of the logging config file.
+journal:
+  pipeline:
+    queue_size: 10000
+    on_full: block
+    snapshot: containers
+"""
+import atexit
+import copy
+import logging
+import os
+import queue
+from enum import Enum
+from logging import LogRecord
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional, Mapping
+
+logger = logging.getLogger(__name__)
+
+
+class OnFull(Enum):
+    """What to do with a message when the queue is full."""
+
+    BLOCK = "block"
+    DROP = "drop"
+
+
+class Snapshot(Enum):
+    """
+    How the arguments and results are captured on the caller thread.
+
+    NONE: Keep references to the objects.  Only safe if they aren't mutated after the call.
+    CONTAINERS: Copy the builtin containers (dict, list, set and tuple) but share the items.
+    DEEP: Deep copy the arguments and results.
+    """
+
+    NONE = "none"
+    CONTAINERS = "containers"
+    DEEP = "deep"
+
+
+def snapshot_containers(obj: Any) -> Any:
+    """Copy the builtin containers so later mutation of them doesn't change the message."""
+    obj_type = type(obj)
+    if obj_type is dict:
+        return {k: snapshot_containers(v) for k, v in obj.items()}
+    if obj_type is list:
+        return [snapshot_containers(v) for v in obj]
+    if obj_type is tuple:
+        return tuple(snapshot_containers(v) for v in obj)
+    if obj_type is set:
+        return set(obj)
+    return obj
+
+
+SNAPSHOTS = {
+    Snapshot.NONE: None,
+    Snapshot.CONTAINERS: snapshot_containers,
+    Snapshot.DEEP: copy.deepcopy,
+}
+
+
+class JournalQueueHandler(QueueHandler):
+    """
+    Queue handler that puts the journal record on the queue without formatting it.
+    """
+
+    def __init__(
+        self,
+        queue_: queue.Queue,
+        on_full: OnFull = OnFull.BLOCK,
+        snapshot: Snapshot = Snapshot.CONTAINERS,
+    ):
+        super().__init__(queue_)
+        self.block = on_full == OnFull.BLOCK
+        self.snapshot = SNAPSHOTS[snapshot]
+        self.dropped = 0
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        """Snapshot the arguments and results.  Formatting is left to the listener."""
+        content = getattr(record, "journal_content", None)
+        if content is not None and self.snapshot is not None:
+            content.arguments = self.snapshot(content.arguments)
+            content.results = self.snapshot(content.results)
+        return record
+
+    def enqueue(self, record: LogRecord):
+        if self.block:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JournalPipeline:
+    """
+    Move the handlers of a logger behind a bounded queue serviced by a background thread.
+    """
+
+    def __init__(
+        self,
+        target: logging.Logger,
+        queue_size: int = 10000,
+        on_full: str = OnFull.BLOCK.value,
+        snapshot: str = Snapshot.CONTAINERS.value,
+    ):
+        """
+        :param target: Logger whose handlers are moved to the background thread.
+        :param queue_size: Maximum number of messages waiting to be handled.
+        :param on_full: block or drop messages when the queue is full.
+        :param snapshot: none, containers or deep snapshot of the arguments and results.
+        """
+        self.target = target
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handlers = list(target.handlers)
+        self.queue_handler = JournalQueueHandler(
+            self.queue, on_full=OnFull(on_full), snapshot=Snapshot(snapshot)
+        )
+        self.listener = QueueListener(
+            self.queue, *self.handlers, respect_handler_level=True
+        )
+        self.running = False
+
+    @classmethod
+    def from_cfg(
+        cls, target: logging.Logger, cfg: Optional[Mapping]
+    ) -> Optional["JournalPipeline"]:
+        """
+        Create the pipeline from the pipeline section of the journal config.  No pipeline is
+        created if the logger has no handlers of its own.
+        """
+        if cfg is None or not cfg.get("enabled", True):
+            return None
+        if not target.handlers:
+            logger.warning(
+                "Journal pipeline not started, logger %s has no handlers to move.", target.name
+            )
+            return None
+        options = {k: v for k, v in cfg.items() if k != "enabled"}
+        return cls(target, **options)
+
+    @property
+    def dropped(self) -> int:
+        """Number of messages dropped because the queue was full."""
+        return self.queue_handler.dropped
+
+    def start(self):
+        """Swap the logger handlers for the queue handler and start the listener."""
+        for handler in self.handlers:
+            self.target.removeHandler(handler)
+        self.target.addHandler(self.queue_handler)
+        self.listener.start()
+        self.running = True
+
+    def after_fork(self):
+        """
+        Restart the listener in the child of a fork.  The listener thread isn't copied to
+        the child and the messages queued before the fork are left to the parent.
+        """
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self.queue_handler.queue = self.queue
+        self.queue_handler.dropped = 0
+        self.listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def flush(self):
+        """Wait for all the queued messages to be handled."""
+        if self.running:
+            self.queue.join()
+
+    def stop(self):
+        """Handle the queued messages, stop the listener and restore the logger handlers."""
+        if not self.running:
+            return
+        self.running = False
+        self.listener.stop()
+        self.target.removeHandler(self.queue_handler)
+        for handler in self.handlers:
+            self.target.addHandler(handler)
+
+
+# The running pipeline.  Only one pipeline is run for the journal logger.
+_pipeline: Optional[JournalPipeline] = None
+_atexit_registered = False
+
+
+def start_pipeline(target: logging.Logger, cfg: Optional[Mapping]) -> Optional[JournalPipeline]:
+    """
+    Stop any running pipeline and start a new one if it is configured.
+
+    :param target: Logger whose handlers are moved to the background thread.
+    :param cfg: Pipeline section of the journal config.
+    :return: The running pipeline.
+    """
+    global _pipeline, _atexit_registered
+    stop_pipeline()
+    _pipeline = JournalPipeline.from_cfg(target, cfg)
+    if _pipeline is not None:
+        if not _atexit_registered:
+            # Registered after logging so it runs first and the sinks are still open.
+            atexit.register(stop_pipeline)
+            _atexit_registered = True
+        _pipeline.start()
+    return _pipeline
+
+
+def stop_pipeline():
+    """Flush and stop the running pipeline."""
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop()
+        _pipeline = None
+
+
+def flush_pipeline():
+    """Wait for the running pipeline to handle all the queued messages."""
+    if _pipeline is not None:
+        _pipeline.flush()
+
+
+def _after_fork():
+    if _pipeline is not None and _pipeline.running:
+        _pipeline.after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,219 @@
+"""
+Profile where the journal spends its time.
+
+When profiling is enabled the decorator, the formatter and the file handler add the
+nanoseconds spent in each stage of journaling a call to per-objective counters.
+
+    map_args   Bind the arguments to the parameters and drop the drop_args.
+    copy_args  Copy or encode the copy_args.
+    results    Map the results to the result names.
+    exception  Build the exception record.
+    emit       Hand the message to the journal logger.  Includes formatting and writing
+               when the handlers are called on the calling thread.
+    context    Encode and serialize the context.  Cached after the first message.
+    encode     Build the message fields and encode the arguments and results.
+    serialize  Serialize the message to JSON.
+    format     The whole formatter, including the base logging formatter.
+    write      Write a buffer of messages in the file handlers.  Not tied to an objective.
+
+When profiling is disabled each stage costs one check of a module global.  Each thread
+updates its own counters so the calls don't take a lock.
+
+Configure in the journal section of the logging config file.
+journal:
+  stats:
+    interval: 60
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from callable_journal.record import JournalRecord
+
+logger = logging.getLogger("journal")
+
+STATS_OBJECTIVE = "__journal_stats__"
+
+# Profile the stages.  Checked before every measurement.
+enabled = False
+
+# Count and nanoseconds of each objective and stage for each thread.
+_local = threading.local()
+_counters: List[Dict[Tuple[Optional[str], str], List[int]]] = list()
+_lock = threading.Lock()
+_started = time.time()
+_reporter: Optional["StatsReporter"] = None
+_atexit_registered = False
+
+
+def record(objective: Optional[str], stage: str, duration_ns: int):
+    """Add the duration of a stage to the counters of the calling thread."""
+    try:
+        counters = _local.counters
+    except AttributeError:
+        counters = _local.counters = dict()
+        with _lock:
+            _counters.append(counters)
+    counter = counters.get((objective, stage))
+    if counter is None:
+        counter = counters[(objective, stage)] = [0, 0]
+    counter[0] += 1
+    counter[1] += duration_ns
+
+
+def totals() -> Dict[Tuple[Optional[str], str], List[int]]:
+    """Sum the counters of all the threads."""
+    with _lock:
+        thread_counters = list(_counters)
+    summed = dict()
+    for counters in thread_counters:
+        # Copied in one step because the thread may be adding a counter.
+        for key, (count, total_ns) in list(counters.items()):
+            current = summed.get(key)
+            if current is None:
+                summed[key] = [count, total_ns]
+            else:
+                current[0] += count
+                current[1] += total_ns
+    return summed
+
+
+def stage_summary(count: int, total_ns: int) -> Dict[str, int]:
+    return {"count": count, "total_ns": total_ns, "mean_ns": total_ns // count if count else 0}
+
+
+def stats() -> Dict[str, Any]:
+    """
+    Cumulative time spent in each stage since profiling was enabled or reset.
+
+    :return: Whether profiling is enabled, the time the counters started, the count,
+        total and mean nanoseconds of each stage and of each stage of each objective.
+    """
+    stages, objectives = dict(), dict()
+    for (objective, stage), (count, total_ns) in sorted(
+        totals().items(), key=lambda item: (str(item[0][0]), item[0][1])
+    ):
+        stage_total = stages.setdefault(stage, [0, 0])
+        stage_total[0] += count
+        stage_total[1] += total_ns
+        if objective is not None:
+            objectives.setdefault(objective, dict())[stage] = stage_summary(count, total_ns)
+    return {
+        "enabled": enabled,
+        "since": _started,
+        "stages": {stage: stage_summary(*counter) for stage, counter in stages.items()},
+        "objectives": objectives,
+    }
+
+
+def reset_stats():
+    """Start the counters from zero."""
+    global _local, _counters, _started
+    with _lock:
+        _local = threading.local()
+        _counters = list()
+        _started = time.time()
+
+
+class StatsReporter:
+    """Periodically journal the profile in a message with the objective __journal_stats__."""
+
+    def __init__(self, interval: float, context: Any = None):
+        """
+        :param interval: Seconds between the messages.
+        :param context: Context of the messages.
+        """
+        self.interval = interval
+        self.context = context
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, name="journal-stats", daemon=True)
+
+    def report(self):
+        """Journal the profile."""
+        msg = JournalRecord(
+            objective=STATS_OBJECTIVE,
+            context=self.context,
+            arguments={"interval_s": self.interval},
+            results=stats(),
+        )
+        logger.info(msg="", extra={"journal_content": msg})
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+def enable_stats(interval: float = 0, context: Any = None):
+    """
+    Start profiling the stages.
+
+    :param interval: Seconds between the messages with the profile.  0 doesn't journal it.
+    :param context: Context of the messages.
+    """
+    global enabled, _reporter, _atexit_registered
+    stop_reporter()
+    enabled = True
+    if interval > 0:
+        if not _atexit_registered:
+            atexit.register(stop_reporter)
+            _atexit_registered = True
+        _reporter = StatsReporter(interval, context)
+        _reporter.start()
+
+
+def disable_stats():
+    """Stop profiling.  The counters are kept until they are reset."""
+    global enabled
+    stop_reporter()
+    enabled = False
+
+
+def stop_reporter():
+    global _reporter
+    if _reporter is not None:
+        _reporter.stop()
+        _reporter = None
+
+
+def configure_stats(cfg: Optional[Mapping], context: Any = None):
+    """
+    Enable profiling if the journal config has a stats section and disable it if it doesn't.
+
+    :param cfg: Stats section of the journal config.  true enables it without the messages.
+    :param context: Context of the messages with the profile.
+    """
+    if cfg is True:
+        cfg = dict()
+    if not isinstance(cfg, Mapping) or not cfg.get("enabled", True):
+        disable_stats()
+        return
+    enable_stats(interval=cfg.get("interval", 0), context=context)
+
+
+def _after_fork():
+    """
+    Start the child of a fork with empty counters.  The reporter thread isn't copied to the
+    child so a new one is started.
+    """
+    global _lock, _reporter
+    # The lock may have been held by another thread of the parent.
+    _lock = threading.Lock()
+    reset_stats()
+    if _reporter is not None:
+        _reporter = StatsReporter(_reporter.interval, _reporter.context)
+        _reporter.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,292 @@
+"""
+Query JSON lines journal files with a sidecar index.
+
+The index maps the objective, start time and whether the message has an exception to the
+offset and length of each message in the journal file.  It is stored next to the journal
+file as <journal file>.idx and is extended with only the new messages when the journal file
+has grown.  The index is rebuilt when the journal file was replaced or rewritten, which is
+detected by its device and inode and a checksum of its start and of the last indexed
+messages.  Queries read the matching messages from the memory mapped journal file, so only
+the matching messages are decoded.
+
+The start time is the start_time_ns field added by journal(timing=True).  Messages without
+it don't match queries with a time range.
+
+    index = JournalIndex("journal.log")
+    for msg in index.query(objective="price_items", has_exception=True):
+        ...
+"""
+import json
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+MAGIC = b"CJIDX2"
+# Bytes of the journal file indexed, number of index records, the journal fingerprint and the
+# device and inode of the journal file.
+INDEX_HEADER = struct.Struct("<QQIQQ")
+# Offset, length, start time, objective id and exception flag of a message.
+ENTRY = struct.Struct("<QIqIB")
+# Length of the objective name that follows it.
+OBJECTIVE = struct.Struct("<H")
+ENTRY_KIND = b"E"
+OBJECTIVE_KIND = b"O"
+# Start time of messages without one.
+NO_TIME = -1
+# Bytes at the start and at the end of the indexed part of the journal file used to detect
+# that the file was replaced.
+FINGERPRINT_SIZE = 256
+
+
+class IndexEntry(NamedTuple):
+    offset: int
+    length: int
+    start_time_ns: int
+    objective: str
+    has_exception: bool
+
+
+def fingerprint(fp, indexed_size: int) -> int:
+    """
+    Checksum of the start and the end of the indexed part of the journal file.  The start is
+    the same in files rewritten by the same service, the end is the last indexed messages.
+    """
+    fp.seek(0)
+    crc = zlib.crc32(fp.read(min(FINGERPRINT_SIZE, indexed_size)))
+    tail = max(0, indexed_size - FINGERPRINT_SIZE)
+    fp.seek(tail)
+    return zlib.crc32(fp.read(indexed_size - tail), crc)
+
+
+def file_id(fp) -> Tuple[int, int]:
+    """Device and inode of the journal file.  A rotated file is a new inode."""
+    stat = os.fstat(fp.fileno())
+    return stat.st_dev, stat.st_ino
+
+
+class JournalIndex:
+    """Sidecar index of a JSON lines journal file."""
+
+    def __init__(
+        self, fpath: Union[str, Path], index_fpath: Optional[Union[str, Path]] = None
+    ):
+        """
+        :param fpath: Path of the journal file.
+        :param index_fpath: Path of the index.  Defaults to the journal path with .idx added.
+        """
+        self.fpath = Path(fpath)
+        self.index_fpath = (
+            Path(index_fpath) if index_fpath else self.fpath.with_name(self.fpath.name + ".idx")
+        )
+        self.entries: List[IndexEntry] = list()
+        self.objectives: List[str] = list()
+        self.indexed_size = 0
+        self.records = 0
+        self.fingerprint = 0
+        self.file_id = (0, 0)
+        # End of the index records in the index file.
+        self.index_end = 0
+
+    def load(self) -> bool:
+        """
+        Load the index if it exists and still matches the journal file.
+
+        :return: True if the index was loaded.
+        """
+        try:
+            data = self.index_fpath.read_bytes()
+        except FileNotFoundError:
+            return False
+        if not data.startswith(MAGIC):
+            return False
+        indexed_size, records, saved_fingerprint, dev, ino = INDEX_HEADER.unpack_from(
+            data, len(MAGIC)
+        )
+        with self.fpath.open("rb") as fp:
+            if self.stale(fp, indexed_size, saved_fingerprint, (dev, ino)):
+                return False
+
+        entries, objectives = list(), list()
+        position = len(MAGIC) + INDEX_HEADER.size
+        entry_size, objective_size = ENTRY.size, OBJECTIVE.size
+        for _ in range(records):
+            kind = data[position : position + 1]
+            position += 1
+            if kind == ENTRY_KIND:
+                offset, length, start, objective, has_exc = ENTRY.unpack_from(data, position)
+                position += entry_size
+                entries.append(
+                    IndexEntry(offset, length, start, objectives[objective], bool(has_exc))
+                )
+            else:
+                (length,) = OBJECTIVE.unpack_from(data, position)
+                position += objective_size
+                objectives.append(data[position : position + length].decode("utf-8"))
+                position += length
+        self.entries, self.objectives = entries, objectives
+        self.indexed_size, self.records, self.fingerprint = indexed_size, records, saved_fingerprint
+        self.file_id = (dev, ino)
+        self.index_end = position
+        return True
+
+    def update(self) -> int:
+        """
+        Index the messages added to the journal file since it was last indexed.  The whole
+        file is indexed if there is no index or the file was truncated or replaced.
+
+        :return: Number of messages added to the index.
+        """
+        if not self.indexed_size and not self.load():
+            self.reset()
+        with self.fpath.open("rb") as fp:
+            if self.stale(fp, self.indexed_size, self.fingerprint, self.file_id):
+                self.reset()
+            size = fp.seek(0, 2)
+            if size == self.indexed_size:
+                return 0
+            fp.seek(self.indexed_size)
+            count, chunks = self.scan(fp)
+            self.fingerprint = fingerprint(fp, self.indexed_size)
+            self.file_id = file_id(fp)
+        self.write(chunks)
+        return count
+
+    @staticmethod
+    def stale(fp, indexed_size: int, saved_fingerprint: int, saved_id: Tuple[int, int]) -> bool:
+        """Check if the journal file was truncated, replaced or rewritten since it was indexed."""
+        if not indexed_size:
+            return False
+        if fp.seek(0, 2) < indexed_size or file_id(fp) != saved_id:
+            return True
+        return fingerprint(fp, indexed_size) != saved_fingerprint
+
+    def reset(self):
+        """Forget the index so the whole journal file is indexed."""
+        self.entries, self.objectives = list(), list()
+        self.indexed_size = self.records = self.fingerprint = 0
+        self.file_id = (0, 0)
+        with self.index_fpath.open("wb") as fp:
+            fp.write(MAGIC + INDEX_HEADER.pack(0, 0, 0, 0, 0))
+        self.index_end = len(MAGIC) + INDEX_HEADER.size
+
+    def scan(self, fp: BinaryIO) -> Tuple[int, List[bytes]]:
+        """
+        Index the complete lines from the current position of the journal file.
+
+        :return: Number of messages indexed and the index records to append.
+        """
+        ids = {objective: i for i, objective in enumerate(self.objectives)}
+        chunks = list()
+        count = 0
+        offset = self.indexed_size
+        for line in fp:
+            if not line.endswith(b"\n"):
+                # Wait for the rest of a message that is being written.
+                break
+            if line.startswith(b"{"):
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    msg = None
+                if isinstance(msg, dict):
+                    objective = str(msg.get("objective"))
+                    objective_id = ids.get(objective)
+                    if objective_id is None:
+                        objective_id = ids[objective] = len(self.objectives)
+                        self.objectives.append(objective)
+                        encoded = objective.encode("utf-8")
+                        chunks.append(OBJECTIVE_KIND + OBJECTIVE.pack(len(encoded)) + encoded)
+                    start = msg.get("start_time_ns")
+                    start = start if isinstance(start, int) else NO_TIME
+                    has_exception = bool(msg.get("exception"))
+                    length = len(line.rstrip(b"\r\n"))
+                    chunks.append(
+                        ENTRY_KIND
+                        + ENTRY.pack(offset, length, start, objective_id, has_exception)
+                    )
+                    self.entries.append(
+                        IndexEntry(offset, length, start, objective, has_exception)
+                    )
+                    count += 1
+            offset += len(line)
+        self.indexed_size = offset
+        self.records += len(chunks)
+        return count, chunks
+
+    def write(self, chunks: List[bytes]):
+        """
+        Append the records and then update the header, so an interrupted update leaves an
+        index that is still valid up to the previous update.
+        """
+        data = b"".join(chunks)
+        with self.index_fpath.open("r+b") as fp:
+            # Drop the records of an update that was interrupted.
+            fp.seek(self.index_end)
+            fp.truncate()
+            fp.write(data)
+            fp.flush()
+            fp.seek(len(MAGIC))
+            fp.write(
+                INDEX_HEADER.pack(
+                    self.indexed_size, self.records, self.fingerprint, *self.file_id
+                )
+            )
+        self.index_end += len(data)
+
+    def select(
+        self,
+        objective: Optional[str] = None,
+        start_ns: Optional[int] = None,
+        end_ns: Optional[int] = None,
+        has_exception: Optional[bool] = None,
+    ) -> Iterator[IndexEntry]:
+        """
+        Entries of the messages that match all the filters.
+
+        :param objective: Objective of the messages.
+        :param start_ns: Messages started at or after this time in nanoseconds since the epoch.
+        :param end_ns: Messages started before this time in nanoseconds since the epoch.
+        :param has_exception: Messages with or without an exception.
+        """
+        timed = start_ns is not None or end_ns is not None
+        for entry in self.entries:
+            if objective is not None and entry.objective != objective:
+                continue
+            if has_exception is not None and entry.has_exception != has_exception:
+                continue
+            if timed:
+                if entry.start_time_ns == NO_TIME:
+                    continue
+                if start_ns is not None and entry.start_time_ns < start_ns:
+                    continue
+                if end_ns is not None and entry.start_time_ns >= end_ns:
+                    continue
+            yield entry
+
+    def query(self, limit: Optional[int] = None, **filters: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Update the index and decode the messages that match the filters of select.
+
+        :param limit: Maximum number of messages.
+        :return: Iterator of the messages.
+        """
+        self.update()
+        if not self.entries:
+            return
+        with self.fpath.open("rb") as fp:
+            mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        with mm:
+            for i, entry in enumerate(self.select(**filters)):
+                if limit is not None and i >= limit:
+                    return
+                yield json.loads(mm[entry.offset : entry.offset + entry.length])
+
+
+def query(
+    fpath: Union[str, Path], limit: Optional[int] = None, **filters: Any
+) -> Iterator[Dict[str, Any]]:
+    """Query a journal file with the filters of JournalIndex.select."""
+    yield from JournalIndex(fpath).query(limit=limit, **filters)
@@ -0,0 +1,196 @@
+"""
+Journal message records.  JournalRecord is built for every journaled call and read
+directly by the formatter.  JournalContent is the pydantic view of the same fields.
+"""
+from threading import get_ident
+from time import perf_counter_ns, time_ns
+from typing import Any, Dict, Mapping, Optional
+
+from pydantic.main import BaseModel
+
+from callable_journal.encoders import ObjectDictEncoder
+from callable_journal.exception_msg import ExceptionMsg, ExceptionRecord
+
+ANY_JSON_SERIALIZABLE = Any
+
+# Cache key of the context passed to journal_init encoded to a mapping.
+MAPPING_KEY = "mapping"
+
+
+class JournalContext:
+    """
+    Context passed to journal_init.  It is the same for every message until journal_init is
+    called again, so the formatters encode and serialize it once and cache it here.
+    """
+
+    __slots__ = ("value", "cache")
+
+    def __init__(self, value: ANY_JSON_SERIALIZABLE):
+        self.value = value
+        # Encoded context and serialized fragment for each encoder and JSON backend.
+        self.cache: Dict[Any, Any] = dict()
+
+    def mapping(self) -> Mapping[str, Any]:
+        """
+        Fields of the context.  Contexts that aren't mappings, like pydantic models, are
+        encoded to a dictionary once.
+        """
+        value = self.value
+        if not value:
+            return dict()
+        if isinstance(value, Mapping):
+            return value
+        mapping = self.cache.get(MAPPING_KEY)
+        if mapping is None:
+            mapping = self.cache[MAPPING_KEY] = ObjectDictEncoder.encode(value)
+        return mapping
+
+
+class LayeredContext(JournalContext):
+    """
+    Context passed to journal_init with the fields of the journal_context layers active when
+    the call was journaled.  The formatters cache the static context and the layer fields
+    separately and splice them together, so only the layer fields are encoded for each
+    layer.
+    """
+
+    __slots__ = ("static", "fields")
+
+    def __init__(self, static: Optional[JournalContext], fields: Mapping[str, Any]):
+        super().__init__({**(static.mapping() if static is not None else dict()), **fields})
+        self.static = static
+        self.fields = fields
+
+
+def context_value(context: Any) -> ANY_JSON_SERIALIZABLE:
+    """Context passed to journal_init."""
+    return context.value if isinstance(context, JournalContext) else context
+
+
+class JournalContent(BaseModel):
+    """
+    Collection of context, arguments and results to be formatted into the message.
+    """
+
+    objective: str
+    context: Optional[ANY_JSON_SERIALIZABLE] = None
+    arguments: Optional[Mapping[str, Any]] = None
+    results: Optional[Mapping[str, Any]] = None
+    exception: Optional[ExceptionMsg] = None
+    sample_rate: Optional[float] = None
+    timing: Optional[Dict[str, Any]] = None
+
+
+class CallTiming:
+    """
+    Duration of one call to the callable and the overhead added by the journal.
+
+    perf_counter_ns marks are taken when the journal starts the message, immediately before
+    and after the callable and when the message is handed to the logger.  The duration only
+    covers the callable.  The overhead covers mapping and copying the arguments and mapping
+    the results.  Encoding and formatting are done by the handlers so they aren't included.
+    """
+
+    __slots__ = (
+        "entered",
+        "call_start",
+        "call_end",
+        "start_time_ns",
+        "overhead_ns",
+        "thread_id",
+        "task_id",
+    )
+
+    def __init__(self, task_id: Optional[int] = None):
+        self.entered = perf_counter_ns()
+        self.call_start = self.call_end = self.entered
+        self.start_time_ns = None
+        self.overhead_ns = None
+        self.thread_id = get_ident()
+        self.task_id = task_id
+
+    def called(self):
+        """Mark the start of the callable."""
+        self.start_time_ns = time_ns()
+        self.call_start = perf_counter_ns()
+
+    def returned(self):
+        """Mark the end of the callable."""
+        self.call_end = perf_counter_ns()
+
+    def finished(self):
+        """Mark the message as complete and total the overhead around the callable."""
+        self.overhead_ns = (self.call_start - self.entered) + (
+            perf_counter_ns() - self.call_end
+        )
+
+    def fields(self) -> Dict[str, Any]:
+        """Timing fields added to the message.  task_id is only set for async callables."""
+        fields = {
+            "start_time_ns": self.start_time_ns,
+            "duration_ns": self.call_end - self.call_start,
+            "overhead_ns": self.overhead_ns,
+            "thread_id": self.thread_id,
+        }
+        if self.task_id is not None:
+            fields["task_id"] = self.task_id
+        return fields
+
+
+class JournalRecord:
+    """
+    Lightweight collection of context, arguments and results to be formatted into the message.
+    All the fields come from the journal so there is no validation.
+    """
+
+    __slots__ = (
+        "objective",
+        "context",
+        "arguments",
+        "results",
+        "exception",
+        "sample_rate",
+        "timing",
+    )
+
+    def __init__(
+        self,
+        objective: str,
+        context: Optional[ANY_JSON_SERIALIZABLE] = None,
+        arguments: Optional[Mapping[str, Any]] = None,
+        results: Any = None,
+        exception: Optional[ExceptionRecord] = None,
+        sample_rate: Optional[float] = None,
+        timing: Optional[CallTiming] = None,
+    ):
+        self.objective = objective
+        self.context = context
+        self.arguments = arguments
+        self.results = results
+        self.exception = exception
+        self.sample_rate = sample_rate
+        self.timing = timing
+
+    def fields(self) -> Dict[str, Any]:
+        """Shallow dictionary of the fields in the JournalContent order."""
+        return {
+            "objective": self.objective,
+            "context": context_value(self.context),
+            "arguments": self.arguments,
+            "results": self.results,
+            "exception": self.exception.dict() if self.exception else None,
+            "sample_rate": self.sample_rate,
+            "timing": self.timing.fields() if self.timing else None,
+        }
+
+    def to_content(self) -> JournalContent:
+        """Pydantic view of the record for consumers of journal_content."""
+        return JournalContent.construct(
+            objective=self.objective,
+            context=context_value(self.context),
+            arguments=self.arguments,
+            results=self.results,
+            exception=self.exception.to_msg() if self.exception else None,
+            sample_rate=self.sample_rate,
+            timing=self.timing.fields() if self.timing else None,
+        )
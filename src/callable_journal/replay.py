@@ -0,0 +1,339 @@
+"""
+Replay journaled calls for regression and performance testing.
+
+Each message is replayed by calling the callable registered for its objective with the
+journaled arguments.  The results are mapped and encoded the way the journal maps and
+encodes them and compared to the journaled results.  Calls that were journaled with an
+exception match if the replay raises the same type of exception.  The duration of each
+replayed call is collected for each objective.
+
+    registry = ReplayRegistry()
+    registry.register_module("pricing.api")
+    report = replay(read_json_messages("journal.log"), registry, workers=4)
+
+The arguments are the encoded arguments from the message, so callables with arguments that
+aren't JSON primitives need an adapter to decode them.  Methods, calls with dropped
+arguments and results that were truncated by an encoding budget can't be replayed exactly.
+"""
+import asyncio
+import importlib
+import inspect
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from inspect import Parameter
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+from callable_journal.encoders import ObjectDictEncoder, resolve_name
+from callable_journal.metrics import METRICS_OBJECTIVE
+from callable_journal.param_arg_mapper import ParamArgMapper
+from callable_journal.profiling import STATS_OBJECTIVE
+from callable_journal.streams import StreamSummary
+
+MATCH = "match"
+MISMATCH = "mismatch"
+ERROR = "error"
+SKIPPED = "skipped"
+
+# Stream summary fields that change from run to run.
+VOLATILE_STREAM_FIELDS = ("elapsed_ns", "sample")
+
+# Objectives of the messages the journal writes about itself.  They aren't calls.
+INTERNAL_OBJECTIVES = frozenset((METRICS_OBJECTIVE, STATS_OBJECTIVE))
+
+# Mismatches kept in the report for each objective.
+MAX_MISMATCHES = 10
+
+# Chunks submitted to each worker process before their outcomes are collected.
+PENDING_CHUNKS = 2
+
+
+class ReplayRegistry:
+    """
+    Map objectives to the callables that are replayed.
+
+    Callables can be registered by dotted name so the registry can be sent to the worker
+    processes and imported there.
+    """
+
+    def __init__(self):
+        self.targets: Dict[str, Union[str, Callable]] = dict()
+        self.adapters: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = dict()
+
+    def register(
+        self,
+        objective: str,
+        target: Union[str, Callable],
+        adapter: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    ):
+        """
+        Register the callable for an objective.
+
+        :param objective: Objective of the messages.
+        :param target: Callable or dotted name of the callable.  Decorated callables are
+            replayed without journaling the replayed calls.
+        :param adapter: Convert the journaled arguments to the arguments of the call.
+        """
+        self.targets[objective] = target
+        if adapter is not None:
+            self.adapters[objective] = adapter
+
+    def register_module(self, module: Union[str, ModuleType]):
+        """Register the journal decorated callables of a module by their objectives."""
+        if isinstance(module, str):
+            module = importlib.import_module(module)
+        for name, obj in vars(module).items():
+            call_journal = getattr(obj, "__journal__", None)
+            if call_journal is not None:
+                self.register(call_journal.objective, f"{module.__name__}:{name}")
+
+    def resolve(self, objective: str) -> Optional[Callable]:
+        target = self.targets.get(objective)
+        if isinstance(target, str):
+            target = self.targets[objective] = resolve_name(target)
+        return target
+
+
+def json_field(value: Any) -> Any:
+    """Load the fields that were serialized to strings in the STRINGY format."""
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def normalize(value: Any) -> Any:
+    """Encode a value and convert it to JSON types so it compares to the journaled values."""
+    return json.loads(json.dumps(ObjectDictEncoder.encode(value)))
+
+
+def call_arguments(callable: Callable, arguments: Mapping[str, Any]) -> Tuple[list, dict]:
+    """
+    Convert the mapped arguments back into positional and keyword arguments.
+
+    :raises TypeError: If the arguments can't be bound to the parameters.
+    """
+    signature = inspect.signature(callable)
+    args, kwargs = list(), dict()
+    # Arguments are passed positionally until a positional parameter is missing.
+    positional = True
+    for param in signature.parameters.values():
+        if param.name not in arguments:
+            if param.kind in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD):
+                positional = False
+            continue
+        value = arguments[param.name]
+        if param.kind is Parameter.VAR_POSITIONAL:
+            if value and not positional:
+                raise TypeError(f"{param.name} can't be passed after a missing argument.")
+            args.extend(value)
+        elif param.kind is Parameter.VAR_KEYWORD:
+            kwargs.update(value)
+        elif positional and param.kind is not Parameter.KEYWORD_ONLY:
+            args.append(value)
+        else:
+            kwargs[param.name] = value
+    signature.bind(*args, **kwargs)
+    return args, kwargs
+
+
+def invoke(wrapper: Callable, args: list, kwargs: dict) -> Tuple[Any, int]:
+    """
+    Call the undecorated callable.
+
+    :return: Results as they are journaled and the duration in nanoseconds.
+    """
+    call_journal = getattr(wrapper, "__journal__", None)
+    callable = inspect.unwrap(wrapper) if call_journal is not None else wrapper
+    start = time.perf_counter_ns()
+    if inspect.isgeneratorfunction(callable) or inspect.isasyncgenfunction(callable):
+        summary = StreamSummary(**(call_journal.stream if call_journal else dict()))
+        if inspect.isasyncgenfunction(callable):
+
+            async def consume():
+                async for item in callable(*args, **kwargs):
+                    summary.add(item)
+
+            asyncio.run(consume())
+        else:
+            for item in callable(*args, **kwargs):
+                summary.add(item)
+        duration = time.perf_counter_ns() - start
+        return summary.results(exhausted=True), duration
+    if inspect.iscoroutinefunction(callable):
+        results = asyncio.run(callable(*args, **kwargs))
+    else:
+        results = callable(*args, **kwargs)
+    duration = time.perf_counter_ns() - start
+    if call_journal is not None:
+        results = ParamArgMapper.map_results(results, result_names=call_journal.result_names)
+    return results, duration
+
+
+def compare(expected: Any, actual: Any) -> bool:
+    """Compare the journaled and replayed results."""
+    if isinstance(expected, dict) and "exhausted" in expected and isinstance(actual, dict):
+        expected = {k: v for k, v in expected.items() if k not in VOLATILE_STREAM_FIELDS}
+        actual = {k: v for k, v in actual.items() if k not in VOLATILE_STREAM_FIELDS}
+        # Only exhausted streams can be compared item for item.
+        if not expected["exhausted"]:
+            return actual["first"][: len(expected["first"])] == expected["first"]
+    return expected == actual
+
+
+def replay_message(registry: ReplayRegistry, msg: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Replay one journaled call.
+
+    :return: Objective, status, duration in nanoseconds and the details of mismatches and
+        errors.
+    """
+    objective = msg.get("objective")
+    outcome = {"objective": objective, "status": SKIPPED, "duration_ns": None}
+    wrapper = registry.resolve(objective)
+    if wrapper is None:
+        outcome["reason"] = "not registered"
+        return outcome
+    arguments = json_field(msg.get("arguments")) or dict()
+    adapter = registry.adapters.get(objective)
+    if adapter is not None:
+        arguments = adapter(arguments)
+    try:
+        args, kwargs = call_arguments(inspect.unwrap(wrapper), arguments)
+    except TypeError as exc:
+        outcome["reason"] = str(exc)
+        return outcome
+
+    expected_exception = json_field(msg.get("exception"))
+    start = time.perf_counter_ns()
+    try:
+        results, duration = invoke(wrapper, args, kwargs)
+    except Exception as exc:
+        outcome["duration_ns"] = time.perf_counter_ns() - start
+        if expected_exception and expected_exception.get("type") == type(exc).__name__:
+            outcome["status"] = MATCH
+        else:
+            outcome["status"] = ERROR
+            outcome["expected"] = expected_exception or json_field(msg.get("results"))
+            outcome["actual"] = {"type": type(exc).__name__, "msg": str(exc)}
+        return outcome
+
+    outcome["duration_ns"] = duration
+    if expected_exception:
+        outcome["status"] = MISMATCH
+        outcome["expected"] = expected_exception
+        outcome["actual"] = normalize(results)
+        return outcome
+    expected = json_field(msg.get("results"))
+    actual = normalize(results)
+    if compare(expected, actual):
+        outcome["status"] = MATCH
+    else:
+        outcome["status"] = MISMATCH
+        outcome["expected"] = expected
+        outcome["actual"] = actual
+        outcome["arguments"] = arguments
+    return outcome
+
+
+def replay_messages(registry: ReplayRegistry, messages: List[Mapping[str, Any]]) -> List[Dict]:
+    """Replay a chunk of messages.  Run in the worker processes."""
+    return [replay_message(registry, msg) for msg in messages]
+
+
+def percentile(durations: List[int], quantile: float) -> int:
+    """Nearest rank percentile of sorted durations."""
+    rank = max(int(round(quantile * len(durations) + 0.5)) - 1, 0)
+    return durations[min(rank, len(durations) - 1)]
+
+
+class ReplayReport:
+    """Outcomes and latency distribution of the replayed calls of each objective."""
+
+    def __init__(self):
+        self.counts: Dict[str, Dict[str, int]] = dict()
+        self.durations: Dict[str, List[int]] = dict()
+        self.mismatches: Dict[str, List[Dict[str, Any]]] = dict()
+
+    def add(self, outcome: Mapping[str, Any]):
+        objective = outcome["objective"]
+        counts = self.counts.setdefault(objective, {MATCH: 0, MISMATCH: 0, ERROR: 0, SKIPPED: 0})
+        counts[outcome["status"]] += 1
+        if outcome["duration_ns"] is not None:
+            self.durations.setdefault(objective, list()).append(outcome["duration_ns"])
+        if outcome["status"] != MATCH:
+            mismatches = self.mismatches.setdefault(objective, list())
+            if len(mismatches) < MAX_MISMATCHES:
+                mismatches.append(outcome)
+
+    @property
+    def ok(self) -> bool:
+        """No mismatches or errors."""
+        return not any(counts[MISMATCH] or counts[ERROR] for counts in self.counts.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        report = dict()
+        for objective, counts in self.counts.items():
+            summary = dict(counts)
+            durations = sorted(self.durations.get(objective, ()))
+            if durations:
+                summary.update(
+                    mean_ns=sum(durations) // len(durations),
+                    p50_ns=percentile(durations, 0.5),
+                    p90_ns=percentile(durations, 0.9),
+                    p99_ns=percentile(durations, 0.99),
+                    max_ns=durations[-1],
+                )
+            if objective in self.mismatches:
+                summary["mismatches"] = self.mismatches[objective]
+            report[objective] = summary
+        return report
+
+
+def replay(
+    messages: Iterable[Mapping[str, Any]],
+    registry: ReplayRegistry,
+    workers: int = 0,
+    chunk_size: int = 100,
+) -> ReplayReport:
+    """
+    Replay journaled calls.
+
+    :param messages: Journal messages.  Metrics summaries and stats reports are skipped.
+    :param registry: Callables to replay for each objective.
+    :param workers: Number of worker processes.  0 replays in this process.
+    :param chunk_size: Number of messages sent to a worker at a time.  At most
+        PENDING_CHUNKS chunks per worker are submitted before their outcomes are collected.
+    :return: Report of the outcomes.
+    """
+    report = ReplayReport()
+    messages = (msg for msg in messages if msg.get("objective") not in INTERNAL_OBJECTIVES)
+    if not workers:
+        for msg in messages:
+            report.add(replay_message(registry, msg))
+        return report
+
+    def chunks():
+        chunk = list()
+        for msg in messages:
+            chunk.append(msg)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = list()
+        if chunk:
+            yield chunk
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Only a few chunks per worker are in flight so the journal is streamed.
+        pending = set()
+        for chunk in chunks():
+            if len(pending) >= PENDING_CHUNKS * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                add_outcomes(report, done)
+            pending.add(executor.submit(replay_messages, registry, chunk))
+        add_outcomes(report, wait(pending).done)
+    return report
+
+
+def add_outcomes(report: ReplayReport, futures: Iterable[Future]):
+    for future in futures:
+        for outcome in future.result():
+            report.add(outcome)
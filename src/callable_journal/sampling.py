@@ -0,0 +1,182 @@
+"""
+Sampling policies that decide which calls are journaled.
+
+The decision is made before the arguments are mapped or copied so unsampled calls
+cost almost nothing.  Messages carry the sample rate so counts can be re-weighted.
+
+Configure by objective in the journal section of the logging config file.  The
+configured policy replaces the policy passed to the journal decorator.
+journal:
+  sampling:
+    int_add:
+      probability: 0.1
+    int_sub:
+      every_nth: 100
+      always_on_error: false
+    int_mul:
+      rate_limit: 50
+      burst: 10
+      window: 60
+"""
+import itertools
+import math
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Mapping, Optional, Union
+
+
+class SamplingPolicy(ABC):
+    """
+    Base sampling policy.
+
+    :param always_on_error: Journal calls that raise an exception even if they weren't sampled.
+    """
+
+    def __init__(self, always_on_error: bool = True):
+        self.always_on_error = always_on_error
+
+    @abstractmethod
+    def sample(self) -> bool:
+        """Decide if the call is journaled."""
+
+    @property
+    @abstractmethod
+    def rate(self) -> float:
+        """Fraction of the calls that are journaled."""
+
+    @classmethod
+    def from_cfg(cls, cfg: Union["SamplingPolicy", Mapping, float]) -> "SamplingPolicy":
+        """
+        Create the policy from a config mapping with one of the keys probability, every_nth
+        or rate_limit.  A number is a probability.
+        """
+        if isinstance(cfg, SamplingPolicy):
+            return cfg
+        if isinstance(cfg, (int, float)):
+            return ProbabilityPolicy(cfg)
+        cfg = dict(cfg)
+        always_on_error = cfg.pop("always_on_error", True)
+        if "probability" in cfg:
+            return ProbabilityPolicy(cfg["probability"], always_on_error=always_on_error)
+        if "every_nth" in cfg:
+            return EveryNthPolicy(cfg["every_nth"], always_on_error=always_on_error)
+        if "rate_limit" in cfg:
+            return RateLimitPolicy(
+                cfg["rate_limit"],
+                burst=cfg.get("burst"),
+                window=cfg.get("window", 60.0),
+                always_on_error=always_on_error,
+            )
+        raise ValueError(f"Unknown sampling policy: {cfg}.")
+
+
+class ProbabilityPolicy(SamplingPolicy):
+    """Journal each call with a fixed probability."""
+
+    def __init__(self, probability: float, always_on_error: bool = True):
+        super().__init__(always_on_error)
+        if not 0.0 <= probability <= 1.0:
+            raise ValueError(f"Sampling probability must be between 0 and 1: {probability}.")
+        self.probability = probability
+        self._random = random.random
+
+    def sample(self) -> bool:
+        return self._random() < self.probability
+
+    @property
+    def rate(self) -> float:
+        return self.probability
+
+
+class EveryNthPolicy(SamplingPolicy):
+    """Journal every Nth call starting with the first."""
+
+    def __init__(self, n: int, always_on_error: bool = True):
+        super().__init__(always_on_error)
+        if n < 1:
+            raise ValueError(f"Sampling every_nth must be at least 1: {n}.")
+        self.n = n
+        # next() on itertools.count is atomic so no lock is needed.
+        self._count = itertools.count()
+
+    def sample(self) -> bool:
+        return next(self._count) % self.n == 0
+
+    @property
+    def rate(self) -> float:
+        return 1.0 / self.n
+
+
+class RateLimitPolicy(SamplingPolicy):
+    """
+    Journal at most rate_limit calls per second with a token bucket that allows bursts
+    of up to burst calls.  The rate is the fraction of the recent calls that were journaled.
+    The counts of the calls decay exponentially with a time constant of window seconds so
+    a burst long ago doesn't skew the current rate.
+    """
+
+    def __init__(
+        self,
+        rate_limit: float,
+        burst: Optional[float] = None,
+        window: float = 60.0,
+        always_on_error: bool = True,
+    ):
+        super().__init__(always_on_error)
+        if window <= 0:
+            raise ValueError(f"Sampling window must be positive: {window}.")
+        self.rate_limit = rate_limit
+        self.burst = burst if burst else max(rate_limit, 1.0)
+        self.window = window
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._seen = 0.0
+        self._admitted = 0.0
+        self._lock = threading.Lock()
+
+    def sample(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate_limit)
+            self._updated = now
+            if elapsed > 0:
+                decay = math.exp(-elapsed / self.window)
+                self._seen *= decay
+                self._admitted *= decay
+            self._seen += 1
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            self._admitted += 1
+            return True
+
+    @property
+    def rate(self) -> float:
+        return self._admitted / self._seen if self._seen else 1.0
+
+
+# Policies configured by objective name.  They replace the decorator policies.
+_policies: Dict[str, SamplingPolicy] = dict()
+
+
+def configure_sampling(cfg: Optional[Mapping[str, Mapping]]):
+    """
+    Replace the configured policies with the sampling section of the journal config.
+
+    :param cfg: Mapping of objective name to policy config.
+    """
+    global _policies
+    _policies = {
+        objective: SamplingPolicy.from_cfg(policy_cfg)
+        for objective, policy_cfg in (cfg or dict()).items()
+    }
+
+
+def policy_for(
+    objective: str, default: Optional[SamplingPolicy] = None
+) -> Optional[SamplingPolicy]:
+    """Get the configured policy for an objective or the default if none is configured."""
+    return _policies.get(objective, default)
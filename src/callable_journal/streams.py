@@ -0,0 +1,80 @@
+"""
+Constant memory summaries of the items yielded by generator callables.
+
+Generators are journaled with a summary of the stream instead of the items so streams of
+any length can be journaled.
+    {
+        "count": 1000000,
+        "first": [0, 1, 2, 3, 4],
+        "last": [999995, 999996, 999997, 999998, 999999],
+        "elapsed_ns": 2051934000,
+        "exhausted": true
+    }
+"""
+import random
+from collections import deque
+from time import perf_counter_ns
+from typing import Any, Dict, Mapping, Optional
+
+
+class StreamSummary:
+    """
+    Count the items yielded by a generator and keep the first and last items and an
+    optional uniform sample of them.
+
+    The first items are kept in order.  The last items are the ones after the first items so
+    no item is in both.  The sample is a reservoir sample of all the items.
+    """
+
+    __slots__ = ("count", "head", "head_size", "tail", "sample", "sample_size", "started")
+
+    def __init__(self, head: int = 5, tail: int = 5, sample: int = 0):
+        """
+        :param head: Number of first items to keep.
+        :param tail: Number of last items to keep.
+        :param sample: Size of the uniform sample of the items.  No sample when 0.
+        """
+        self.count = 0
+        self.head = list()
+        self.head_size = head
+        self.tail = deque(maxlen=tail)
+        self.sample = list()
+        self.sample_size = sample
+        self.started = perf_counter_ns()
+
+    @classmethod
+    def options(cls, cfg: Optional[Mapping]) -> Dict[str, int]:
+        """Check the head, tail and sample options passed to the decorator."""
+        options = dict(cfg or dict())
+        unknown = set(options) - {"head", "tail", "sample"}
+        if unknown:
+            raise ValueError(f"Unknown stream options: {sorted(unknown)}.")
+        return options
+
+    def add(self, item: Any):
+        """Count an item."""
+        self.count += 1
+        if len(self.head) < self.head_size:
+            self.head.append(item)
+        else:
+            self.tail.append(item)
+        if self.sample_size:
+            if len(self.sample) < self.sample_size:
+                self.sample.append(item)
+            else:
+                i = random.randrange(self.count)
+                if i < self.sample_size:
+                    self.sample[i] = item
+
+    def results(self, exhausted: bool) -> Dict[str, Any]:
+        """
+        Summary journaled as the results.
+
+        :param exhausted: The generator was exhausted rather than closed or failed.
+        """
+        results = {"count": self.count, "first": self.head, "last": list(self.tail)}
+        if self.sample_size:
+            results["sample"] = self.sample
+        results["elapsed_ns"] = perf_counter_ns() - self.started
+        results["exhausted"] = exhausted
+        return results
@@ -0,0 +1,399 @@
+"""
+Multiprocess journal transport.  Processes that write the same journal file through their own
+handlers interleave lines and contend for the file.  The transport gives one writer the
+sinks and has every process send it the formatted lines.
+
+The process that calls journal_init with a transport section owns the sinks.  The handlers of
+the journal logger are moved to a writer thread, and the journal logger sends the lines
+formatted by the handlers' formatters to a multiprocessing queue.  Processes forked after
+journal_init, like multiprocessing workers and gunicorn workers with preload, inherit the
+queue and send their lines to the writer.  Spawned processes connect with the connection of
+the transport, which has to be created with the spawn start method:
+
+    transport = journal_transport()
+    executor = ProcessPoolExecutor(
+        initializer=journal_init, initargs=(cfg_fpath, context, transport.connection())
+    )
+
+The sinks write the lines as they are received, so the handlers in the writer are given a
+formatter that passes the lines through.  Binary journal handlers serialize the messages
+themselves, so they are sent the JSON message made by their formatter instead of a line.
+
+Configure in the journal section of the logging config file.
+journal:
+  transport:
+    queue_size: 10000
+    on_full: block
+    start_method: spawn
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from logging import Formatter, Handler, LogRecord
+from time import perf_counter_ns
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from callable_journal.binary import JournalBinaryHandler, journal_message
+from callable_journal.formatter import JournalFormatter
+from callable_journal.pipeline import OnFull
+
+logger = logging.getLogger(__name__)
+
+# Formatter of the sinks in the writer.  The lines are already formatted.
+PASSTHROUGH = Formatter("%(message)s")
+# Formatter of the sinks without one, like logging.Handler.format.
+DEFAULT_FORMATTER = Formatter()
+
+# What is sent for a sink: the line formatted by its formatter, or the JSON message for the
+# binary sinks.
+LINE = "line"
+MESSAGE = "message"
+
+
+class TransportConnection(NamedTuple):
+    """What a process needs to send lines to the writer."""
+
+    queue: Any
+    # Lines dropped and puts that blocked because the queue was full, in all the processes.
+    dropped: Any
+    blocked: Any
+    on_full: str
+
+
+class JournalProcessHandler(Handler):
+    """
+    Format the messages with the formatters of the sinks and send the lines to the writer.
+
+    Each formatter formats the message once however many sinks use it.  The counters are
+    for this process.  The totals of all the processes are in the connection.
+    """
+
+    def __init__(
+        self, connection: TransportConnection, payloads: List[Tuple[str, Formatter]]
+    ):
+        """
+        :param connection: Connection to the writer.
+        :param payloads: Kind, line or message, and formatter of each payload sent.
+        """
+        super().__init__()
+        self.connection = connection
+        self.queue = connection.queue
+        self.block = OnFull(connection.on_full) == OnFull.BLOCK
+        self.payloads = payloads
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.sent = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.blocked_ns = 0
+
+    def emit(self, record: LogRecord):
+        try:
+            payloads = tuple(
+                formatter.format(record) if kind == LINE else journal_message(formatter, record)
+                for kind, formatter in self.payloads
+            )
+            self.send((record.levelno, payloads))
+        except Exception:
+            self.handleError(record)
+
+    def send(self, item: Tuple[int, Tuple[Any, ...]]):
+        """Put the lines on the queue and count the puts that dropped or waited."""
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            if not self.block:
+                self.dropped += 1
+                with self.connection.dropped.get_lock():
+                    self.connection.dropped.value += 1
+                return
+            self.blocked += 1
+            with self.connection.blocked.get_lock():
+                self.connection.blocked.value += 1
+            start = perf_counter_ns()
+            self.queue.put(item)
+            self.blocked_ns += perf_counter_ns() - start
+        self.sent += 1
+
+
+class JournalTransport:
+    """
+    Send the journal lines of all the processes to the sinks of the owner process.
+    """
+
+    def __init__(
+        self,
+        target: logging.Logger,
+        queue_size: int = 10000,
+        on_full: str = OnFull.BLOCK.value,
+        start_method: Optional[str] = None,
+        connection: Optional[TransportConnection] = None,
+    ):
+        """
+        :param target: Logger whose handlers are the sinks.
+        :param queue_size: Maximum number of messages waiting for the writer.
+        :param on_full: block or drop messages when the queue is full.
+        :param start_method: multiprocessing start method of the context the queue is
+            created in.  Forked processes can use a queue from any context, spawned
+            processes only one from the spawn context.  Defaults to the default context.
+        :param connection: Connection to the writer of another process.  The process owns
+            the sinks and runs the writer if there isn't one.
+        """
+        self.target = target
+        self.sinks = list(target.handlers)
+        self.owner = connection is None
+        if connection is None:
+            context = multiprocessing.get_context(start_method)
+            connection = TransportConnection(
+                queue=context.JoinableQueue(queue_size),
+                dropped=context.Value("Q", 0),
+                blocked=context.Value("Q", 0),
+                on_full=OnFull(on_full).value,
+            )
+        self._connection = connection
+        self.queue = connection.queue
+
+        # Each distinct payload is made once.  Sinks use the payload of theirs.
+        payloads: List[Tuple[str, Formatter]] = list()
+        self.sink_payloads: List[int] = list()
+        for sink in self.sinks:
+            payload = self.payload(sink)
+            if payload not in payloads:
+                payloads.append(payload)
+            self.sink_payloads.append(payloads.index(payload))
+        self.payload_kinds = [kind for kind, _ in payloads]
+        self.handler = JournalProcessHandler(connection, payloads)
+        self.sink_formatters = [sink.formatter for sink in self.sinks]
+
+        self.received = 0
+        self.running = False
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_cfg(
+        cls,
+        target: logging.Logger,
+        cfg: Optional[Mapping],
+        connection: Optional[TransportConnection] = None,
+    ) -> Optional["JournalTransport"]:
+        """
+        Create the transport from the transport section of the journal config.  A process
+        given a connection sends to the writer whether or not its config has the section.
+        """
+        if connection is not None:
+            return cls(target, connection=connection)
+        if cfg is None or not cfg.get("enabled", True):
+            return None
+        options = {k: v for k, v in cfg.items() if k != "enabled"}
+        return cls(target, **options)
+
+    @staticmethod
+    def payload(sink: Handler) -> Tuple[str, Formatter]:
+        """
+        Kind and formatter of the payload sent for a sink.
+
+        :raises TypeError: If a binary sink doesn't have a JournalFormatter.
+        """
+        formatter = sink.formatter or DEFAULT_FORMATTER
+        if isinstance(sink, JournalBinaryHandler):
+            if not isinstance(formatter, JournalFormatter):
+                raise TypeError("JournalBinaryHandler requires a JournalFormatter.")
+            return MESSAGE, formatter
+        return LINE, formatter
+
+    def connection(self) -> TransportConnection:
+        """Connection for spawned processes to send their lines to the writer."""
+        return self._connection
+
+    def start(self):
+        """Swap the logger handlers for the process handler and start the writer."""
+        for sink in self.sinks:
+            self.target.removeHandler(sink)
+        self.target.addHandler(self.handler)
+        if self.owner:
+            for sink, payload in zip(self.sinks, self.sink_payloads):
+                if self.payload_kinds[payload] == LINE:
+                    sink.setFormatter(PASSTHROUGH)
+            self._thread = threading.Thread(
+                target=self.run, name="journal-transport", daemon=True
+            )
+            self._thread.start()
+        self.running = True
+
+    def run(self):
+        """Hand the lines and messages received from the processes to the sinks."""
+        sinks = list(zip(self.sinks, self.sink_payloads))
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                levelno, payloads = item
+                self.received += 1
+                records = [
+                    self.make_record(levelno, kind, payload)
+                    for kind, payload in zip(self.payload_kinds, payloads)
+                ]
+                for sink, payload in sinks:
+                    if levelno >= sink.level:
+                        sink.handle(records[payload])
+            except Exception:
+                logger.exception("Journal transport writer failed to write a message.")
+            finally:
+                self.queue.task_done()
+
+    def make_record(self, levelno: int, kind: str, payload: Any) -> LogRecord:
+        """Record handed to the sinks.  Binary sinks take the message from journal_message."""
+        fields = {
+            "name": self.target.name,
+            "levelno": levelno,
+            "levelname": logging.getLevelName(levelno),
+        }
+        if kind == LINE:
+            fields["msg"] = payload
+        else:
+            fields["journal_message"] = payload
+        return logging.makeLogRecord(fields)
+
+    def flush(self):
+        """Wait for the writer to handle the lines sent so far.  Only the owner waits."""
+        if self.running and self.owner:
+            self.queue.join()
+
+    def stop(self, close: bool = True):
+        """
+        Stop sending lines and restore the logger handlers.  The owner handles the lines sent
+        so far and stops the writer.  The other processes wait for their lines to be sent.
+
+        :param close: Close the queue in the other processes.  A closed queue can't be used
+            again, so it is left open when the process connects again with the same queue.
+        """
+        if not self.running:
+            return
+        self.running = False
+        if self.owner:
+            self.queue.put(None)
+            self._thread.join()
+            for sink, formatter in zip(self.sinks, self.sink_formatters):
+                sink.setFormatter(formatter)
+        elif close:
+            # Wait for the queue's feeder thread to send the lines of this process.
+            self.queue.close()
+            self.queue.join_thread()
+        self.target.removeHandler(self.handler)
+        for sink in self.sinks:
+            self.target.addHandler(sink)
+
+    def counters(self) -> Dict[str, int]:
+        """
+        Backpressure counters.
+
+        :return: Lines sent, dropped and puts that blocked in this process, the time spent
+            blocked, and the totals of all the processes.  The owner also has the lines
+            received by the writer.
+        """
+        counters = {
+            "sent": self.handler.sent,
+            "dropped": self.handler.dropped,
+            "blocked": self.handler.blocked,
+            "blocked_ns": self.handler.blocked_ns,
+            "total_dropped": self._connection.dropped.value,
+            "total_blocked": self._connection.blocked.value,
+        }
+        if self.owner:
+            counters["received"] = self.received
+        return counters
+
+    def after_fork(self):
+        """
+        The child of a fork sends to the writer of its parent.  The writer thread isn't
+        copied to the child and the sinks are left to the parent.
+        """
+        if self.owner:
+            for sink, formatter in zip(self.sinks, self.sink_formatters):
+                sink.setFormatter(formatter)
+        self.owner = False
+        self._thread = None
+        self.received = 0
+        self.handler.reset_counters()
+        # The queue's feeder thread isn't copied to the child either, but the queue still
+        # thinks it is running, so puts would be buffered and never sent.  multiprocessing
+        # resets the queue in the processes it starts with Queue._after_fork.  That method is
+        # private to CPython, but there is no public API to reset the queue in a process
+        # forked by os.fork, and a new queue wouldn't be connected to the writer.  Without it
+        # the child stops sending instead of losing the lines.  transport_test checks that
+        # the method is still there.
+        reset_queue = getattr(self.queue, "_after_fork", None)
+        if reset_queue is not None:
+            reset_queue()
+        else:
+            logger.warning("Journal transport can't be used in a process forked by os.fork.")
+            self.running = False
+            self.target.removeHandler(self.handler)
+
+
+# The running transport.
+_transport: Optional[JournalTransport] = None
+_atexit_registered = False
+
+
+def start_transport(
+    target: logging.Logger,
+    cfg: Optional[Mapping],
+    connection: Optional[TransportConnection] = None,
+) -> Optional[JournalTransport]:
+    """
+    Stop any running transport and start a new one if it is configured.
+
+    :param target: Logger whose handlers are the sinks.
+    :param cfg: Transport section of the journal config.
+    :param connection: Connection to the writer of another process.
+    :return: The running transport.
+    """
+    global _transport, _atexit_registered
+    stop_transport(connection)
+    _transport = JournalTransport.from_cfg(target, cfg, connection)
+    if _transport is not None:
+        if not _atexit_registered:
+            atexit.register(stop_transport)
+            _atexit_registered = True
+        _transport.start()
+    return _transport
+
+
+def stop_transport(connection: Optional[TransportConnection] = None):
+    """
+    Stop the running transport.  The owner handles the lines sent so far first.
+
+    :param connection: Connection the process connects with next.  A worker forked with the
+        transport that connects again with the queue it inherited leaves the queue open.
+    """
+    global _transport
+    if _transport is not None:
+        reconnect = connection is not None and connection.queue is _transport.queue
+        _transport.stop(close=not reconnect)
+        _transport = None
+
+
+def flush_transport():
+    """Wait for the writer to handle the lines sent so far."""
+    if _transport is not None:
+        _transport.flush()
+
+
+def journal_transport() -> Optional[JournalTransport]:
+    """The running transport."""
+    return _transport
+
+
+def _after_fork():
+    if _transport is not None and _transport.running:
+        _transport.after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,69 @@
+import base64
+import json
+import sys
+
+import pytest
+
+from callable_journal.array_encoders import install_array_encoders
+from callable_journal.encoders import ObjectDictEncoder
+
+np = pytest.importorskip("numpy")
+
+
+class ArrayEncoder(ObjectDictEncoder):
+    pass
+
+
+def test_numpy_not_imported_by_journal():
+    import subprocess
+
+    code = "import callable_journal, sys; print('numpy' in sys.modules)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert output.stdout.strip() == "False"
+
+
+def test_tolist_is_default():
+    arr = np.arange(6, dtype=np.int64).reshape(2, 3)
+    encoded = ObjectDictEncoder.encode({"arr": arr, "scalar": np.int64(3)})
+    assert encoded == {"arr": [[0, 1, 2], [3, 4, 5]], "scalar": 3}
+    json.dumps(encoded)
+
+
+def test_summary():
+    install_array_encoders(ArrayEncoder, "summary")
+    arr = np.array([1.0, np.nan, 3.0])
+    assert ArrayEncoder.encode(arr) == {
+        "shape": [3],
+        "dtype": "float64",
+        "nulls": 1,
+        "min": 1.0,
+        "max": 3.0,
+        "mean": 2.0,
+    }
+    strings = np.array(["a", "b"])
+    assert ArrayEncoder.encode(strings) == {"shape": [2], "dtype": "<U1", "nulls": 0}
+
+
+def test_base64():
+    install_array_encoders(ArrayEncoder, "base64")
+    arr = np.array([[1, 2], [3, 4]], dtype=np.int32)
+    encoded = ArrayEncoder.encode(arr)
+    data = base64.b64decode(encoded["base64"])
+    decoded = np.frombuffer(data, dtype=encoded["dtype"]).reshape(encoded["shape"])
+    assert (decoded == arr).all()
+
+
+def test_pandas():
+    pd = pytest.importorskip("pandas")
+    df = pd.DataFrame({"a": [1, 2, 3], "b": [1.5, None, 2.5]})
+    install_array_encoders(ArrayEncoder, "tolist")
+    encoded = ArrayEncoder.encode(df)
+    assert encoded["a"] == [1, 2, 3]
+    assert encoded["b"][0] == 1.5 and np.isnan(encoded["b"][1])
+    install_array_encoders(ArrayEncoder, "summary")
+    summary = ArrayEncoder.encode(df)
+    assert summary["shape"] == [3, 2]
+    assert summary["columns"]["b"]["nulls"] == 1
+    assert summary["columns"]["a"]["mean"] == 2.0
@@ -0,0 +1,55 @@
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+
+SUITE_FPATH = Path(__file__).parent.parent / "benchmarks" / "suite.py"
+
+
+@pytest.fixture(scope="module")
+def suite():
+    spec = importlib.util.spec_from_file_location("benchmark_suite", SUITE_FPATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def results(**ns_per_op):
+    return {"meta": {}, "results": {name: {"ns_per_op": ns} for name, ns in ns_per_op.items()}}
+
+
+def write_results(fpath: Path, **ns_per_op) -> str:
+    fpath.write_text(json.dumps(results(**ns_per_op)))
+    return str(fpath)
+
+
+def test_compare(suite):
+    baseline = results(slower=100, faster=100, same=100, missing=100)
+    current = results(slower=150, faster=50, same=110, new=100)
+    lines, regressions = suite.compare(baseline, current, threshold=0.2)
+    assert regressions == ["slower"]
+    report = {line.split()[0]: line for line in lines}
+    assert set(report) == {"slower", "faster", "same", "new", "missing"}
+    assert "+50.0%" in report["slower"] and "REGRESSED" in report["slower"]
+    assert "-50.0%" in report["faster"] and "REGRESSED" not in report["faster"]
+    assert "REGRESSED" not in report["same"]
+    assert report["new"].endswith("new")
+    assert report["missing"].endswith("missing")
+
+
+def test_compare_exit_status(suite, tmp_path, capsys):
+    baseline = write_results(tmp_path / "baseline.json", a=100, b=100, c=100)
+
+    # A regression over the threshold fails.
+    current = write_results(tmp_path / "regressed.json", a=130, b=100, c=100)
+    assert suite.main(["compare", baseline, current, "--threshold", "0.2"]) == 1
+    assert "1 regressed over 20%: a" in capsys.readouterr()[0]
+    assert suite.main(["compare", baseline, current, "--threshold", "0.5"]) == 0
+
+    # Improvements and missing benchmarks don't fail.
+    current = write_results(tmp_path / "improved.json", a=50, b=100)
+    assert suite.main(["compare", baseline, current]) == 0
+    out = capsys.readouterr()[0]
+    assert "regressed" not in out
+    assert "missing" in out.splitlines()[-1] and out.splitlines()[-1].startswith("c ")
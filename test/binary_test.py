@@ -0,0 +1,204 @@
+import datetime
+import decimal
+import io
+import json
+import logging
+import marshal
+import uuid
+
+import pytest
+
+from callable_journal import journal
+from callable_journal.binary import (
+    HEADER,
+    JournalBinaryHandler,
+    binary_to_json,
+    encode_block,
+    iter_blocks,
+    json_to_binary,
+    marshal_safe,
+    read_messages,
+    write_messages,
+)
+from callable_journal.formatter import JournalFormatter
+
+MESSAGES = [
+    {
+        "tag": "JOURNAL_MSG_JSON",
+        "format": "0.2.0",
+        "objective": "add",
+        "arguments": {"a": i, "b": [1.5, None, True, "x" * i]},
+        "results": {"sum": i + 1},
+        "service": {"name": "test", "version": "0.1.0"},
+    }
+    for i in range(25)
+]
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib", "lzma"])
+def test_round_trip(compression):
+    fp = io.BytesIO()
+    assert write_messages(fp, MESSAGES, compression=compression, block_size=10) == 25
+    fp.seek(0)
+    blocks = list(iter_blocks(fp))
+    assert [len(block) for block in blocks] == [10, 10, 5]
+    assert [msg for block in blocks for msg in block] == MESSAGES
+
+
+def test_shared_strings():
+    """Repeated strings are only stored once."""
+    messages = [
+        {"objective": "".join(["objective"] * 10), "arguments": {"".join(["argument"] * 10): i}}
+        for i in range(100)
+    ]
+    assert len(encode_block(messages, "none")) < len(marshal.dumps(messages)) / 3
+
+
+def test_truncated(tmp_path):
+    fpath = tmp_path / "journal.cjb"
+    with fpath.open("wb") as fp:
+        write_messages(fp, MESSAGES, block_size=10)
+    data = fpath.read_bytes()
+    fpath.write_bytes(data[:-3])
+    assert len(list(read_messages(fpath))) == 20
+
+
+def test_not_binary(tmp_path):
+    fpath = tmp_path / "journal.log"
+    fpath.write_text('{"tag": "JOURNAL_MSG_JSON"}\n')
+    with pytest.raises(ValueError):
+        list(read_messages(fpath))
+
+
+def test_convert(tmp_path):
+    src = tmp_path / "journal.log"
+    lines = [json.dumps(msg) for msg in MESSAGES]
+    traceback = ["Traceback (most recent call last):"]
+    src.write_text("\n".join(lines[:10] + traceback + lines[10:]) + "\n")
+    assert json_to_binary(src, tmp_path / "journal.cjb", block_size=7) == 25
+    assert binary_to_json(tmp_path / "journal.cjb", tmp_path / "converted.log") == 25
+    assert (tmp_path / "converted.log").read_text().splitlines() == lines
+
+
+def test_handler(tmp_path):
+    fpath = tmp_path / "journal.cjb"
+    handler = JournalBinaryHandler(fpath, compression="lzma", buffer_records=2, flush_interval=0)
+    handler.setFormatter(JournalFormatter(tag="BIN", format_mode="json", json_backend="orjson"))
+
+    @journal
+    def stamp(key: uuid.UUID, when: datetime.date) -> str:
+        return key.hex
+
+    journal_logger = logging.getLogger("journal")
+    journal_logger.addHandler(handler)
+    journal_logger.setLevel(logging.INFO)
+    try:
+        for i in range(3):
+            stamp(uuid.UUID(int=i), datetime.date(2020, 1, i + 1))
+    finally:
+        journal_logger.removeHandler(handler)
+        handler.close()
+
+    messages = list(read_messages(fpath))
+    assert len(messages) == 3
+    assert fpath.read_bytes().startswith(HEADER)
+    assert messages[2]["arguments"] == {"key": str(uuid.UUID(int=2)), "when": "2020-01-03"}
+    assert messages[2]["tag"] == "BIN"
+
+
+def test_handler_rotate(tmp_path):
+    fpath = tmp_path / "journal.cjb"
+    handler = JournalBinaryHandler(
+        fpath, buffer_records=1, flush_interval=0, max_bytes=len(HEADER) + 1
+    )
+    handler.setFormatter(JournalFormatter(tag="BIN", format_mode="json"))
+    logger = logging.getLogger("journal")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+    @journal
+    def identity(a: int) -> int:
+        return a
+
+    try:
+        identity(1)
+        identity(2)
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    assert [msg["arguments"] for msg in read_messages(handler.backup(1))] == [{"a": 1}]
+    assert [msg["arguments"] for msg in read_messages(fpath)] == [{"a": 2}]
+
+
+def test_marshal_safe():
+    assert marshal_safe(MESSAGES[0]) is MESSAGES[0]
+    msg = {"arguments": {"price": decimal.Decimal("1.5"), "items": [1, decimal.Decimal(2)]}}
+    assert marshal_safe(msg) == {"arguments": {"price": "1.5", "items": [1, "2"]}}
+
+
+def test_handler_unmarshallable(tmp_path):
+    """Values the encoder leaves as they are don't fail the journaled call or later blocks."""
+    fpath = tmp_path / "journal.cjb"
+    handler = JournalBinaryHandler(fpath, buffer_records=1, flush_interval=0)
+    handler.setFormatter(JournalFormatter(tag="BIN", format_mode="json"))
+    logger = logging.getLogger("journal")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+    @journal
+    def total(price: decimal.Decimal) -> int:
+        return 1
+
+    try:
+        assert total(decimal.Decimal("1.5")) == 1
+        assert total(decimal.Decimal("2")) == 1
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    assert [msg["arguments"] for msg in read_messages(fpath)] == [
+        {"price": "1.5"},
+        {"price": "2"},
+    ]
+
+
+def test_handler_block_error(tmp_path, monkeypatch):
+    """A block that fails to encode is dropped and reported by handleError."""
+    fpath = tmp_path / "journal.cjb"
+    handler = JournalBinaryHandler(fpath, buffer_records=1, flush_interval=0)
+    errors = list()
+    monkeypatch.setattr(handler, "handleError", errors.append)
+    logger = logging.Logger("binary_test")
+    logger.addHandler(handler)
+    try:
+        monkeypatch.setattr(handler, "serialize", lambda record: ({"a": object()}, 0))
+        logger.info("unmarshallable")
+        assert [record.msg for record in errors] == ["unmarshallable"]
+        assert handler.buffer == []
+        monkeypatch.setattr(handler, "serialize", lambda record: ({"a": record.msg}, 0))
+        logger.info("next")
+    finally:
+        handler.close()
+    assert list(read_messages(fpath)) == [{"a": "next"}]
+
+
+def test_handler_level(tmp_path):
+    """The logging level of the handler isn't the compression level."""
+    fpath = tmp_path / "journal.cjb"
+    handler = JournalBinaryHandler(fpath, compression_level=9, buffer_records=1, flush_interval=0)
+    handler.setLevel(logging.INFO)
+    handler.setFormatter(JournalFormatter(tag="BIN", format_mode="json"))
+    logger = logging.getLogger("journal")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+    @journal
+    def identity(a: int) -> int:
+        return a
+
+    try:
+        identity(1)
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    assert handler.compression_level == 9
+    assert [msg["arguments"] for msg in read_messages(fpath)] == [{"a": 1}]
@@ -0,0 +1,26 @@
+"""
+Helpers shared by the tests.  The journal messages are read from the captured output or
+the journal files.  Lines that aren't messages, like the tracebacks logging adds to the
+output, are skipped.
+"""
+import json
+from pathlib import Path
+
+
+def message_lines(lines):
+    return [line for line in lines if line.startswith("{")]
+
+
+def read_lines(capsys):
+    """Message lines written to stdout since the last read."""
+    return message_lines(capsys.readouterr()[0].splitlines())
+
+
+def read_msgs(capsys):
+    """Messages written to stdout since the last read."""
+    return [json.loads(line) for line in read_lines(capsys)]
+
+
+def read_file_msgs(fpath: Path):
+    """Messages in a JSON lines journal file."""
+    return [json.loads(line) for line in message_lines(fpath.read_text().splitlines())]
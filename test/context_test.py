@@ -0,0 +1,134 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from callable_journal import copy_context, journal, journal_context, journal_init
+from conftest import read_lines, read_msgs
+
+JOURNAL_CFG_FPATH = Path(__file__).parent / "journal-cfg.yml"
+
+
+@journal
+def handle(a: int) -> int:
+    return a
+
+
+@journal
+async def handle_async(a: int) -> int:
+    await asyncio.sleep(0)
+    return a
+
+
+def context_fields(msg):
+    return {k: v for k, v in msg.items() if k in ("app", "request_id", "tenant")}
+
+
+def test_layers(capsys):
+    journal_init(JOURNAL_CFG_FPATH, context={"app": "pricing"})
+    handle(0)
+    with journal_context(tenant="acme", request_id="r1") as layer:
+        handle(1)
+        with journal_context(request_id="r2"):
+            handle(2)
+        handle(3)
+    handle(4)
+
+    msgs = read_msgs(capsys)
+    assert [context_fields(msg) for msg in msgs] == [
+        {"app": "pricing"},
+        {"app": "pricing", "tenant": "acme", "request_id": "r1"},
+        {"app": "pricing", "tenant": "acme", "request_id": "r2"},
+        {"app": "pricing", "tenant": "acme", "request_id": "r1"},
+        {"app": "pricing"},
+    ]
+    # The layer fields follow the static context.
+    assert list(msgs[1])[-3:] == ["app", "tenant", "request_id"]
+    assert layer.fields == {"tenant": "acme", "request_id": "r1"}
+
+
+def test_replace_static_fields(capsys):
+    journal_init(JOURNAL_CFG_FPATH, context={"app": "pricing", "version": "1"})
+    with journal_context(app="billing"):
+        handle(1)
+    (line,) = read_lines(capsys)
+    assert line.count('"app"') == 1
+    assert context_fields(json.loads(line)) == {"app": "billing"}
+
+
+def test_without_static_context(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    with journal_context(request_id="r1"):
+        handle(1)
+    (msg,) = read_msgs(capsys)
+    assert msg["request_id"] == "r1"
+
+
+class AppContext(BaseModel):
+    app: str
+    version: str = "1"
+
+
+def test_model_context(capsys):
+    """Contexts that aren't mappings are merged with the layer fields."""
+    journal_init(JOURNAL_CFG_FPATH, context=AppContext(app="pricing"))
+    with journal_context(request_id="r1"):
+        handle(1)
+        with journal_context(app="billing"):
+            handle(2)
+    assert [context_fields(msg) for msg in read_msgs(capsys)] == [
+        {"app": "pricing", "request_id": "r1"},
+        {"app": "billing", "request_id": "r1"},
+    ]
+
+
+def test_reinit_inside_layer(capsys):
+    journal_init(JOURNAL_CFG_FPATH, context={"app": "v1"})
+    with journal_context(request_id="r1"):
+        handle(1)
+        journal_init(JOURNAL_CFG_FPATH, context={"app": "v2"})
+        handle(2)
+    assert [context_fields(msg) for msg in read_msgs(capsys)] == [
+        {"app": "v1", "request_id": "r1"},
+        {"app": "v2", "request_id": "r1"},
+    ]
+
+
+def test_asyncio_tasks(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+
+    async def request(i: int):
+        with journal_context(request_id=f"r{i}"):
+            for _ in range(3):
+                await handle_async(i)
+
+    async def main():
+        await asyncio.gather(*(request(i) for i in range(5)))
+
+    asyncio.run(main())
+    msgs = read_msgs(capsys)
+    assert len(msgs) == 15
+    for msg in msgs:
+        assert msg["request_id"] == f"r{msg['arguments']['a']}"
+
+
+def test_threads(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    with journal_context(request_id="r1"):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(copy_context(handle), range(8)))
+        # Threads don't start with the layers of the thread that started them.
+        thread = threading.Thread(target=handle, args=(100,))
+        thread.start()
+        thread.join()
+
+    msgs = read_msgs(capsys)
+    assert len(msgs) == 9
+    for msg in msgs:
+        if msg["arguments"]["a"] == 100:
+            assert "request_id" not in msg
+        else:
+            assert msg["request_id"] == "r1"
@@ -1,10 +1,13 @@
+import dataclasses
 import datetime
+import decimal
+import uuid
 from pathlib import Path
 from typing import Union, Iterable, Mapping
 
 from pydantic import BaseModel
 
-from callable_journal.encoders import ObjectDictEncoder
+from callable_journal.encoders import ObjectDictEncoder, EncodingBudget, TRUNCATED
 
 PRIMITIVE = Union[
     bool,
@@ -66,3 +69,105 @@ def test_path_object():
     expected = {"p": "/tmp"}
     encoded = ObjectDictEncoder.encode(obj)
     assert encoded == expected
+
+
+class Celsius:
+    def __init__(self, degrees: float):
+        self.degrees = degrees
+
+
+class Kelvin(Celsius):
+    pass
+
+
+def test_register():
+    class Encoder(ObjectDictEncoder):
+        pass
+
+    Encoder.register(Celsius, lambda obj: {"degrees": obj.degrees})
+    # Subclasses are resolved through the MRO.
+    encoded = Encoder.encode({"c": Celsius(10.0), "k": [Kelvin(20.0)]})
+    assert encoded == {"c": {"degrees": 10.0}, "k": [{"degrees": 20.0}]}
+    # Registering on a subclass doesn't change the base encoder.
+    assert isinstance(ObjectDictEncoder.encode(Celsius(10.0)), Celsius)
+    # The base encoder registrations are inherited.
+    assert Encoder.encode(datetime.date(2020, 1, 1)) == "2020-01-01"
+
+
+def test_register_from_cfg():
+    class Encoder(ObjectDictEncoder):
+        pass
+
+    Encoder.register_from_cfg({"decimal.Decimal": "builtins.str"})
+    assert Encoder.encode(decimal.Decimal("1.5")) == "1.5"
+
+
+def test_primitive_subclasses():
+    class Name(str):
+        pass
+
+    encoded = ObjectDictEncoder.encode({"n": Name("x"), "t": (1, True, None, 2.5)})
+    assert encoded == {"n": "x", "t": [1, True, None, 2.5]}
+
+
+def test_datetime():
+    dt = datetime.datetime(2020, 1, 1, 12, 30)
+    assert ObjectDictEncoder.encode(dt) == "2020-01-01T12:30:00"
+    assert ObjectDictEncoder.encode(datetime.time(12, 30)) == "12:30:00"
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    when: datetime.date
+
+
+def test_dataclass_and_uuid():
+    obj = {"p": Point(1, datetime.date(2020, 1, 1)), "u": uuid.UUID(int=1)}
+    expected = {"p": {"x": 1, "when": "2020-01-01"}, "u": str(uuid.UUID(int=1))}
+    assert ObjectDictEncoder.encode(obj) == expected
+
+
+def test_budget_items_and_keys():
+    budget = EncodingBudget(max_items=2, max_keys=1)
+    encoded = ObjectDictEncoder.bounded(budget).encode({"a": [1, 2, 3], "b": 2})
+    expected = {
+        TRUNCATED: True,
+        "len": 2,
+        "head": {"a": {TRUNCATED: True, "len": 3, "head": [1, 2]}},
+    }
+    assert encoded == expected
+
+
+def test_budget_str_and_depth():
+    budget = EncodingBudget(max_str=3, max_depth=1)
+    encoded = ObjectDictEncoder.bounded(budget).encode(
+        {"s": "abcdef", "b": b"abcd", "nested": {"x": [1]}}
+    )
+    assert encoded == {
+        "s": {TRUNCATED: True, "len": 6, "head": "abc"},
+        "b": {TRUNCATED: True, "len": 4, "head": [97, 98, 99]},
+        "nested": {TRUNCATED: True, "type": "dict", "len": 1},
+    }
+
+
+def test_budget_stops_walking():
+    """Walking stops once the total budget is spent."""
+    walked = list()
+
+    def values():
+        for i in range(1_000_000):
+            walked.append(i)
+            yield "x" * 10
+
+    encoded = ObjectDictEncoder.bounded(EncodingBudget(max_total=100)).encode(values())
+    assert encoded[TRUNCATED]
+    assert encoded["len"] is None
+    assert len(encoded["head"]) < 10
+    assert len(walked) < 10
+
+
+def test_budget_converts_objects():
+    obj = [DateTimeHolderBaseModel(d=datetime.date(2020, 1, 1))] * 3
+    encoded = ObjectDictEncoder.bounded(EncodingBudget(max_items=1)).encode(obj)
+    assert encoded == {TRUNCATED: True, "len": 3, "head": [{"d": "2020-01-01"}]}
@@ -1,11 +1,17 @@
+import datetime
 import json
+import uuid
 from logging import Logger
+from pathlib import Path
 
+import pytest
 from ndl_tools import Differ
 
+from callable_journal import profiling
 from callable_journal.encoders import ObjectDictEncoder
 from callable_journal.formatter import JournalFormatter
 from callable_journal.journal import JournalContent
+from callable_journal.record import JournalContext, JournalRecord, LayeredContext
 
 journal_content = JournalContent(
     context=dict(
@@ -104,3 +110,224 @@ def test_expanded_context():
     if not result:
         print(result.support)
         assert False
+
+
+@pytest.mark.parametrize("format_mode", ["json", "stringy"])
+def test_native_backend(format_mode):
+    pytest.importorskip("orjson")
+    content = JournalContent(
+        objective="native",
+        context={"app": "test"},
+        arguments={"d": datetime.date(2020, 1, 1), "p": Path("/tmp"), 1: "int key"},
+        results={"u": uuid.UUID(int=1)},
+    )
+    record = Logger("test_logger").makeRecord(
+        "name", 0, "fn", 0, "msg", (), None, extra={"journal_content": content}
+    )
+    native_msg = JournalFormatter(
+        tag="TAG", format_mode=format_mode, json_backend="orjson"
+    ).format(record)
+    std_msg = JournalFormatter(tag="TAG", format_mode=format_mode).format(record)
+
+    def loads(msg):
+        msg = json.loads(msg)
+        if format_mode == "stringy":
+            for field in ("arguments", "results"):
+                msg[field] = json.loads(msg[field])
+        return msg
+
+    assert loads(native_msg) == loads(std_msg)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        JournalFormatter(tag="TAG", format_mode="json", json_backend="unknown")
+
+
+STRINGY_CONTENTS = [
+    JournalContent(objective="plain", arguments={"a": 1}, results={"b": [1, 2]}),
+    JournalContent(
+        objective="unicode é",
+        context={"app": {"name": "café"}, "line": 'quote " and \\ slash\n'},
+        arguments={"s": "café \"quoted\"\n", "d": datetime.date(2020, 1, 1)},
+        results=None,
+        sample_rate=0.25,
+    ),
+    JournalContent(
+        objective="error",
+        arguments={},
+        exception=dict(type="ValueError", msg="bad ☃", file="f.py", line="1"),
+    ),
+    JournalContent(objective="int keys", context={1: "one"}, arguments={2: "two"}),
+]
+
+
+@pytest.mark.parametrize("json_backend", ["json", "orjson"])
+@pytest.mark.parametrize("content", STRINGY_CONTENTS)
+def test_stringy_single_pass(content, json_backend):
+    """The spliced message is byte for byte the same as serializing the whole envelope."""
+    if json_backend == "orjson":
+        pytest.importorskip("orjson")
+    formatter = JournalFormatter(
+        tag="JOURNAL_MSG_STRINGY", format_mode="stringy", json_backend=json_backend
+    )
+    record = Logger("test_logger").makeRecord(
+        "name", 0, "fn", 0, "msg", (), None, extra={"journal_content": content}
+    )
+    expected = formatter.format_stringy_envelope(formatter.content(record))
+    assert formatter.format_stringy(record) == expected
+
+
+def test_encoding_budget():
+    formatter = JournalFormatter(
+        tag="TAG",
+        format_mode="json",
+        encoding_budget={"max_items": 3, "max_total": 1000},
+    )
+    content = JournalContent(
+        objective="budget", arguments={"values": list(range(1_000_000))}
+    )
+    content.results = {"text": "x" * 5000}
+    record = Logger("test_logger").makeRecord(
+        "name", 0, "fn", 0, "msg", (), None, extra={"journal_content": content}
+    )
+    msg = json.loads(formatter.format(record))
+    assert msg["arguments"]["values"] == {
+        "__truncated__": True,
+        "len": 1_000_000,
+        "head": [0, 1, 2],
+    }
+    # The total budget was spent by the arguments.
+    assert msg["results"]["text"]["__truncated__"]
+    assert len(formatter.format(record)) < 2000
+
+
+class CountingEncoder(ObjectDictEncoder):
+    calls = 0
+
+    @classmethod
+    def encode(cls, obj):
+        if isinstance(obj, dict) and "service" in obj:
+            cls.calls += 1
+        return super().encode(obj)
+
+
+@pytest.mark.parametrize("json_backend", ["json", "orjson"])
+@pytest.mark.parametrize("format_mode", ["json", "stringy"])
+def test_cached_context(format_mode, json_backend):
+    """The context is encoded once and the spliced message is the same as the whole message."""
+    if json_backend == "orjson":
+        pytest.importorskip("orjson")
+    CountingEncoder.calls = 0
+    formatter = JournalFormatter(
+        tag="TAG", format_mode=format_mode, json_backend=json_backend, encoder=CountingEncoder
+    )
+    context = JournalContext({"service": {"name": "café", "started": datetime.date(2020, 1, 1)}})
+    msgs = list()
+    for i in range(3):
+        record = JournalRecord(objective="cached", context=context, arguments={"i": i})
+        log_record = Logger("test_logger").makeRecord(
+            "name", 0, "fn", 0, "msg", (), None, extra={"journal_content": record}
+        )
+        msgs.append(formatter.format(log_record))
+        if format_mode == "json":
+            assert msgs[-1] == formatter.json.dumps(formatter.to_json(log_record))
+        else:
+            assert msgs[-1] == formatter.format_stringy_envelope(formatter.content(log_record))
+    assert CountingEncoder.calls == 1
+    assert json.loads(msgs[2])["service"] == {"name": "café", "started": "2020-01-01"}
+    assert list(json.loads(msgs[2]))[-1] == "service"
+
+
+def test_context_replaces_fields():
+    """Context fields with the names of message fields replace them."""
+    formatter = JournalFormatter(tag="TAG", format_mode="json")
+    record = JournalRecord(
+        objective="objective", context=JournalContext({"objective": "context"}), arguments={}
+    )
+    log_record = Logger("test_logger").makeRecord(
+        "name", 0, "fn", 0, "msg", (), None, extra={"journal_content": record}
+    )
+    msg = json.loads(formatter.format(log_record))
+    assert msg["objective"] == "context"
+
+
+class LayerCountingEncoder(ObjectDictEncoder):
+    calls = list()
+
+    @classmethod
+    def encode(cls, obj):
+        if isinstance(obj, dict) and ("service" in obj or "request_id" in obj):
+            cls.calls.append(sorted(obj))
+        return super().encode(obj)
+
+
+@pytest.mark.parametrize("json_backend", ["json", "orjson"])
+@pytest.mark.parametrize("format_mode", ["json", "stringy"])
+@pytest.mark.parametrize(
+    "fields,spliced",
+    [
+        ({"request_id": uuid.UUID(int=1)}, True),
+        ({"request_id": "r1", "service": "replaced"}, False),
+    ],
+)
+def test_layered_context(format_mode, json_backend, fields, spliced):
+    """
+    The static context and the layer fields are each encoded once.  Layer fields that
+    replace static fields are serialized with the static context.
+    """
+    if json_backend == "orjson":
+        pytest.importorskip("orjson")
+    LayerCountingEncoder.calls = list()
+    formatter = JournalFormatter(
+        tag="TAG", format_mode=format_mode, json_backend=json_backend, encoder=LayerCountingEncoder
+    )
+    static = JournalContext({"service": {"name": "pricing"}})
+    # Cache the static context like an earlier message outside the layer would.
+    formatter.cached_context(static)
+    context = LayeredContext(static, fields)
+    for i in range(3):
+        record = JournalRecord(objective="layered", context=context, arguments={"i": i})
+        log_record = Logger("test_logger").makeRecord(
+            "name", 0, "fn", 0, "msg", (), None, extra={"journal_content": record}
+        )
+        msg = formatter.format(log_record)
+        if format_mode == "json":
+            assert msg == formatter.json.dumps(formatter.to_json(log_record))
+        else:
+            assert msg == formatter.format_stringy_envelope(formatter.content(log_record))
+    assert LayerCountingEncoder.calls == [["service"], sorted(fields)]
+    loaded = json.loads(msg)
+    assert msg.count('"service"') == 1
+    assert loaded["request_id"] == str(fields["request_id"])
+    assert list(loaded)[-len(context.value):] == list(context.value)
+    encoded, fragment = formatter.cached_context(context)
+    _, static_fragment = formatter.cached_context(static)
+    assert fragment.startswith(static_fragment) == spliced
+
+
+@pytest.mark.parametrize("profile", [False, True])
+@pytest.mark.parametrize(
+    "context",
+    [{"app": "test"}, JournalContext({"app": "test"}), None],
+    ids=["dict", "cached", "none"],
+)
+def test_mapping_content(context, profile):
+    """The journal content can be a mapping of the message fields."""
+    content = dict(
+        objective="mapping", context=context, arguments={"a": 1}, results={"b": 2}, exception=None
+    )
+    record = Logger("test_logger").makeRecord(
+        "name", 0, "fn", 0, "msg", (), None, extra={"journal_content": content}
+    )
+    formatter = JournalFormatter(tag="TAG", format_mode="json")
+    if profile:
+        profiling.enable_stats()
+    try:
+        msg = json.loads(formatter.format(record))
+    finally:
+        profiling.disable_stats()
+        profiling.reset_stats()
+    assert msg["objective"] == "mapping"
+    assert msg["arguments"] == {"a": 1} and msg["results"] == {"b": 2}
+    assert msg.get("app") == (None if context is None else "test")
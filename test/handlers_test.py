@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from callable_journal import journal, journal_init
+from callable_journal.formatter import JournalFormatter
+from callable_journal.handlers import JournalFileHandler
+
+
+def make_logger(handler: JournalFileHandler) -> logging.Logger:
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger = logging.Logger("handlers_test")
+    logger.addHandler(handler)
+    return logger
+
+
+def read_lines(path: Path):
+    return path.read_text().splitlines() if path.exists() else []
+
+
+@pytest.fixture
+def handler_factory(tmp_path):
+    handlers = list()
+
+    def factory(**kwargs):
+        options = dict(flush_interval=0)
+        options.update(kwargs)
+        handler = JournalFileHandler(tmp_path / "journal.log", **options)
+        handlers.append(handler)
+        return handler
+
+    yield factory
+    for handler in handlers:
+        handler.close()
+
+
+def test_buffer_records(handler_factory):
+    handler = handler_factory(buffer_records=3)
+    logger = make_logger(handler)
+    logger.info("1")
+    logger.info("2")
+    assert read_lines(handler.path) == []
+    logger.info("3")
+    assert read_lines(handler.path) == ["1", "2", "3"]
+    assert handler.writes == 1
+
+
+def test_buffer_bytes(handler_factory):
+    handler = handler_factory(buffer_bytes=10)
+    logger = make_logger(handler)
+    logger.info("12345")
+    assert read_lines(handler.path) == []
+    logger.info("67890")
+    assert read_lines(handler.path) == ["12345", "67890"]
+
+
+def test_flush_on_error(handler_factory):
+    handler = handler_factory(fsync="error")
+    logger = make_logger(handler)
+    logger.info("before")
+    logger.error("failed")
+    assert read_lines(handler.path) == ["before", "failed"]
+
+
+def test_flush_interval(handler_factory):
+    handler = handler_factory(flush_interval=0.05)
+    logger = make_logger(handler)
+    logger.info("idle")
+    deadline = time.monotonic() + 5
+    while not read_lines(handler.path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert read_lines(handler.path) == ["idle"]
+
+
+def test_close(handler_factory):
+    handler = handler_factory(fsync="flush")
+    logger = make_logger(handler)
+    logger.info("pending")
+    handler.close()
+    assert read_lines(handler.path) == ["pending"]
+
+
+def test_rotate_size(handler_factory):
+    handler = handler_factory(buffer_records=1, max_bytes=12, backup_count=2)
+    logger = make_logger(handler)
+    for i in range(4):
+        logger.info(f"line-{i}")
+    assert read_lines(handler.path) == ["line-3"]
+    assert read_lines(handler.backup(1)) == ["line-2"]
+    assert read_lines(handler.backup(2)) == ["line-1"]
+    assert not handler.backup(3).exists()
+
+
+def test_rotate_time(handler_factory):
+    handler = handler_factory(buffer_records=1, rotate_interval=0.01)
+    logger = make_logger(handler)
+    logger.info("old")
+    time.sleep(0.02)
+    logger.info("new")
+    assert read_lines(handler.path) == ["new"]
+    assert read_lines(handler.backup(1)) == ["old"]
+
+
+def test_rotate_no_backups(handler_factory):
+    """Without backups the file isn't rotated instead of being deleted."""
+    handler = handler_factory(buffer_records=1, max_bytes=12, backup_count=0)
+    logger = make_logger(handler)
+    for i in range(4):
+        logger.info(f"line-{i}")
+    assert read_lines(handler.path) == [f"line-{i}" for i in range(4)]
+    assert not handler.backup(1).exists()
+
+
+def test_write_error(handler_factory, monkeypatch):
+    """Write errors go to handleError and the failed messages don't fail later writes."""
+    handler = handler_factory(buffer_records=2)
+    logger = make_logger(handler)
+    errors = list()
+    monkeypatch.setattr(handler, "handleError", errors.append)
+
+    def fail(buffer):
+        raise ValueError("unencodable")
+
+    monkeypatch.setattr(handler, "encode_buffer", fail)
+    logger.info("1")
+    logger.info("2")
+    assert [record.msg for record in errors] == ["2"]
+    assert handler.buffer == []
+
+    monkeypatch.undo()
+    logger.info("3")
+    logger.info("4")
+    assert read_lines(handler.path) == ["3", "4"]
+
+
+def test_flush_error(handler_factory, monkeypatch):
+    handler = handler_factory()
+    logger = make_logger(handler)
+    errors = list()
+    monkeypatch.setattr(handler, "handleError", errors.append)
+    monkeypatch.setattr(handler, "path", handler.path / "missing" / "journal.log")
+    logger.info("lost")
+    handler.flush()
+    (error,) = errors
+    assert error.getMessage().startswith("Failed to write 1 journal messages")
+
+
+@journal(result_names="sum")
+def file_add(a: int, b: int) -> int:
+    return a + b
+
+
+def test_journal_cfg(tmp_path):
+    fpath = tmp_path / "journal.log"
+    cfg = (Path(__file__).parent / "journal-file-cfg.yml").read_text()
+    cfg_fpath = tmp_path / "journal-file-cfg.yml"
+    cfg_fpath.write_text(cfg.replace("JOURNAL_FPATH", str(fpath)))
+    journal_init(cfg_fpath)
+    file_add(1, 2)
+    assert read_lines(fpath) == []
+    handler = logging.getLogger("journal").handlers[0]
+    assert isinstance(handler.formatter, JournalFormatter)
+    handler.flush()
+    (line,) = read_lines(fpath)
+    assert json.loads(line)["results"] == {"sum": 3}
+    journal_init(Path(__file__).parent / "journal-cfg.yml")
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires os.fork.")
+def test_fork_drops_buffer(handler_factory):
+    handler = handler_factory(buffer_records=10)
+    logger = make_logger(handler)
+    logger.info("parent")
+    pid = os.fork()
+    if pid == 0:
+        # The parent writes the messages buffered before the fork.
+        os._exit(1 if handler.buffer else 0)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert len(handler.buffer) == 1
@@ -0,0 +1,165 @@
+import asyncio
+import contextlib
+import logging
+from pathlib import Path
+
+import pytest
+
+from callable_journal import journal, journal_init
+from conftest import read_msgs
+
+JOURNAL_CFG_FPATH = Path(__file__).parent / "journal-cfg.yml"
+
+
+@journal(result_names=["sum"])
+async def async_add(a: int, b: int) -> int:
+    await asyncio.sleep(0)
+    return a + b
+
+
+@journal
+async def async_div_zero(a: int):
+    await asyncio.sleep(0)
+    return a / 0
+
+
+@journal
+async def async_count(n: int):
+    for i in range(n):
+        await asyncio.sleep(0)
+        yield i
+
+
+@journal
+async def async_count_fail(n: int):
+    for i in range(n):
+        yield i
+    raise ValueError("done counting")
+
+
+@journal
+async def async_echo():
+    received = yield "ready"
+    yield received
+
+
+@journal
+async def async_recover():
+    try:
+        yield "ready"
+    except KeyError:
+        yield "recovered"
+
+
+@contextlib.asynccontextmanager
+@journal
+async def async_handled():
+    try:
+        yield "resource"
+    except KeyError:
+        pass
+
+
+def test_coroutine(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    assert asyncio.run(async_add(10, 20)) == 30
+    msg = read_msgs(capsys)[0]
+    assert msg["objective"] == "async_add"
+    assert msg["arguments"] == {"a": 10, "b": 20}
+    assert msg["results"] == {"sum": 30}
+
+
+def test_coroutine_exception(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(async_div_zero(1))
+    msg = read_msgs(capsys)[0]
+    assert msg["exception"]["type"] == "ZeroDivisionError"
+    assert "results" not in msg
+
+
+def test_async_generator(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+
+    async def consume():
+        return [i async for i in async_count(3)]
+
+    assert asyncio.run(consume()) == [0, 1, 2]
+    msg = read_msgs(capsys)[0]
+    assert msg["arguments"] == {"n": 3}
+    assert msg["results"]["count"] == 3
+    assert msg["results"]["first"] == [0, 1, 2]
+    assert msg["results"]["exhausted"]
+
+
+def test_async_generator_exception(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+
+    async def consume():
+        return [i async for i in async_count_fail(2)]
+
+    with pytest.raises(ValueError):
+        asyncio.run(consume())
+    msg = read_msgs(capsys)[0]
+    assert msg["exception"]["msg"] == "done counting"
+    assert msg["results"]["count"] == 2
+
+
+def test_async_generator_closed(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+
+    async def consume():
+        agen = async_count(10)
+        first = await agen.__anext__()
+        await agen.aclose()
+        return first
+
+    assert asyncio.run(consume()) == 0
+    msg = read_msgs(capsys)[0]
+    assert msg["results"]["first"] == [0]
+    assert not msg["results"]["exhausted"]
+
+
+def test_async_generator_send(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+
+    async def consume():
+        agen = async_echo()
+        items = [await agen.asend(None), await agen.asend("hello")]
+        await agen.aclose()
+        return items
+
+    assert asyncio.run(consume()) == ["ready", "hello"]
+    (msg,) = read_msgs(capsys)
+    assert msg["results"]["first"] == ["ready", "hello"]
+
+
+def test_async_generator_throw(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+
+    async def consume():
+        agen = async_recover()
+        items = [await agen.__anext__(), await agen.athrow(KeyError("missing"))]
+        with pytest.raises(StopAsyncIteration):
+            await agen.__anext__()
+        return items
+
+    assert asyncio.run(consume()) == ["ready", "recovered"]
+    (msg,) = read_msgs(capsys)
+    assert msg["results"]["first"] == ["ready", "recovered"]
+    assert msg["results"]["exhausted"]
+
+
+@pytest.mark.parametrize("level", [logging.INFO, logging.WARNING])
+def test_async_context_manager(capsys, level):
+    """The generator handles the exception whether or not it is journaled."""
+    journal_init(JOURNAL_CFG_FPATH)
+    logging.getLogger("journal").setLevel(level)
+
+    async def use():
+        async with async_handled() as resource:
+            assert resource == "resource"
+            raise KeyError("handled")
+
+    asyncio.run(use())
+    assert len(read_msgs(capsys)) == (1 if level == logging.INFO else 0)
@@ -0,0 +1,150 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from callable_journal import COPY_ALL_ARGS, journal, journal_class, journal_init
+from callable_journal.exceptions import ArgumentNameError
+from conftest import read_msgs
+
+JOURNAL_CFG_FPATH = Path(__file__).parent / "journal-cfg.yml"
+
+
+@journal_class(
+    exclude="internal_*",
+    copy_args=COPY_ALL_ARGS,
+    overrides={"total": {"result_names": "total", "drop_args": "secret"}},
+)
+class PriceService:
+    rate = 2
+
+    def __init__(self, base: int):
+        self.base = base
+
+    def price(self, items: list) -> int:
+        items.append(0)
+        return self.base + sum(items) * self.rate
+
+    def total(self, a: int, b: int, secret: str = "") -> int:
+        return a + b
+
+    @staticmethod
+    def scale(value: int, factor: int = 10) -> int:
+        return value * factor
+
+    @classmethod
+    def rated(cls, value: int) -> int:
+        return value * cls.rate
+
+    async def fetch(self, key: str) -> str:
+        return key.upper()
+
+    @property
+    def doubled(self) -> int:
+        return self.base * 2
+
+    def internal_state(self) -> int:
+        return self.base
+
+    def _private(self) -> int:
+        return self.base
+
+    @journal(objective="custom")
+    def custom(self, a: int) -> int:
+        return a
+
+
+def test_methods(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    service = PriceService(1)
+    assert service.price([1, 2]) == 7
+    assert service.total(1, 2, secret="x") == 3
+    assert PriceService.scale(2) == 20
+    assert service.scale(3, factor=2) == 6
+    assert PriceService.rated(5) == 10
+    assert asyncio.run(service.fetch("k")) == "K"
+
+    msgs = read_msgs(capsys)
+    assert [msg["objective"] for msg in msgs] == [
+        "PriceService.price",
+        "PriceService.total",
+        "PriceService.scale",
+        "PriceService.scale",
+        "PriceService.rated",
+        "PriceService.fetch",
+    ]
+    price, total, scale, scale_kw, rated, fetch = msgs
+    # The shared options are applied to every method.  self and cls aren't mapped.
+    assert price["arguments"] == {"items": [1, 2]}
+    assert price["results"] == 7
+    # The overrides replace the shared options.
+    assert total["arguments"] == {"a": 1, "b": 2}
+    assert total["results"] == {"total": 3}
+    assert scale["arguments"] == {"value": 2, "factor": 10}
+    assert scale_kw["arguments"] == {"value": 3, "factor": 2}
+    assert rated["arguments"] == {"value": 5}
+    assert fetch["arguments"] == {"key": "k"} and fetch["results"] == "K"
+
+
+def test_skipped(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    service = PriceService(1)
+    capsys.readouterr()
+    assert service.doubled == 2
+    assert service.internal_state() == 1
+    assert service._private() == 1
+    assert read_msgs(capsys) == []
+    assert isinstance(vars(PriceService)["doubled"], property)
+
+    # Methods decorated with journal keep their own options.
+    service.custom(1)
+    (msg,) = read_msgs(capsys)
+    assert msg["objective"] == "custom"
+
+
+def test_plans():
+    plan = vars(PriceService)["price"].__journal__.plan
+    assert plan.receiver == "self" and plan.positional == ("items",)
+    plan = vars(PriceService)["rated"].__func__.__journal__.plan
+    assert plan.receiver == "cls" and plan.positional == ("value",)
+    plan = vars(PriceService)["scale"].__func__.__journal__.plan
+    assert plan.receiver is None and plan.positional == ("value", "factor")
+
+    # self passed by keyword takes the slow path.
+    plan = vars(PriceService)["price"].__journal__.plan
+    service = PriceService(1)
+    assert plan.map_args((), {"self": service, "items": [1]}) == {"items": [1]}
+    assert plan.map_args((service, [1]), {}) == {"items": [1]}
+
+
+def test_include():
+    @journal_class(include=["get*", "_load"])
+    class Repository:
+        def get(self, key):
+            return key
+
+        def put(self, key):
+            return key
+
+        def _load(self):
+            return None
+
+    assert hasattr(vars(Repository)["get"], "__journal__")
+    assert hasattr(vars(Repository)["_load"], "__journal__")
+    assert not hasattr(vars(Repository)["put"], "__journal__")
+
+
+def test_bad_options():
+    with pytest.raises(ValueError, match="missing"):
+
+        @journal_class(overrides={"missing": {"timing": True}})
+        class Unknown:
+            def method(self):
+                pass
+
+    with pytest.raises(ArgumentNameError):
+
+        @journal_class(overrides={"method": {"drop_args": "x"}})
+        class BadDrop:
+            def method(self, a):
+                pass
@@ -0,0 +1,44 @@
+import json
+import logging
+from pathlib import Path
+
+import pytest
+
+from callable_journal.journal import journal, journal_init
+
+context = dict(
+    context=dict(
+        service_ctx=dict(name="Test Service", version="0.1.0"),
+        implementation_ctx=dict(name="Simple Model", version="0.1.0"),
+    )
+)
+JOURNAL_CFG_FPATH = Path(__file__).parent / "journal-cfg.yml"
+
+
+@journal(result_names=["sum"])
+def int_add(a: int, b: int) -> int:
+    return a + b
+
+
+@journal(objective="int_add_objective", result_names=["div"])
+def div_zero():
+    x = 1 / 0
+
+
+def test_disabled(capsys):
+    journal_init(JOURNAL_CFG_FPATH, context)
+    logging.getLogger("journal").setLevel(logging.WARNING)
+    assert int_add(10, 20) == 30
+    assert capsys.readouterr()[0] == ""
+
+    # Exceptions are still journaled at ERROR.
+    with pytest.raises(ZeroDivisionError):
+        div_zero()
+    msg = json.loads(capsys.readouterr()[0].split("\n")[0])
+    assert msg["exception"]["type"] == "ZeroDivisionError"
+
+    # Reinitializing restores the configured level.
+    journal_init(JOURNAL_CFG_FPATH, context)
+    int_add(10, 20)
+    msg = json.loads(capsys.readouterr()[0])
+    assert msg["results"] == {"sum": 30}
@@ -0,0 +1,155 @@
+import contextlib
+import logging
+from pathlib import Path
+
+import pytest
+
+from callable_journal import journal, journal_init
+from callable_journal.streams import StreamSummary
+from conftest import read_msgs
+
+JOURNAL_CFG_FPATH = Path(__file__).parent / "journal-cfg.yml"
+
+
+@journal(stream={"head": 2, "tail": 3})
+def count(n: int):
+    for i in range(n):
+        yield i
+
+
+@journal
+def count_fail(n: int):
+    for i in range(n):
+        yield i
+    raise ValueError("done counting")
+
+
+@journal
+def echo():
+    received = yield "ready"
+    yield received
+    return "done"
+
+
+@journal
+def recover():
+    try:
+        yield "ready"
+    except KeyError:
+        yield "recovered"
+
+
+@contextlib.contextmanager
+@journal
+def handled():
+    try:
+        yield "resource"
+    except KeyError:
+        pass
+
+
+def test_generator(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    assert list(count(100)) == list(range(100))
+    (msg,) = read_msgs(capsys)
+    assert msg["arguments"] == {"n": 100}
+    results = msg["results"]
+    assert results["count"] == 100
+    assert results["first"] == [0, 1]
+    assert results["last"] == [97, 98, 99]
+    assert results["exhausted"]
+    assert results["elapsed_ns"] > 0
+
+
+def test_generator_short(capsys):
+    """Items are either in the first or the last items."""
+    journal_init(JOURNAL_CFG_FPATH)
+    assert list(count(3)) == [0, 1, 2]
+    (msg,) = read_msgs(capsys)
+    assert msg["results"]["first"] == [0, 1]
+    assert msg["results"]["last"] == [2]
+
+
+def test_generator_closed(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    gen = count(10)
+    assert next(gen) == 0
+    gen.close()
+    (msg,) = read_msgs(capsys)
+    assert msg["results"]["count"] == 1
+    assert not msg["results"]["exhausted"]
+
+
+def test_generator_exception(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    with pytest.raises(ValueError):
+        list(count_fail(4))
+    msg = read_msgs(capsys)[0]
+    assert msg["exception"]["msg"] == "done counting"
+    assert msg["results"]["count"] == 4
+    assert not msg["results"]["exhausted"]
+
+
+def test_generator_send(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    gen = echo()
+    assert next(gen) == "ready"
+    assert gen.send("hello") == "hello"
+    with pytest.raises(StopIteration) as exc_info:
+        next(gen)
+    assert exc_info.value.value == "done"
+    (msg,) = read_msgs(capsys)
+    assert msg["results"]["first"] == ["ready", "hello"]
+
+
+def test_generator_throw(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    gen = recover()
+    assert next(gen) == "ready"
+    assert gen.throw(KeyError("missing")) == "recovered"
+    with pytest.raises(StopIteration):
+        next(gen)
+    (msg,) = read_msgs(capsys)
+    assert msg["results"]["first"] == ["ready", "recovered"]
+    assert msg["results"]["exhausted"]
+
+
+def test_generator_throw_unhandled(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    gen = recover()
+    next(gen)
+    with pytest.raises(ValueError):
+        gen.throw(ValueError("unhandled"))
+    msg = read_msgs(capsys)[0]
+    assert msg["exception"]["type"] == "ValueError"
+
+
+@pytest.mark.parametrize("level", [logging.INFO, logging.WARNING])
+def test_context_manager(capsys, level):
+    """The generator handles the exception whether or not it is journaled."""
+    journal_init(JOURNAL_CFG_FPATH)
+    logging.getLogger("journal").setLevel(level)
+    with handled() as resource:
+        assert resource == "resource"
+        raise KeyError("handled")
+    msgs = read_msgs(capsys)
+    assert len(msgs) == (1 if level == logging.INFO else 0)
+
+
+def test_sample():
+    summary = StreamSummary(head=0, tail=0, sample=10)
+    for i in range(10000):
+        summary.add(i)
+    results = summary.results(exhausted=True)
+    assert results["count"] == 10000
+    assert len(results["sample"]) == 10
+    assert len(set(results["sample"])) == 10
+    assert results["first"] == [] and results["last"] == []
+
+
+def test_unknown_option():
+    with pytest.raises(ValueError):
+
+        @journal(stream={"heads": 1})
+        def gen():
+            yield 1
@@ -86,3 +86,12 @@ def test_exception(capsys):
     if not result:
         print(result.support)
         assert False
+
+
+def test_reinit_context(capsys):
+    journal_init(JOURNAL_CFG_FPATH, {"version": "1"})
+    int_add(1, 2)
+    journal_init(JOURNAL_CFG_FPATH, {"version": "2"})
+    int_add(1, 2)
+    lines = capsys.readouterr()[0].splitlines()
+    assert [json.loads(line)["version"] for line in lines] == ["1", "2"]
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from callable_journal import journal, journal_init
+from conftest import read_msgs
+
+JOURNAL_CFG_FPATH = Path(__file__).parent / "journal-cfg.yml"
+JOURNAL_TIMING_CFG_FPATH = Path(__file__).parent / "journal-timing-cfg.yml"
+TIMING_FIELDS = {"start_time_ns", "duration_ns", "overhead_ns", "thread_id"}
+
+
+@journal(timing=True)
+def timed_sleep(seconds: float, payload: list) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+@journal
+def untimed_add(a: int, b: int) -> int:
+    return a + b
+
+
+@journal(timing=False)
+def never_timed(a: int) -> int:
+    return a
+
+
+@journal(timing=True)
+def timed_div_zero(a: int):
+    return a / 0
+
+
+@journal(timing=True)
+async def timed_async_sleep(seconds: float) -> float:
+    await asyncio.sleep(seconds)
+    return seconds
+
+
+def test_timing(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    before = time.time_ns()
+    timed_sleep(0.01, list(range(1000)))
+    (msg,) = read_msgs(capsys)
+    assert TIMING_FIELDS <= set(msg)
+    assert "task_id" not in msg
+    assert msg["duration_ns"] >= 10_000_000
+    # The overhead doesn't include the callable.
+    assert 0 < msg["overhead_ns"] < msg["duration_ns"]
+    assert before <= msg["start_time_ns"] <= time.time_ns()
+    assert msg["thread_id"] == threading.get_ident()
+
+
+def test_not_timed(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    untimed_add(1, 2)
+    (msg,) = read_msgs(capsys)
+    assert not TIMING_FIELDS & set(msg)
+
+
+def test_timing_exception(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    with pytest.raises(ZeroDivisionError):
+        timed_div_zero(1)
+    (msg,) = read_msgs(capsys)
+    assert msg["exception"]["type"] == "ZeroDivisionError"
+    assert TIMING_FIELDS <= set(msg)
+
+
+def test_timing_async(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+
+    async def main():
+        await asyncio.gather(timed_async_sleep(0.01), timed_async_sleep(0.01))
+
+    asyncio.run(main())
+    msgs = read_msgs(capsys)
+    assert len(msgs) == 2
+    assert all(msg["duration_ns"] >= 10_000_000 for msg in msgs)
+    assert msgs[0]["task_id"] != msgs[1]["task_id"]
+
+
+def test_timing_cfg(capsys):
+    journal_init(JOURNAL_TIMING_CFG_FPATH)
+    untimed_add(1, 2)
+    never_timed(1)
+    msgs = read_msgs(capsys)
+    assert TIMING_FIELDS <= set(msgs[0])
+    assert not TIMING_FIELDS & set(msgs[1])
+    journal_init(JOURNAL_CFG_FPATH)
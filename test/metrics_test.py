@@ -0,0 +1,103 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from callable_journal import journal, journal_flush, journal_init
+from callable_journal.metrics import METRICS_OBJECTIVE, MetricsAggregator
+from conftest import read_msgs
+
+JOURNAL_CFG_FPATH = Path(__file__).parent / "journal-cfg.yml"
+
+
+@journal(metrics=True)
+def metered_add(a: int, b: int) -> int:
+    return a + b
+
+
+@journal(metrics=True, objective="metered_div")
+def metered_div(a: int, b: int) -> float:
+    return a / b
+
+
+def test_metrics_mode(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    for i in range(10):
+        metered_add(i, i)
+    metered_div(1, 1)
+    with pytest.raises(ZeroDivisionError):
+        metered_div(1, 0)
+    # No message per call.
+    assert read_msgs(capsys) == []
+
+    journal_flush()
+    (msg,) = read_msgs(capsys)
+    assert msg["objective"] == METRICS_OBJECTIVE
+    assert msg["arguments"]["interval_s"] >= 0
+    add, div = msg["results"]["metered_add"], msg["results"]["metered_div"]
+    assert add["calls"] == 10 and add["errors"] == 0
+    assert div["calls"] == 2 and div["errors"] == 1 and div["error_rate"] == 0.5
+    assert sum(count for _, count in add["histogram"]) == 10
+
+    # Only the calls since the last summary are journaled.
+    metered_add(1, 1)
+    journal_flush()
+    (msg,) = read_msgs(capsys)
+    assert list(msg["results"]) == ["metered_add"]
+    assert msg["results"]["metered_add"]["calls"] == 1
+
+    journal_flush()
+    assert read_msgs(capsys) == []
+
+
+def test_threads():
+    aggregator = MetricsAggregator(interval=3600)
+
+    def work():
+        for _ in range(1000):
+            aggregator.record("work", 1500)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    summary = aggregator.collect()["work"]
+    assert summary["calls"] == 4000
+    assert summary["mean_ns"] == 1500
+    assert summary["histogram"] == [[2000, 4000]]
+    aggregator._stop.set()
+
+
+def test_exited_threads():
+    aggregator = MetricsAggregator(interval=3600)
+
+    def work():
+        aggregator.record("work", 1500)
+        aggregator.record("other", 1500)
+
+    for _ in range(10):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+    assert aggregator.collect()["work"]["calls"] == 10
+    # The shards of the exited threads are dropped and their counts kept.
+    assert aggregator._shards == []
+    assert aggregator.totals()["work"][0] == 10
+
+    aggregator.record("work", 1500)
+    assert len(aggregator._shards) == 1
+    summaries = aggregator.collect()
+    assert list(summaries) == ["work"]
+    assert summaries["work"]["calls"] == 1
+    aggregator._stop.set()
+
+
+def test_percentiles():
+    aggregator = MetricsAggregator(bounds_ns=[100, 200, 300])
+    buckets = [0, 50, 50, 0]
+    assert aggregator.percentile(buckets, 100, 0.5) == 200
+    assert aggregator.percentile(buckets, 100, 0.75) == 250
+    # The overflow bucket is reported at the last bound.
+    assert aggregator.percentile([0, 0, 0, 10], 10, 0.99) == 300
+
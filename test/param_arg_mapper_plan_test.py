@@ -0,0 +1,114 @@
+import datetime
+from inspect import getcallargs
+from typing import List
+
+import pytest
+from pydantic import BaseModel
+
+from callable_journal import journal
+from callable_journal.exceptions import ArgumentNameError
+from callable_journal.param_arg_mapper import ParamArgMapper, COPY_ALL_ARGS
+
+
+def full_signature(p1, pkw1, pkw2="dpkw2", *args, kw1, kw2="dkw2", **kwargs):
+    pass
+
+
+def no_varargs(a, b=2, *, c=3):
+    pass
+
+
+class Methods:
+    def obj_method(self, p1, p2=2):
+        pass
+
+    @classmethod
+    def cls_method(cls, p1):
+        pass
+
+
+CALLS = [
+    (full_signature, ("p1", "pkw1"), {"kw1": "kw1"}),
+    (full_signature, ("p1", "pkw1", "pkw2", "a1", "a2"), {"kw1": "kw1", "kw3": "kw3"}),
+    (full_signature, ("p1",), {"kw1": "kw1", "pkw1": "pkw1", "kw2": "kw2"}),
+    (no_varargs, (1,), {}),
+    (no_varargs, (), {"c": 30, "a": 10}),
+]
+
+
+@pytest.mark.parametrize("callable,args,kwargs", CALLS)
+def test_matches_getcallargs(callable, args, kwargs):
+    """The plan produces the same mapping, including the order, as getcallargs."""
+    expected = getcallargs(callable, *args, **kwargs)
+    mapped_args = ParamArgMapper.plan(callable).map_args(args, kwargs)
+    assert list(expected.items()) == list(mapped_args.items())
+
+
+def test_bound_methods():
+    obj = Methods()
+    assert ParamArgMapper.plan(obj.obj_method).map_args(("p1",), {}) == {"p1": "p1", "p2": 2}
+    assert ParamArgMapper.plan(Methods.cls_method).map_args(("p1",), {}) == {"p1": "p1"}
+
+
+def test_unbound_method_strips_self():
+    plan = ParamArgMapper.plan(Methods.obj_method)
+    assert plan.map_args((Methods(), "p1"), {"p2": 3}) == {"p1": "p1", "p2": 3}
+
+
+@pytest.mark.parametrize(
+    "args,kwargs",
+    [((1, 2, 3), {}), ((), {}), ((1,), {"a": 1}), ((1,), {"d": 4})],
+)
+def test_bad_call_raises_type_error(args, kwargs):
+    """Calls that don't bind raise the same TypeError as getcallargs."""
+    plan = ParamArgMapper.plan(no_varargs)
+    with pytest.raises(TypeError):
+        plan.map_args(args, kwargs)
+
+
+def test_copy_all_and_drop():
+    b = [2]
+    plan = ParamArgMapper.plan(no_varargs, copy_args=COPY_ALL_ARGS, drop_args="c")
+    mapped_args = plan.map_args(([1], b), {})
+    b.append(10)
+    assert mapped_args == {"a": [1], "b": [2]}
+
+
+@pytest.mark.parametrize(
+    "options", [{"copy_args": "x"}, {"drop_args": ["a", "x"]}, {"drop_args": "self"}]
+)
+def test_bad_names_raise_at_decoration(options):
+    with pytest.raises(ArgumentNameError):
+        journal(Methods.obj_method, **options)
+
+
+class Model(BaseModel):
+    values: List[int]
+
+
+class Opaque:
+    def __init__(self, values):
+        self.values = values
+
+
+def capture_fn(rows, opaque, model):
+    pass
+
+
+def test_capture_encode():
+    rows = [{"d": datetime.date(2020, 1, 1)}]
+    opaque = Opaque([1])
+    model = Model(values=[1])
+    plan = ParamArgMapper.plan(capture_fn, copy_args=COPY_ALL_ARGS, capture="encode")
+    mapped_args = plan.map_args((rows, opaque, model), {})
+
+    rows[0]["d"] = None
+    opaque.values.append(2)
+    model.values.append(2)
+
+    # Encodable arguments are snapshot as primitives.
+    assert mapped_args["rows"] == [{"d": "2020-01-01"}]
+    assert mapped_args["model"] == {"values": [1]}
+    # Others are deep copied.
+    assert isinstance(mapped_args["opaque"], Opaque)
+    assert mapped_args["opaque"].values == [1]
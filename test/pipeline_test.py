@@ -0,0 +1,108 @@
+import logging
+import os
+import signal
+import threading
+from pathlib import Path
+
+import pytest
+
+from callable_journal import journal, journal_init, journal_flush
+from callable_journal import pipeline
+from callable_journal.pipeline import JournalQueueHandler
+from conftest import read_msgs
+
+JOURNAL_CFG_FPATH = Path(__file__).parent / "journal-cfg.yml"
+PIPELINE_CFG_FPATH = Path(__file__).parent / "journal-pipeline-cfg.yml"
+
+
+@journal
+def identity(values: list) -> list:
+    return values
+
+
+class ThreadRecorder(logging.Filter):
+    """Record the threads the handler is called on."""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = list()
+
+    def filter(self, record):
+        self.threads.append(threading.current_thread())
+        return True
+
+
+@pytest.fixture(autouse=True)
+def stop_pipeline():
+    yield
+    pipeline.stop_pipeline()
+
+
+def test_pipeline(capsys):
+    journal_init(PIPELINE_CFG_FPATH)
+    journal_logger = logging.getLogger("journal")
+    assert isinstance(journal_logger.handlers[0], JournalQueueHandler)
+
+    values = [1, 2]
+    identity(values)
+    # Mutation after the call doesn't change the queued message.
+    values.append(3)
+    journal_flush()
+
+    msg = read_msgs(capsys)[0]
+    assert msg["arguments"] == {"values": [1, 2]}
+    assert msg["results"] == [1, 2]
+
+    # Stopping the pipeline restores the handlers.
+    pipeline.stop_pipeline()
+    assert not isinstance(journal_logger.handlers[0], JournalQueueHandler)
+
+
+def test_handlers_run_off_thread(capsys):
+    journal_init(PIPELINE_CFG_FPATH)
+    recorder = ThreadRecorder()
+    for handler in pipeline._pipeline.handlers:
+        handler.addFilter(recorder)
+
+    identity([1])
+    journal_flush()
+    assert recorder.threads
+    assert threading.current_thread() not in recorder.threads
+    assert len(read_msgs(capsys)) == 1
+
+
+def test_reinit_without_pipeline(capsys):
+    journal_init(PIPELINE_CFG_FPATH)
+    identity([1])
+    # Reinitializing handles the queued messages before replacing the handlers.
+    journal_init(JOURNAL_CFG_FPATH)
+    assert not isinstance(logging.getLogger("journal").handlers[0], JournalQueueHandler)
+    identity([2])
+    assert [msg["arguments"] for msg in read_msgs(capsys)] == [
+        {"values": [1]},
+        {"values": [2]},
+    ]
+
+
+def test_logger_without_handlers(caplog):
+    # The messages of a logger without handlers are handled by the loggers it propagates to.
+    target = logging.getLogger("journal.propagated")
+    assert pipeline.start_pipeline(target, {"queue_size": 10}) is None
+    assert target.handlers == []
+    assert "has no handlers" in caplog.text
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires os.fork.")
+def test_fork_restarts_listener():
+    journal_init(PIPELINE_CFG_FPATH)
+    pid = os.fork()
+    if pid == 0:
+        # The child is killed if the flush waits for a listener that isn't running.
+        signal.alarm(5)
+        try:
+            identity([1])
+            journal_flush()
+        finally:
+            os._exit(0)
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
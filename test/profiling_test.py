@@ -0,0 +1,122 @@
+import logging
+import time
+from pathlib import Path
+
+import pytest
+
+from callable_journal import journal, journal_init, profiling, stats
+from callable_journal.handlers import JournalFileHandler
+from conftest import read_msgs
+
+JOURNAL_CFG_FPATH = Path(__file__).parent / "journal-cfg.yml"
+STATS_CFG_FPATH = Path(__file__).parent / "journal-stats-cfg.yml"
+
+
+@journal(result_names="total", copy_args="b")
+def add_items(a: int, b: list) -> int:
+    return a + sum(b)
+
+
+@journal
+def divide(a: int, b: int) -> float:
+    return a / b
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    profiling.reset_stats()
+    yield
+    profiling.disable_stats()
+    profiling.reset_stats()
+
+
+def test_disabled(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    add_items(1, [2, 3])
+    report = stats()
+    assert report["enabled"] is False
+    assert report["stages"] == {} and report["objectives"] == {}
+
+
+def test_stages(capsys):
+    journal_init(STATS_CFG_FPATH)
+    for i in range(3):
+        add_items(i, [2, 3])
+    with pytest.raises(ZeroDivisionError):
+        divide(1, 0)
+
+    report = stats()
+    assert report["enabled"] is True
+    add = report["objectives"]["add_items"]
+    assert set(add) == {
+        "map_args",
+        "copy_args",
+        "results",
+        "emit",
+        "context",
+        "encode",
+        "serialize",
+        "format",
+    }
+    for stage in add.values():
+        assert stage["count"] == 3
+        assert stage["total_ns"] > 0
+        assert stage["mean_ns"] == stage["total_ns"] // 3
+    # Formatting is done by the handler while the message is emitted.
+    assert add["format"]["total_ns"] <= add["emit"]["total_ns"]
+
+    div = report["objectives"]["divide"]
+    assert div["exception"]["count"] == 1 and "results" not in div
+    assert report["stages"]["map_args"]["count"] == 4
+
+    # Profiling doesn't change the messages.
+    msgs = read_msgs(capsys)
+    assert msgs[0]["arguments"] == {"a": 0, "b": [2, 3]}
+    assert msgs[0]["results"] == {"total": 5}
+
+
+def test_reinit_disables(capsys):
+    journal_init(STATS_CFG_FPATH)
+    add_items(1, [2])
+    journal_init(JOURNAL_CFG_FPATH)
+    add_items(1, [2])
+    report = stats()
+    assert report["enabled"] is False
+    # The counters are kept until they are reset.
+    assert report["objectives"]["add_items"]["map_args"]["count"] == 1
+    profiling.reset_stats()
+    assert stats()["objectives"] == {}
+
+
+def test_write_stage(tmp_path):
+    handler = JournalFileHandler(tmp_path / "journal.log", flush_interval=0)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger = logging.Logger("profiling_test")
+    logger.addHandler(handler)
+    profiling.enable_stats()
+    for i in range(5):
+        logger.info("message %s", i)
+    handler.flush()
+    handler.close()
+    report = stats()
+    assert report["stages"]["write"]["count"] == 1
+    assert report["objectives"] == {}
+
+
+def test_report(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    profiling.enable_stats(interval=0.05, context={"service": "test"})
+    add_items(1, [2])
+    deadline = time.monotonic() + 5
+    reports = list()
+    while not reports and time.monotonic() < deadline:
+        time.sleep(0.05)
+        reports = [
+            msg for msg in read_msgs(capsys) if msg["objective"] == profiling.STATS_OBJECTIVE
+        ]
+    profiling.disable_stats()
+    assert reports
+    msg = reports[0]
+    assert msg["service"] == "test"
+    assert msg["arguments"] == {"interval_s": 0.05}
+    assert msg["results"]["objectives"]["add_items"]["map_args"]["count"] == 1
@@ -0,0 +1,116 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from callable_journal.cli import main, parse_time
+from callable_journal.query import JournalIndex, query
+
+SECOND = 1_000_000_000
+
+
+def message(i: int) -> dict:
+    msg = {
+        "tag": "JOURNAL_MSG_JSON",
+        "format": "0.2.0",
+        "objective": f"objective_{i % 3}",
+        "arguments": {"i": i},
+        "start_time_ns": i * SECOND,
+    }
+    if i % 5 == 0:
+        msg["exception"] = {"type": "ValueError", "msg": str(i), "file": "f.py", "line": "1"}
+    else:
+        msg["results"] = i
+    return msg
+
+
+def write(fpath: Path, messages, mode="at"):
+    with fpath.open(mode) as fp:
+        for msg in messages:
+            fp.write(json.dumps(msg) + "\n")
+
+
+@pytest.fixture
+def journal_fpath(tmp_path) -> Path:
+    fpath = tmp_path / "journal.log"
+    write(fpath, (message(i) for i in range(30)), mode="wt")
+    return fpath
+
+
+def test_query(journal_fpath):
+    results = list(query(journal_fpath, objective="objective_0", has_exception=True))
+    assert [msg["arguments"]["i"] for msg in results] == [0, 15]
+    results = list(query(journal_fpath, start_ns=10 * SECOND, end_ns=13 * SECOND))
+    assert [msg["arguments"]["i"] for msg in results] == [10, 11, 12]
+    assert len(list(query(journal_fpath, limit=4))) == 4
+
+
+def test_incremental(journal_fpath):
+    index = JournalIndex(journal_fpath)
+    assert index.update() == 30
+    assert index.update() == 0
+    write(journal_fpath, (message(i) for i in range(30, 35)))
+    # A partial line is indexed once it's complete.
+    with journal_fpath.open("at") as fp:
+        fp.write('{"objective": "partial"')
+    assert index.update() == 5
+
+    # A new index only loads the saved entries.
+    reloaded = JournalIndex(journal_fpath)
+    assert reloaded.load()
+    assert reloaded.entries == index.entries
+    with journal_fpath.open("at") as fp:
+        fp.write(', "arguments": {}}\n')
+    assert reloaded.update() == 1
+    assert [msg["objective"] for msg in reloaded.query(objective="partial")] == ["partial"]
+
+
+def test_replaced(journal_fpath):
+    index = JournalIndex(journal_fpath)
+    index.update()
+    write(journal_fpath, (message(i) for i in range(100, 103)), mode="wt")
+    assert JournalIndex(journal_fpath).update() == 3
+    assert [msg["arguments"]["i"] for msg in query(journal_fpath)] == [100, 101, 102]
+
+
+def test_rewritten_same_start(journal_fpath):
+    """A file rewritten with the same start and at least as many bytes is indexed again."""
+    JournalIndex(journal_fpath).update()
+    messages = [message(i) for i in range(3)] + [message(i) for i in range(200, 240)]
+    write(journal_fpath, messages, mode="wt")
+    assert JournalIndex(journal_fpath).update() == 43
+    assert [msg["arguments"]["i"] for msg in query(journal_fpath)][-1] == 239
+
+
+def test_rotated(journal_fpath):
+    """A new file in place of a rotated file is indexed again."""
+    JournalIndex(journal_fpath).update()
+    content = journal_fpath.read_bytes()
+    journal_fpath.rename(journal_fpath.with_name("journal.log.1"))
+    journal_fpath.write_bytes(content)
+    assert JournalIndex(journal_fpath).update() == 30
+
+
+def test_skips_other_lines(tmp_path):
+    fpath = tmp_path / "journal.log"
+    lines = [json.dumps(message(1)), "Traceback (most recent call last):", json.dumps(message(2))]
+    fpath.write_text("\n".join(lines) + "\n")
+    assert [msg["arguments"]["i"] for msg in query(fpath)] == [1, 2]
+
+
+def test_cli(journal_fpath, capsys):
+    assert main(["query", str(journal_fpath), "--objective", "objective_1", "--errors"]) == 0
+    lines = capsys.readouterr()[0].splitlines()
+    assert [json.loads(line)["arguments"]["i"] for line in lines] == [10, 25]
+
+    main(["query", str(journal_fpath), "--no-errors", "--count"])
+    assert capsys.readouterr()[0] == f"{journal_fpath}: 24\n"
+
+    main(["index", str(journal_fpath)])
+    assert capsys.readouterr()[0] == f"{journal_fpath}: 30 messages, 0 added\n"
+
+
+def test_parse_time():
+    assert parse_time("1000") == 1000
+    assert parse_time("1970-01-01T00:00:01") == SECOND
+    assert parse_time("1970-01-01T01:00:01+01:00") == SECOND
@@ -0,0 +1,72 @@
+import json
+from logging import Logger
+
+from callable_journal.exception_msg import ExceptionRecord, ExceptionMsg
+from callable_journal.formatter import JournalFormatter
+from callable_journal.record import CallTiming, JournalRecord, JournalContent
+
+
+def make_exception_record() -> ExceptionRecord:
+    try:
+        1 / 0
+    except ZeroDivisionError as exc:
+        return ExceptionRecord.from_exception(exc)
+
+
+def test_exception_record():
+    record = make_exception_record()
+    msg = record.to_msg()
+    assert isinstance(msg, ExceptionMsg)
+    assert msg.dict() == record.dict()
+    assert record.type == "ZeroDivisionError"
+    assert record.line == "11"
+
+
+def test_to_content():
+    record = JournalRecord(
+        objective="record",
+        context={"app": "test"},
+        arguments={"a": 1},
+        results=[1, 2],
+        exception=make_exception_record(),
+        sample_rate=0.5,
+    )
+    content = record.to_content()
+    assert isinstance(content, JournalContent)
+    assert content.results == [1, 2]
+    assert content.exception.type == "ZeroDivisionError"
+    assert content.sample_rate == 0.5
+
+
+def test_formatter_reads_record():
+    """Records and the pydantic view are formatted the same."""
+    record = JournalRecord(objective="record", context={"app": "test"}, arguments={"a": 1})
+    record.results = {"b": 2}
+    formatter = JournalFormatter(tag="TAG", format_mode="stringy")
+    msgs = list()
+    for journal_content in (record, record.to_content()):
+        log_record = Logger("test_logger").makeRecord(
+            "name", 0, "fn", 0, "msg", (), None, extra={"journal_content": journal_content}
+        )
+        msgs.append(formatter.format(log_record))
+    assert msgs[0] == msgs[1]
+
+
+def test_formatter_reads_timing():
+    """Timing fields are top level fields in both formats."""
+    timing = CallTiming()
+    timing.called()
+    timing.returned()
+    timing.finished()
+    record = JournalRecord(objective="record", arguments={"a": 1}, timing=timing)
+    assert record.to_content().timing == timing.fields()
+    for format_mode in ("json", "stringy"):
+        formatter = JournalFormatter(tag="TAG", format_mode=format_mode)
+        log_record = Logger("test_logger").makeRecord(
+            "name", 0, "fn", 0, "msg", (), None, extra={"journal_content": record}
+        )
+        msg = json.loads(formatter.format(log_record))
+        assert "timing" not in msg
+        assert msg["duration_ns"] >= 0
+        assert msg["overhead_ns"] >= 0
+        assert msg["start_time_ns"] == timing.start_time_ns
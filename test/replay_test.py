@@ -0,0 +1,164 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from callable_journal import journal, journal_init
+from callable_journal import replay as replay_module
+from callable_journal.cli import main
+from callable_journal.replay import (
+    ERROR,
+    MATCH,
+    MISMATCH,
+    SKIPPED,
+    ReplayRegistry,
+    call_arguments,
+    replay,
+)
+from conftest import read_msgs
+
+JOURNAL_CFG_FPATH = Path(__file__).parent / "journal-cfg.yml"
+
+# Changed by the tests to make the replayed results differ from the journaled results.
+OFFSET = {"value": 0}
+
+
+@journal(result_names=["total", "count"])
+def add_all(*values: int, start: int = 0):
+    return start + sum(values) + OFFSET["value"], len(values)
+
+
+@journal(stream={"head": 2, "tail": 1})
+def count_to(n: int):
+    for i in range(n):
+        yield i
+
+
+@journal
+def divide(a: float, b: float) -> float:
+    return a / b
+
+
+async def async_double(a: int) -> int:
+    return 2 * a
+
+
+def journal_calls(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    add_all(1, 2, 3, start=10)
+    list(count_to(5))
+    with pytest.raises(ZeroDivisionError):
+        divide(1, 0)
+    divide(1, 4)
+    return read_msgs(capsys)
+
+
+def registry() -> ReplayRegistry:
+    registry = ReplayRegistry()
+    registry.register_module(__name__)
+    return registry
+
+
+def test_replay(capsys):
+    messages = journal_calls(capsys)
+    report = replay(messages, registry())
+    assert report.ok
+    summary = report.to_dict()
+    assert {objective: s[MATCH] for objective, s in summary.items()} == {
+        "add_all": 1,
+        "count_to": 1,
+        "divide": 2,
+    }
+    assert summary["divide"]["p50_ns"] > 0
+
+
+def test_mismatch(capsys):
+    messages = journal_calls(capsys)
+    OFFSET["value"] = 1
+    try:
+        report = replay(messages, registry())
+    finally:
+        OFFSET["value"] = 0
+    summary = report.to_dict()["add_all"]
+    assert not report.ok
+    assert summary[MISMATCH] == 1
+    (mismatch,) = summary["mismatches"]
+    assert mismatch["expected"] == {"total": 16, "count": 3}
+    assert mismatch["actual"] == {"total": 17, "count": 3}
+
+
+def test_unregistered_and_errors():
+    messages = [
+        {"objective": "unknown", "arguments": {}},
+        {"objective": "divide", "arguments": {"a": 1, "b": 0}, "results": 1.0},
+        {"objective": "divide", "arguments": {"a": 1}, "results": 1.0},
+        {"objective": "__metrics__", "results": {}},
+        {"objective": "__journal_stats__", "arguments": {"interval_s": 60}, "results": {}},
+    ]
+    summary = replay(messages, registry()).to_dict()
+    assert summary["unknown"][SKIPPED] == 1
+    assert summary["divide"][ERROR] == 1
+    assert summary["divide"][SKIPPED] == 1
+    assert "__metrics__" not in summary and "__journal_stats__" not in summary
+
+
+def test_stringy_and_adapter():
+    registry = ReplayRegistry()
+    registry.register("double", async_double, adapter=lambda args: {"a": int(args["a"])})
+    messages = [{"objective": "double", "arguments": '{"a": "21"}', "results": "42"}]
+    assert replay(messages, registry).to_dict()["double"][MATCH] == 1
+
+
+def test_workers(capsys):
+    messages = journal_calls(capsys) * 5
+    report = replay(messages, registry(), workers=2, chunk_size=3)
+    assert report.ok
+    assert sum(summary[MATCH] for summary in report.to_dict().values()) == 20
+
+
+def test_workers_bounded(capsys, monkeypatch):
+    """Only a few chunks per worker are submitted ahead of the collected outcomes."""
+    messages = journal_calls(capsys) * 25
+    submitted, collected, in_flight = list(), list(), list()
+    collect = replay_module.add_outcomes
+
+    class Executor(ThreadPoolExecutor):
+        def submit(self, *args, **kwargs):
+            future = super().submit(*args, **kwargs)
+            submitted.append(future)
+            in_flight.append(len(submitted) - len(collected))
+            return future
+
+    def add_outcomes(report, futures):
+        futures = list(futures)
+        collected.extend(futures)
+        collect(report, futures)
+
+    monkeypatch.setattr(replay_module, "ProcessPoolExecutor", Executor)
+    monkeypatch.setattr(replay_module, "add_outcomes", add_outcomes)
+    report = replay_module.replay(messages, registry(), workers=2, chunk_size=1)
+    assert sum(summary[MATCH] for summary in report.to_dict().values()) == 100
+    assert len(collected) == 100
+    assert max(in_flight) == replay_module.PENDING_CHUNKS * 2
+
+
+def test_call_arguments():
+    def fn(a, b=2, *rest, key, **extra):
+        pass
+
+    assert call_arguments(fn, {"a": 1, "b": 2, "rest": [3], "key": 4, "extra": {"x": 5}}) == (
+        [1, 2, 3],
+        {"key": 4, "x": 5},
+    )
+    assert call_arguments(fn, {"a": 1, "key": 4}) == ([1], {"key": 4})
+    with pytest.raises(TypeError):
+        call_arguments(fn, {"a": 1, "rest": [3], "key": 4})
+
+
+def test_cli(capsys, tmp_path):
+    fpath = tmp_path / "journal.log"
+    fpath.write_text("\n".join(json.dumps(msg) for msg in journal_calls(capsys)) + "\n")
+    assert main(["replay", str(fpath), "--module", __name__]) == 0
+    report = json.loads(capsys.readouterr()[0])
+    assert report["divide"][MATCH] == 2
@@ -0,0 +1,109 @@
+from pathlib import Path
+
+import pytest
+
+from callable_journal import journal, journal_init
+from callable_journal.sampling import (
+    SamplingPolicy,
+    ProbabilityPolicy,
+    EveryNthPolicy,
+    RateLimitPolicy,
+)
+from conftest import read_msgs
+
+JOURNAL_CFG_FPATH = Path(__file__).parent / "journal-cfg.yml"
+SAMPLING_CFG_FPATH = Path(__file__).parent / "journal-sampling-cfg.yml"
+
+
+def test_from_cfg():
+    assert isinstance(SamplingPolicy.from_cfg(0.5), ProbabilityPolicy)
+    assert isinstance(SamplingPolicy.from_cfg({"every_nth": 3}), EveryNthPolicy)
+    policy = SamplingPolicy.from_cfg({"rate_limit": 5, "always_on_error": False})
+    assert isinstance(policy, RateLimitPolicy)
+    assert not policy.always_on_error
+    with pytest.raises(ValueError):
+        SamplingPolicy.from_cfg({"unknown": 1})
+
+
+def test_every_nth():
+    policy = EveryNthPolicy(3)
+    assert [policy.sample() for _ in range(6)] == [True, False, False, True, False, False]
+    assert policy.rate == pytest.approx(1 / 3)
+
+
+def test_probability():
+    assert all(ProbabilityPolicy(1.0).sample() for _ in range(10))
+    assert not any(ProbabilityPolicy(0.0).sample() for _ in range(10))
+
+
+def test_rate_limit():
+    policy = RateLimitPolicy(1, burst=2)
+    assert [policy.sample() for _ in range(4)] == [True, True, False, False]
+    assert policy.rate == pytest.approx(0.5, abs=0.01)
+
+
+def test_rate_limit_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("callable_journal.sampling.time.monotonic", lambda: now[0])
+    policy = RateLimitPolicy(1, burst=1, window=10)
+    # A burst of calls of which few are journaled.
+    assert sum(policy.sample() for _ in range(100)) == 1
+    assert policy.rate == pytest.approx(0.01)
+
+    # Long after the burst the rate is that of the recent calls.
+    for _ in range(50):
+        now[0] += 2
+        assert policy.sample()
+    assert policy.rate > 0.99
+
+
+@journal(sample={"every_nth": 2})
+def sampled(a: int) -> int:
+    return 10 // a
+
+
+@journal(sample={"every_nth": 2})
+def sampled_errors(a: int) -> int:
+    return 10 // a
+
+
+@journal(sample=1.0)
+def sampled_by_cfg(a: int) -> int:
+    return 10 // a
+
+
+def test_sampled_messages(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    for a in (1, 2, 3, 4):
+        sampled(a)
+    msgs = read_msgs(capsys)
+    assert [msg["arguments"]["a"] for msg in msgs] == [1, 3]
+    assert all(msg["sample_rate"] == 0.5 for msg in msgs)
+
+
+def test_always_on_error(capsys):
+    journal_init(JOURNAL_CFG_FPATH)
+    sampled_errors(1)
+    with pytest.raises(ZeroDivisionError):
+        # Not sampled but the error is journaled.
+        sampled_errors(0)
+    msgs = read_msgs(capsys)
+    assert len(msgs) == 2
+    assert msgs[1]["exception"]["type"] == "ZeroDivisionError"
+    assert msgs[1]["sample_rate"] == 1.0
+
+
+def test_cfg_policy(capsys):
+    journal_init(SAMPLING_CFG_FPATH)
+    for a in (1, 2, 3):
+        sampled_by_cfg(a)
+    with pytest.raises(ZeroDivisionError):
+        sampled_by_cfg(0)
+    msgs = read_msgs(capsys)
+    # The configured policy replaces the decorator policy and doesn't journal all errors.
+    assert [msg["arguments"]["a"] for msg in msgs] == [1, 3]
+
+    # Reinitializing without the sampling config restores the decorator policy.
+    journal_init(JOURNAL_CFG_FPATH)
+    sampled_by_cfg(5)
+    assert read_msgs(capsys)[0]["sample_rate"] == 1.0
@@ -0,0 +1,249 @@
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from callable_journal import journal, journal_flush, journal_init
+from callable_journal import transport
+from callable_journal.binary import JournalBinaryHandler, read_messages
+from callable_journal.transport import LINE, JournalProcessHandler, JournalTransport
+from callable_journal.transport import TransportConnection
+from conftest import read_file_msgs
+
+JOURNAL_CFG_FPATH = Path(__file__).parent / "journal-cfg.yml"
+
+fork_only = pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires os.fork.")
+
+
+@journal(result_names="total")
+def transported_add(a: int, b: int) -> int:
+    return a + b
+
+
+@journal
+def transported_fail(a: int):
+    raise ValueError(a)
+
+
+def add_in_worker(i: int) -> int:
+    transported_add(i, os.getpid())
+    return os.getpid()
+
+
+@pytest.fixture
+def cfg_fpath(tmp_path):
+    cfg = (Path(__file__).parent / "journal-transport-cfg.yml").read_text()
+    cfg = cfg.replace("JOURNAL_ERRORS_FPATH", str(tmp_path / "errors.log"))
+    cfg = cfg.replace("JOURNAL_BINARY_FPATH", str(tmp_path / "journal.cjb"))
+    cfg = cfg.replace("JOURNAL_FPATH", str(tmp_path / "journal.log"))
+    fpath = tmp_path / "journal-transport-cfg.yml"
+    fpath.write_text(cfg)
+    yield fpath
+    transport.stop_transport()
+    # Close the file handlers of the test config.
+    journal_init(JOURNAL_CFG_FPATH)
+
+
+def flush_sinks():
+    for sink in transport.journal_transport().sinks:
+        sink.flush()
+
+
+def test_transport(cfg_fpath, tmp_path):
+    journal_init(cfg_fpath)
+    journal_logger = logging.getLogger("journal")
+    assert isinstance(journal_logger.handlers[0], JournalProcessHandler)
+
+    transported_add(1, 2)
+    with pytest.raises(ValueError):
+        transported_fail(3)
+    journal_flush()
+    flush_sinks()
+
+    # Each sink writes the line of its formatter at its level.
+    msgs = read_file_msgs(tmp_path / "journal.log")
+    assert [msg["objective"] for msg in msgs] == ["transported_add", "transported_fail"]
+    assert msgs[0]["results"] == {"total": 3}
+    (error,) = read_file_msgs(tmp_path / "errors.log")
+    assert error["tag"] == "JOURNAL_MSG_STRINGY"
+    assert json.loads(error["exception"])["type"] == "ValueError"
+    # Binary sinks are sent the messages and keep their formatter.
+    binary = transport.journal_transport().sinks[2]
+    assert isinstance(binary, JournalBinaryHandler)
+    assert binary.formatter.tag == "JOURNAL_MSG_JSON"
+    assert [msg["objective"] for msg in read_messages(tmp_path / "journal.cjb")] == [
+        "transported_add",
+        "transported_fail",
+    ]
+
+    counters = transport.journal_transport().counters()
+    assert counters["sent"] == counters["received"] == 2
+    assert counters["dropped"] == counters["total_dropped"] == 0
+
+    # Stopping the transport restores the handlers and their formatters.
+    sink = transport.journal_transport().sinks[0]
+    transport.stop_transport()
+    assert journal_logger.handlers[0] is sink
+    assert sink.formatter.tag == "JOURNAL_MSG_JSON"
+
+
+@fork_only
+def test_forked_workers(cfg_fpath, tmp_path):
+    journal_init(cfg_fpath)
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=2, mp_context=context) as executor:
+        pids = set(executor.map(add_in_worker, range(20)))
+    transported_add(0, 0)
+    journal_flush()
+    flush_sinks()
+
+    msgs = read_file_msgs(tmp_path / "journal.log")
+    assert len(msgs) == 21
+    assert {msg["arguments"]["b"] for msg in msgs[:-1]} <= pids
+    assert sorted(msg["arguments"]["a"] for msg in msgs) == [0] + list(range(20))
+    assert transport.journal_transport().counters()["received"] == 21
+
+
+@fork_only
+def test_forked_workers_init(cfg_fpath, tmp_path):
+    """Forked workers that run journal_init with the connection keep the inherited queue."""
+    journal_init(cfg_fpath)
+    connection = transport.journal_transport().connection()
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(
+        max_workers=2,
+        mp_context=context,
+        initializer=journal_init,
+        initargs=(cfg_fpath, None, connection),
+    ) as executor:
+        list(executor.map(add_in_worker, range(10)))
+    journal_flush()
+    flush_sinks()
+
+    msgs = read_file_msgs(tmp_path / "journal.log")
+    assert sorted(msg["arguments"]["a"] for msg in msgs) == list(range(10))
+
+
+def test_spawned_workers(cfg_fpath, tmp_path):
+    journal_init(cfg_fpath)
+    connection = transport.journal_transport().connection()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=1,
+        mp_context=context,
+        initializer=journal_init,
+        initargs=(cfg_fpath, None, connection),
+    ) as executor:
+        (pid,) = set(executor.map(add_in_worker, range(5)))
+    journal_flush()
+    flush_sinks()
+
+    msgs = read_file_msgs(tmp_path / "journal.log")
+    assert [msg["arguments"]["a"] for msg in msgs] == list(range(5))
+    assert {msg["arguments"]["b"] for msg in msgs} == {pid}
+
+
+@fork_only
+def test_os_fork(cfg_fpath, tmp_path):
+    """A child forked by os.fork, like a gunicorn worker, sends to the writer of its parent."""
+    journal_init(cfg_fpath)
+    transported_add(1, 1)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            transported_add(2, 2)
+            transport.stop_transport()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    journal_flush()
+    flush_sinks()
+    msgs = read_file_msgs(tmp_path / "journal.log")
+    assert [msg["arguments"]["a"] for msg in msgs] == [1, 2]
+
+
+def test_binary_sink_formatter(tmp_path):
+    sink = JournalBinaryHandler(tmp_path / "journal.cjb", flush_interval=0)
+    target = logging.Logger("transport_test")
+    target.addHandler(sink)
+    try:
+        with pytest.raises(TypeError, match="JournalFormatter"):
+            JournalTransport(target)
+    finally:
+        sink.close()
+
+
+def make_connection(on_full: str) -> TransportConnection:
+    return TransportConnection(
+        queue=multiprocessing.Queue(1),
+        dropped=multiprocessing.Value("Q", 0),
+        blocked=multiprocessing.Value("Q", 0),
+        on_full=on_full,
+    )
+
+
+def test_send_error(cfg_fpath, tmp_path):
+    """A queue that can't be used is reported by handleError, not raised in the caller."""
+    connection = make_connection("block")
+    handler = JournalProcessHandler(connection, [(LINE, logging.Formatter())])
+    errors = list()
+    handler.handleError = errors.append
+    connection.queue.close()
+    handler.handle(logging.makeLogRecord({"msg": "lost"}))
+    assert [record.msg for record in errors] == ["lost"]
+
+
+def test_queue_reset_available():
+    """after_fork resets the queue with the private multiprocessing Queue._after_fork."""
+    for method in ("fork", "spawn"):
+        if method in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context(method)
+            assert callable(getattr(context.JoinableQueue(), "_after_fork", None))
+
+
+def test_after_fork_without_queue_reset(caplog):
+    """Without Queue._after_fork the child stops sending instead of losing the lines."""
+    connection = make_connection("block")._replace(queue=queue.Queue(1))
+    target = logging.Logger("transport_test")
+    journal_transport = JournalTransport(target, connection=connection)
+    journal_transport.start()
+    journal_transport.after_fork()
+    assert not journal_transport.running
+    assert journal_transport.handler not in target.handlers
+    assert "forked by os.fork" in caplog.text
+
+
+def test_drop():
+    connection = make_connection("drop")
+    handler = JournalProcessHandler(connection, [(LINE, logging.Formatter())])
+    for i in range(3):
+        handler.send((logging.INFO, (str(i),)))
+    assert handler.sent == 1 and handler.dropped == 2
+    assert connection.dropped.value == 2
+    assert connection.queue.get(timeout=5) == (logging.INFO, ("0",))
+
+
+def test_block():
+    connection = make_connection("block")
+    handler = JournalProcessHandler(connection, [(LINE, logging.Formatter())])
+    handler.send((logging.INFO, ("0",)))
+
+    def consume():
+        time.sleep(0.1)
+        connection.queue.get(timeout=5)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    handler.send((logging.INFO, ("1",)))
+    consumer.join()
+    assert handler.sent == 2 and handler.blocked == 1 and handler.dropped == 0
+    assert handler.blocked_ns > 0
+    assert connection.blocked.value == 1
+    assert connection.queue.get(timeout=5) == (logging.INFO, ("1",))